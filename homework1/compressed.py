@@ -0,0 +1,288 @@
+import bisect
+import bz2
+import io
+import lzma
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+READ_CHUNK = 16 * 1024
+CHECKPOINT_SPACING = 8 * 1024 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+BZIP2_MAGIC = b"BZh"
+XZ_FOOTER_MAGIC = b"YZ"
+ZSTD_SEEKABLE_MAGIC = 0x8F92EAB1
+ZSTD_SKIPPABLE_SEEK_TABLE = 0x184D2A5E
+
+
+class Checkpoint:
+    __slots__ = ("uoffset", "coffset", "cend", "factory")
+
+    def __init__(self, uoffset, coffset, cend, factory):
+        self.uoffset = uoffset
+        self.coffset = coffset
+        self.cend = cend
+        self.factory = factory
+
+
+class CheckpointReader(io.RawIOBase):
+    """Произвольный доступ к сжатому потоку через точки, с которых можно продолжить распаковку.
+
+    Точки бывают двух видов: независимые блоки формата (блоки xz, кадры seekable-zstd)
+    с известными границами и снимки состояния распаковщика (gzip), которые
+    запоминаются по ходу чтения через каждые CHECKPOINT_SPACING байт.
+    """
+
+    def __init__(self, file, checkpoints, new_decoder=None, spacing=None):
+        self.file = file
+        self.checkpoints = checkpoints
+        self.uoffsets = [checkpoint.uoffset for checkpoint in checkpoints]
+        self.new_decoder = new_decoder
+        self.spacing = spacing or CHECKPOINT_SPACING
+        self.restore(0)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def restore(self, index):
+        checkpoint = self.checkpoints[index]
+        self.index = index
+        self.position = checkpoint.uoffset
+        self.input_offset = checkpoint.coffset
+        self.input_end = checkpoint.cend
+        self.decoder = checkpoint.factory()
+        self.pending = b""
+        self.output = b""
+        self.output_pos = 0
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Поиск от конца сжатого образа не поддерживается")
+        if offset < 0:
+            raise ValueError(f"Отрицательное смещение: {offset}")
+
+        if offset < self.position or offset - self.position > self.spacing:
+            index = bisect.bisect_right(self.uoffsets, offset) - 1
+            if offset < self.position or self.uoffsets[index] > self.position:
+                self.restore(index)
+
+        while self.position < offset:
+            if not self.fill():
+                break
+            skip = min(offset - self.position, len(self.output) - self.output_pos)
+            self.output_pos += skip
+            self.position += skip
+        return self.position
+
+    def readinto(self, buffer):
+        if not self.fill():
+            return 0
+        size = min(len(buffer), len(self.output) - self.output_pos)
+        buffer[:size] = memoryview(self.output)[self.output_pos:self.output_pos + size]
+        self.output_pos += size
+        self.position += size
+        return size
+
+    def remember(self):
+        if not hasattr(self.decoder, "copy") or self.pending:
+            return
+        if self.position < self.uoffsets[-1] + self.spacing:
+            return
+        decoder = self.decoder.copy()
+        self.checkpoints.append(Checkpoint(self.position, self.input_offset, self.input_end, decoder.copy))
+        self.uoffsets.append(self.position)
+
+    def fill(self):
+        """Гарантирует непрочитанные распакованные данные в self.output; False — конец потока."""
+        while self.output_pos >= len(self.output):
+            if not self.pending:
+                if self.input_end is not None and self.input_offset >= self.input_end:
+                    # Блок закончился — продолжаем со следующей независимой точки
+                    if self.index + 1 >= len(self.checkpoints):
+                        return False
+                    if self.checkpoints[self.index + 1].uoffset != self.position:
+                        return False
+                    self.restore(self.index + 1)
+                    continue
+
+                self.remember()
+                size = READ_CHUNK
+                if self.input_end is not None:
+                    size = min(size, self.input_end - self.input_offset)
+                self.file.seek(self.input_offset)
+                self.pending = self.file.read(size)
+                if not self.pending:
+                    return False
+
+            self.output = self.decoder.decompress(self.pending)
+            self.output_pos = 0
+            if getattr(self.decoder, "eof", False):
+                rest = self.decoder.unused_data
+                self.input_offset += len(self.pending) - len(rest)
+                self.pending = rest
+                if self.new_decoder is None or self.input_end is not None:
+                    self.input_end = self.input_offset
+                    self.pending = b""
+                else:
+                    # Следующий член gzip или кадр zstd в том же файле
+                    self.decoder = self.new_decoder()
+            else:
+                self.input_offset += len(self.pending)
+                self.pending = b""
+        return True
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+        super().close()
+
+
+def read_at(file, offset, size):
+    file.seek(offset)
+    return file.read(size)
+
+
+def read_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def xz_checkpoints(file):
+    """Строит точки по индексу xz: каждый блок распаковывается независимо от остальных."""
+    streams = []
+    position = file.seek(0, io.SEEK_END)
+
+    while position > 0:
+        while position >= 4 and read_at(file, position - 4, 4) == b"\0\0\0\0":
+            position -= 4
+
+        footer = read_at(file, position - 12, 12)
+        if len(footer) != 12 or footer[10:] != XZ_FOOTER_MAGIC:
+            raise ValueError("Повреждён заголовок потока xz")
+        index_size = (int.from_bytes(footer[4:8], "little") + 1) * 4
+        index_start = position - 12 - index_size
+        index = read_at(file, index_start, index_size)
+
+        count, offset = read_varint(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded, offset = read_varint(index, offset)
+            uncompressed, offset = read_varint(index, offset)
+            records.append((unpadded, uncompressed))
+
+        stream_start = index_start - sum((unpadded + 3) & ~3 for unpadded, _ in records) - 12
+        header = read_at(file, stream_start, 12)
+        if not header.startswith(XZ_MAGIC):
+            raise ValueError("Повреждён индекс xz")
+        streams.append((stream_start, header, records))
+        position = stream_start
+
+    checkpoints = []
+    uoffset = 0
+    for stream_start, header, records in reversed(streams):
+        coffset = stream_start + 12
+        for unpadded, uncompressed in records:
+            size = (unpadded + 3) & ~3
+            checkpoints.append(Checkpoint(uoffset, coffset, coffset + size, xz_block_decoder(header)))
+            coffset += size
+            uoffset += uncompressed
+    return checkpoints
+
+
+def xz_block_decoder(header):
+    def factory():
+        decoder = lzma.LZMADecompressor(lzma.FORMAT_XZ)
+        decoder.decompress(header)
+        return decoder
+    return factory
+
+
+def gzip_decoder():
+    return zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+
+def zstd_decoder():
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def zstd_checkpoints(file):
+    """Читает таблицу поиска формата seekable-zstd, если она записана в конце файла."""
+    end = file.seek(0, io.SEEK_END)
+    if end < 9:
+        return None
+    footer = read_at(file, end - 9, 9)
+    if int.from_bytes(footer[5:], "little") != ZSTD_SEEKABLE_MAGIC:
+        return None
+
+    count = int.from_bytes(footer[:4], "little")
+    entry_size = 12 if footer[4] & 0x80 else 8
+    table_size = count * entry_size + 9
+    table = read_at(file, end - table_size, table_size)
+    if int.from_bytes(read_at(file, end - table_size - 8, 4), "little") != ZSTD_SKIPPABLE_SEEK_TABLE:
+        return None
+
+    checkpoints = []
+    uoffset = coffset = 0
+    for i in range(count):
+        entry = table[i * entry_size:(i + 1) * entry_size]
+        compressed = int.from_bytes(entry[:4], "little")
+        decompressed = int.from_bytes(entry[4:8], "little")
+        checkpoints.append(Checkpoint(uoffset, coffset, coffset + compressed, zstd_decoder))
+        uoffset += decompressed
+        coffset += compressed
+    return checkpoints
+
+
+def open_image(path):
+    """Открывает образ для чтения с произвольным доступом независимо от сжатия."""
+    file = open(path, "rb")
+    try:
+        magic = file.read(6)
+        if magic.startswith(GZIP_MAGIC):
+            return io.BufferedReader(CheckpointReader(file, [Checkpoint(0, 0, None, gzip_decoder)], gzip_decoder))
+
+        if magic.startswith(XZ_MAGIC):
+            try:
+                return io.BufferedReader(CheckpointReader(file, xz_checkpoints(file)))
+            except (OSError, ValueError, IndexError):
+                # Без читаемого индекса остаётся только последовательная распаковка
+                file.close()
+                return lzma.LZMAFile(path)
+
+        if magic.startswith(ZSTD_MAGIC):
+            if zstandard is None:
+                raise ValueError("Для образов .zst требуется пакет zstandard")
+            checkpoints = zstd_checkpoints(file) or [Checkpoint(0, 0, None, zstd_decoder)]
+            return io.BufferedReader(CheckpointReader(file, checkpoints, zstd_decoder))
+
+        if magic.startswith(BZIP2_MAGIC):
+            file.close()
+            return bz2.BZ2File(path)
+    except BaseException:
+        file.close()
+        raise
+
+    file.seek(0)
+    return file
@@ -1,31 +1,100 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
 import os
+import sys
+import getpass
 import tarfile
 import argparse
+from vfs import VirtualFileSystem, OverlayFileSystem
+from shell import ShellEngine, run_headless
+
+
+DEFAULT_SCROLLBACK = 10000
+FLUSH_INTERVAL_MS = 16
+
+
+class BufferedTextOutput:
+    """Накапливает вывод и вставляет его в текстовое поле не чаще одного раза за кадр."""
+
+    def __init__(self, text_area, max_lines=DEFAULT_SCROLLBACK, interval=FLUSH_INTERVAL_MS):
+        self.text_area = text_area
+        self.max_lines = max_lines
+        self.interval = interval
+        self.pending = []
+        self.pending_lines = 0
+        self.flush_id = None
+
+    def write(self, text):
+        self.pending.append(text)
+        if self.max_lines:
+            self.pending_lines += text.count("\n")
+            # Без главного цикла (скрипт при запуске) flush не вызывается: лишние строки отбрасываются сразу.
+            # Запас в max_lines строк, чтобы обрезка выполнялась не при каждой записи.
+            if self.pending_lines > 2 * self.max_lines:
+                self.pending = [self.last_lines("".join(self.pending))]
+                self.pending_lines = self.max_lines
+        if self.flush_id is None:
+            self.flush_id = self.text_area.after(self.interval, self.flush)
+
+    def flush(self):
+        if self.flush_id is not None:
+            self.text_area.after_cancel(self.flush_id)
+            self.flush_id = None
+        if not self.pending:
+            return
+
+        # Строки, которые всё равно будут обрезаны, не вставляем в виджет вовсе
+        text = self.last_lines("".join(self.pending))
+        self.pending = []
+        self.pending_lines = 0
+
+        self.text_area.insert(tk.END, text)
+        self.trim()
+        self.text_area.see(tk.END)
+
+    def last_lines(self, text):
+        if self.max_lines and text.count("\n") > self.max_lines:
+            return "\n".join(text.split("\n")[-(self.max_lines + 1):])
+        return text
+
+    def trim(self):
+        if not self.max_lines:
+            return
+        line_count = int(self.text_area.index("end-1c").split(".")[0])
+        if line_count > self.max_lines + 1:
+            self.text_area.delete("1.0", f"{line_count - self.max_lines}.0")
+
+    def close(self):
+        if self.flush_id is not None:
+            self.text_area.after_cancel(self.flush_id)
+            self.flush_id = None
+        self.pending = []
+        self.pending_lines = 0
 
 
 class ShellEmulator:
-    def __init__(self, master, username, virtual_fs_path):
+    def __init__(self, master, username, virtual_fs_path, journal_path=None, scrollback=DEFAULT_SCROLLBACK):
         self.master = master
         self.master.title("Shell Emulator")
-        self.current_path = "/"
-        self.history = []
 
         self.text_area = scrolledtext.ScrolledText(master, wrap=tk.WORD)
         self.text_area.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
 
         self.username = username
         self.virtual_fs_path = virtual_fs_path
+        self.journal_path = journal_path
+        self.output = BufferedTextOutput(self.text_area, scrollback)
+        self.engine = ShellEngine(username, OverlayFileSystem(VirtualFileSystem()), self.output,
+                                  on_exit=self.master.quit, on_path_change=self.update_prompt)
 
-        self.label = tk.Label(master, text=f"{self.username}:{self.current_path}")
+        self.label = tk.Label(master, text=f"{self.username}:{self.engine.current_path}")
         self.label.pack(padx=10, pady=5)
 
         self.entry = tk.Entry(master)
         self.entry.pack(padx=10, pady=10, fill=tk.X)
         self.entry.bind("<Return>", self.execute_command)
 
-        self.extract_virtual_fs()
+        self.load_virtual_fs()
 
     @staticmethod
     def parse_arguments():
@@ -33,6 +102,12 @@ class ShellEmulator:
         parser.add_argument("--user", type=str, help="Имя пользователя.", required=False)
         parser.add_argument("--fs", type=str, help="Путь к архиву виртуальной файловой системы.", required=True)
         parser.add_argument("--script", type=str, help="Путь к скрипту с командами.", required=False)
+        parser.add_argument("--journal", type=str, help="Путь к журналу изменений поверх образа.", required=False)
+        parser.add_argument("--scrollback", type=int, default=DEFAULT_SCROLLBACK,
+                            help="Максимальное число строк в окне вывода (0 — без ограничения).")
+        parser.add_argument("--headless", action="store_true", help="Выполнять команды без графического интерфейса.")
+        parser.add_argument("--output", type=str, help="Файл для вывода в режиме --headless (по умолчанию stdout).",
+                            required=False)
 
         args = parser.parse_args()
 
@@ -41,127 +116,45 @@ class ShellEmulator:
 
         return args
 
-    def extract_virtual_fs(self):
+    def load_virtual_fs(self):
         if not os.path.exists(self.virtual_fs_path):
             messagebox.showerror("Ошибка", "Файл виртуальной файловой системы не найден.")
             return
 
-        with tarfile.open(self.virtual_fs_path) as tar:
-            tar.extractall(path="virtual_fs", filter=tarfile.data_filter)
+        try:
+            self.engine.fs = OverlayFileSystem(VirtualFileSystem(self.virtual_fs_path), self.journal_path)
+        except (OSError, tarfile.TarError, ValueError) as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать архив: {e}")
 
     def load_script(self, script_file):
         try:
             with open(script_file, 'r') as file:
-                for line in file:
-                    command = line.strip()
-                    if command:
-                        self.execute_command_from_script(command)
+                self.engine.run_script(file)
         except FileNotFoundError:
             messagebox.showerror("Ошибка", f"Файл скрипта {script_file} не найден.")
 
     def execute_command(self, event):
-        command = self.entry.get()
-
-        command_dict = {
-            "ls": self.list_files,
-            "cd": lambda: self.change_directory(command[3:]),
-            "pwd": self.print_working_directory,
-            "exit": self.master.quit,
-            "touch": lambda: self.touch_file(command[6:]),
-            "chmod": lambda: self.chmod_file(command[6:]),
-        }
-
-        cmd_func = command_dict.get(command.split()[0], None)
-
-        if cmd_func:
-            cmd_func()
-        else:
-            self.text_area.insert(tk.END, f"{self.username}: команда не найдена\n")
-
+        self.engine.execute(self.entry.get())
         self.entry.delete(0, tk.END)
 
-    def execute_command_from_script(self, command):
-        command_dict = {
-            "ls": self.list_files,
-            "cd": lambda: self.change_directory(command[3:]),
-            "pwd": self.print_working_directory,
-            "exit": self.master.quit,
-            "touch": lambda: self.touch_file(command[6:]),
-            "chmod": lambda: self.chmod_file(command[6:]),
-        }
-
-        cmd_func = command_dict.get(command.split()[0], None)
-
-        if cmd_func:
-            cmd_func()
-        else:
-            self.text_area.insert(tk.END, f"{self.username}: команда не найдена\n")
-
-    def list_files(self):
-        try:
-            files = os.listdir(f"virtual_fs{self.current_path}")
-            output = "\n".join(files) if files else "Пустая директория\n"
-            self.text_area.insert(tk.END, f"{output}\n")
-        except FileNotFoundError:
-            self.text_area.insert(tk.END, "Директория не найдена\n")
-
-    def change_directory(self, path):
-        if path == "..":
-            if self.current_path != "/":
-                parts = self.current_path.split("/")
-                parts.pop()
-                self.current_path = "/".join(parts) or "/"
-                self.label.config(text=f"{self.username}:{self.current_path}")
-                return
-
-        new_path = os.path.join(f"virtual_fs{self.current_path}", path)
-
-        if os.path.isdir(new_path):
-            self.current_path = new_path.replace("virtual_fs", "")
-            self.label.config(text=f"{self.username}:{self.current_path}")
-            return
-        else:
-            self.text_area.insert(tk.END, "Директория не найдена\n")
-
-    def print_working_directory(self):
-        current_dir = f"{self.username}:{self.current_path}\n"
-        self.text_area.insert(tk.END, current_dir)
-
-    def touch_file(self, filename):
-        try:
-            file_path = os.path.join(f"virtual_fs{self.current_path}", filename.strip())
-            with open(file_path, 'a'):
-                pass
-            self.text_area.insert(tk.END, f"Файл '{filename}' создан.\n")
-        except Exception as e:
-            self.text_area.insert(tk.END, f"Ошибка при создании файла '{filename}': {str(e)}\n")
-
-    def chmod_file(self, command):
-        try:
-            parts = command.split()
-            if len(parts) != 2:
-                self.text_area.insert(tk.END, "Использование: chmod <права> <файл>\n")
-                return
-
-            permissions, filename = parts
-            file_path = os.path.join(f"virtual_fs{self.current_path}", filename.strip())
-
-            os.chmod(file_path, int(permissions, 8))
-            self.text_area.insert(tk.END, f"Права для файла {filename} изменены на {permissions}\n")
-        except FileNotFoundError:
-            self.text_area.insert(tk.END, "Файл не найден\n")
-        except PermissionError:
-            self.text_area.insert(tk.END, "Нет доступа для изменения прав файла\n")
-        except Exception as e:
-            self.text_area.insert(tk.END, f"Ошибка при изменении прав: {str(e)}\n")
+    def update_prompt(self, current_path):
+        self.label.config(text=f"{self.username}:{current_path}")
 
 
 if __name__ == "__main__":
     args = ShellEmulator.parse_arguments()
-    username = args.user or os.getlogin()
+    username = args.user or getpass.getuser()
+
+    if args.headless:
+        try:
+            run_headless(username, args.fs, args.script, args.output, args.journal)
+        except (OSError, tarfile.TarError, ValueError) as e:
+            print(f"Ошибка: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
 
     root = tk.Tk()
-    app = ShellEmulator(root, username, args.fs)
+    app = ShellEmulator(root, username, args.fs, args.journal, args.scrollback)
 
     if args.script:
         app.load_script(args.script)
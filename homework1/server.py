@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import getpass
+import os
+from shell import ShellEngine
+from vfs import VirtualFileSystem, OverlayFileSystem
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8022
+
+
+class StreamOutput:
+    """Вывод сессии: команды выполняются в потоке, а запись в сокет идёт через цикл событий."""
+
+    def __init__(self, writer, loop):
+        self.writer = writer
+        self.loop = loop
+
+    def write(self, text):
+        if text:
+            asyncio.run_coroutine_threadsafe(self.send(text.encode("utf-8")), self.loop).result()
+
+    async def send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+
+class ShellServer:
+    """Много сессий над одним загруженным образом: у каждой свои путь, история и слой изменений."""
+
+    def __init__(self, fs, default_user):
+        self.fs = fs
+        self.default_user = default_user
+        self.sessions = 0
+
+    async def handle_session(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        self.sessions += 1
+        try:
+            writer.write("login: ".encode("utf-8"))
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                return
+
+            username = line.decode("utf-8", "replace").strip() or self.default_user
+            engine = ShellEngine(username, OverlayFileSystem(self.fs), StreamOutput(writer, loop))
+
+            while engine.running:
+                writer.write(f"{username}:{engine.current_path}$ ".encode("utf-8"))
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                # Долгие команды (cat большого файла) не должны останавливать другие сессии
+                await loop.run_in_executor(None, engine.execute, line.decode("utf-8", "replace"))
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+        if socket_path:
+            return await asyncio.start_unix_server(self.handle_session, path=socket_path)
+        return await asyncio.start_server(self.handle_session, host, port)
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+        server = await self.start(host, port, socket_path)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер эмулятора командной строки.")
+    parser.add_argument("--fs", type=str, help="Путь к архиву виртуальной файловой системы.", required=True)
+    parser.add_argument("--user", type=str, help="Имя пользователя по умолчанию.", required=False)
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Адрес для подключений.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Порт для подключений.")
+    parser.add_argument("--socket", type=str, help="Путь к UNIX-сокету вместо TCP.", required=False)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.fs):
+        parser.error(f"Файл виртуальной файловой системы '{args.fs}' не найден.")
+
+    fs = VirtualFileSystem(args.fs)
+    server = ShellServer(fs, args.user or getpass.getuser())
+    address = args.socket or f"{args.host}:{args.port}"
+    print(f"Образ {args.fs} загружен, сервер слушает {address}")
+
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fs.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+import codecs
+import fnmatch
+import posixpath
+import sys
+from vfs import VirtualFileSystem, OverlayFileSystem
+
+
+GLOB_CHARS = "*?["
+COMMANDS = {}
+
+
+def command(name):
+    def register(func):
+        COMMANDS[name] = func
+        return func
+    return register
+
+
+def take_lines(chunks, lines):
+    for chunk in chunks:
+        count = chunk.count(b"\n")
+        if count >= lines:
+            index = -1
+            for _ in range(lines):
+                index = chunk.find(b"\n", index + 1)
+            yield chunk[:index + 1]
+            return
+        lines -= count
+        yield chunk
+
+
+def tokenize(line):
+    """Разбивает строку на слова по правилам shell: кавычки, экранирование, комментарии.
+
+    Возвращает список пар (слово, содержит_ли_шаблон), где шаблоном считаются
+    только символы *?[ вне кавычек.
+    """
+    words = []
+    word = []
+    has_glob = False
+    in_word = False
+    quote = None
+    i = 0
+
+    while i < len(line):
+        char = line[i]
+        if quote:
+            if char == quote:
+                quote = None
+            elif char == "\\" and quote == '"' and i + 1 < len(line) and line[i + 1] in '"\\$`':
+                i += 1
+                word.append(line[i])
+            else:
+                word.append(char)
+        elif char in "'\"":
+            quote = char
+            in_word = True
+        elif char == "\\":
+            if i + 1 < len(line):
+                i += 1
+                word.append(line[i])
+            in_word = True
+        elif char.isspace():
+            if in_word:
+                words.append(("".join(word), has_glob))
+                word = []
+                has_glob = False
+                in_word = False
+        elif char == "#" and not in_word:
+            break
+        else:
+            word.append(char)
+            has_glob = has_glob or char in GLOB_CHARS
+            in_word = True
+        i += 1
+
+    if quote:
+        raise ValueError("синтаксическая ошибка: незакрытая кавычка")
+    if in_word:
+        words.append(("".join(word), has_glob))
+    return words
+
+
+class ShellEngine:
+    """Исполнитель команд эмулятора, не зависящий от графического интерфейса."""
+
+    def __init__(self, username, fs, output=None, on_exit=None, on_path_change=None):
+        self.username = username
+        self.fs = fs
+        self.output = output or sys.stdout
+        self.on_exit = on_exit
+        self.on_path_change = on_path_change
+        self.current_path = "/"
+        self.history = []
+        self.running = True
+
+    def write(self, text):
+        self.output.write(text)
+
+    def run_script(self, lines):
+        for line in lines:
+            if not self.running:
+                break
+            self.execute(line)
+
+    def execute(self, command):
+        command = command.strip()
+        if not command:
+            return
+        self.history.append(command)
+
+        try:
+            words = tokenize(command)
+        except ValueError as e:
+            self.write(f"{self.username}: {e}\n")
+            return
+        if not words:
+            return
+
+        cmd_func = COMMANDS.get(words[0][0])
+
+        if cmd_func:
+            cmd_func(self, self.expand_arguments(words[1:]))
+        else:
+            self.write(f"{self.username}: команда не найдена\n")
+
+    def expand_arguments(self, words):
+        args = []
+        for word, has_glob in words:
+            if has_glob:
+                args.extend(self.expand_glob(word))
+            else:
+                args.append(word)
+        return args
+
+    def expand_glob(self, pattern):
+        matches = ["/" if pattern.startswith("/") else ""]
+
+        for part in pattern.split("/"):
+            if not part:
+                continue
+            if not any(char in part for char in GLOB_CHARS):
+                matches = [posixpath.join(prefix, part) if prefix else part for prefix in matches]
+                continue
+
+            expanded = []
+            for prefix in matches:
+                directory = self.fs.resolve(self.current_path, prefix or ".")
+                if not self.fs.isdir(directory):
+                    continue
+                for name in self.fs.listdir(directory):
+                    if name.startswith(".") and not part.startswith("."):
+                        continue
+                    if fnmatch.fnmatchcase(name, part):
+                        expanded.append(posixpath.join(prefix, name) if prefix else name)
+            matches = expanded
+
+        matches = [match for match in matches if self.fs.lookup(self.fs.resolve(self.current_path, match))]
+        # Как и в bash, шаблон без совпадений передаётся команде как есть
+        return sorted(matches) or [pattern]
+
+    @staticmethod
+    def split_options(args):
+        options = set()
+        paths = []
+        for arg in args:
+            if arg.startswith("-") and len(arg) > 1:
+                options.update(arg[1:])
+            else:
+                paths.append(arg)
+        return options, paths
+
+    @staticmethod
+    def format_size(size, human=False):
+        if not human:
+            return str(size)
+        for unit in ("", "K", "M", "G", "T"):
+            if size < 1024 or unit == "T":
+                return f"{size}{unit}" if unit == "" else f"{size:.1f}{unit}"
+            size /= 1024
+
+    @command("exit")
+    def exit(self, args=()):
+        self.running = False
+        if self.on_exit:
+            self.on_exit()
+
+    @command("ls")
+    def list_files(self, args=()):
+        options, args = self.split_options(args)
+        if options - {"R"}:
+            self.write(f"ls: неизвестный параметр -{''.join(sorted(options - {'R'}))}\n")
+            return
+
+        for i, path in enumerate(args or ["."]):
+            try:
+                node = self.fs.get_node(self.fs.resolve(self.current_path, path))
+                if not node.is_dir:
+                    self.write(f"{path}\n")
+                    continue
+                if i:
+                    self.write("\n")
+                if "R" in options:
+                    self.list_recursive(path)
+                    continue
+                if len(args) > 1:
+                    self.write(f"{path}:\n")
+                files = self.fs.listdir(self.fs.resolve(self.current_path, path))
+                output = "\n".join(files) if files else "Пустая директория\n"
+                self.write(f"{output}\n")
+            except (FileNotFoundError, NotADirectoryError):
+                self.write("Директория не найдена\n")
+
+    def list_recursive(self, path):
+        start = self.fs.resolve(self.current_path, path)
+        separator = ""
+
+        for relative, node in self.fs.walk(start):
+            if not node.is_dir:
+                continue
+            names = self.fs.listdir(posixpath.join(start, relative) if relative else start)
+            self.write(f"{separator}{posixpath.join(path, relative) if relative else path}:\n")
+            if names:
+                self.write("\n".join(names) + "\n")
+            separator = "\n"
+
+    @command("find")
+    def find_files(self, args=()):
+        paths = []
+        name_pattern = None
+        node_type = None
+        max_depth = None
+
+        i = 0
+        while i < len(args) and not args[i].startswith("-"):
+            paths.append(args[i])
+            i += 1
+
+        while i < len(args):
+            option = args[i]
+            if option not in ("-name", "-type", "-maxdepth") or i + 1 >= len(args):
+                self.write(f"find: неверный параметр '{option}'\n")
+                return
+
+            value = args[i + 1]
+            if option == "-name":
+                name_pattern = value
+            elif option == "-type":
+                if value not in ("f", "d"):
+                    self.write(f"find: неизвестный тип '{value}'\n")
+                    return
+                node_type = value
+            else:
+                if not value.isdigit():
+                    self.write(f"find: неверная глубина '{value}'\n")
+                    return
+                max_depth = int(value)
+            i += 2
+
+        for path in paths or ["."]:
+            try:
+                for relative, node in self.fs.walk(self.fs.resolve(self.current_path, path), max_depth):
+                    if node_type and node.is_dir != (node_type == "d"):
+                        continue
+                    if name_pattern and not fnmatch.fnmatchcase(node.name, name_pattern):
+                        continue
+                    self.write((posixpath.join(path, relative) if relative else path) + "\n")
+            except FileNotFoundError:
+                self.write(f"find: '{path}': Нет такого файла или директории\n")
+
+    @command("du")
+    def disk_usage(self, args=()):
+        options, paths = self.split_options(args)
+        if options - {"s", "a", "h"}:
+            self.write(f"du: неизвестный параметр -{''.join(sorted(options - {'s', 'a', 'h'}))}\n")
+            return
+
+        human = "h" in options
+        for path in paths or ["."]:
+            start = self.fs.resolve(self.current_path, path)
+            try:
+                if "s" in options:
+                    # Размер поддерева уже посчитан при загрузке архива
+                    self.write(f"{self.format_size(self.fs.get_node(start).total_size, human)}\t{path}\n")
+                    continue
+                for relative, node in self.fs.walk(start):
+                    if node.is_dir or "a" in options or not relative:
+                        display = posixpath.join(path, relative) if relative else path
+                        self.write(f"{self.format_size(node.total_size, human)}\t{display}\n")
+            except FileNotFoundError:
+                self.write(f"du: '{path}': Нет такого файла или директории\n")
+
+    def write_chunks(self, chunks):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                self.write(text)
+        self.write(decoder.decode(b"", final=True))
+
+    def parse_line_count(self, name, args):
+        count = 10
+        paths = []
+        i = 0
+
+        while i < len(args):
+            arg = args[i]
+            if arg == "-n" and i + 1 < len(args):
+                value = args[i + 1]
+                i += 2
+            elif arg.startswith("-n") and len(arg) > 2:
+                value = arg[2:]
+                i += 1
+            elif arg.startswith("-") and arg[1:].isdigit():
+                value = arg[1:]
+                i += 1
+            else:
+                paths.append(arg)
+                i += 1
+                continue
+
+            if not value.isdigit():
+                self.write(f"{name}: неверное число строк '{value}'\n")
+                return None, []
+            count = int(value)
+
+        if not paths:
+            self.write(f"Использование: {name} [-n <число>] <файл>...\n")
+        return count, paths
+
+    def show_files(self, name, paths, reader):
+        for i, path in enumerate(paths):
+            file_path = self.fs.resolve(self.current_path, path)
+            try:
+                self.fs.get_file(file_path)
+                if len(paths) > 1:
+                    self.write(f"\n==> {path} <==\n" if i else f"==> {path} <==\n")
+                self.write_chunks(reader(file_path))
+            except FileNotFoundError:
+                self.write(f"{name}: {path}: Нет такого файла или директории\n")
+            except IsADirectoryError:
+                self.write(f"{name}: {path}: Является директорией\n")
+
+    @command("cat")
+    def cat_files(self, args=()):
+        if not args:
+            self.write("Использование: cat <файл>...\n")
+            return
+        self.show_files("cat", args, self.fs.iter_chunks)
+
+    @command("head")
+    def head_files(self, args=()):
+        count, paths = self.parse_line_count("head", args)
+        self.show_files("head", paths, lambda path: take_lines(self.fs.iter_chunks(path), count))
+
+    @command("tail")
+    def tail_files(self, args=()):
+        count, paths = self.parse_line_count("tail", args)
+        self.show_files("tail", paths, lambda path: self.fs.iter_chunks(path, self.fs.tail_offset(path, count)))
+
+    @command("cd")
+    def change_directory(self, args=()):
+        if len(args) > 1:
+            self.write("cd: слишком много аргументов\n")
+            return
+
+        new_path = self.fs.resolve(self.current_path, args[0] if args else "/")
+
+        if self.fs.isdir(new_path):
+            self.current_path = new_path
+            if self.on_path_change:
+                self.on_path_change(self.current_path)
+        else:
+            self.write("Директория не найдена\n")
+
+    @command("pwd")
+    def print_working_directory(self, args=()):
+        self.write(f"{self.username}:{self.current_path}\n")
+
+    @command("touch")
+    def touch_file(self, args=()):
+        if not args:
+            self.write("Использование: touch <файл>...\n")
+            return
+
+        for filename in args:
+            try:
+                self.fs.touch(self.fs.resolve(self.current_path, filename))
+                self.write(f"Файл '{filename}' создан.\n")
+            except Exception as e:
+                self.write(f"Ошибка при создании файла '{filename}': {str(e)}\n")
+
+    @command("chmod")
+    def chmod_file(self, args=()):
+        if len(args) < 2:
+            self.write("Использование: chmod <права> <файл>...\n")
+            return
+
+        permissions, filenames = args[0], args[1:]
+        try:
+            mode = int(permissions, 8)
+        except ValueError:
+            self.write(f"Ошибка при изменении прав: неверный режим '{permissions}'\n")
+            return
+
+        for filename in filenames:
+            try:
+                self.fs.chmod(self.fs.resolve(self.current_path, filename), mode)
+                self.write(f"Права для файла {filename} изменены на {permissions}\n")
+            except FileNotFoundError:
+                self.write("Файл не найден\n")
+            except PermissionError:
+                self.write("Нет доступа для изменения прав файла\n")
+            except Exception as e:
+                self.write(f"Ошибка при изменении прав: {str(e)}\n")
+
+
+def run_headless(username, virtual_fs_path, script_path=None, output_path=None, journal_path=None):
+    fs = OverlayFileSystem(VirtualFileSystem(virtual_fs_path), journal_path)
+    output = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+
+    try:
+        engine = ShellEngine(username, fs, output)
+        if script_path:
+            with open(script_path, "r", encoding="utf-8") as script:
+                engine.run_script(script)
+        else:
+            engine.run_script(sys.stdin)
+    finally:
+        fs.base.close()
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
@@ -1,8 +1,17 @@
 import unittest
+import asyncio
+import gzip
+import io
+import lzma
 import os
 import tarfile
 from emulator import ShellEmulator
+from vfs import VirtualFileSystem, OverlayFileSystem
+from shell import ShellEngine, run_headless, tokenize, COMMANDS
+from compressed import CheckpointReader, open_image
+from server import ShellServer
 from tkinter import Tk
+from unittest.mock import patch
 
 class TestShellEmulator(unittest.TestCase):
 
@@ -21,88 +30,478 @@ class TestShellEmulator(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         os.remove(cls.virtual_fs_path)
-        if os.path.exists("virtual_fs"):
-            for root, dirs, files in os.walk("virtual_fs", topdown=False):
-                for name in files:
-                    os.remove(os.path.join(root, name))
-                for name in dirs:
-                    os.rmdir(os.path.join(root, name))
-            os.rmdir("virtual_fs")
+        if os.path.exists(cls.virtual_fs_path + ".idx"):
+            os.remove(cls.virtual_fs_path + ".idx")
 
     def setUp(self):
         self.root = Tk()
         self.emulator = ShellEmulator(self.root, "test_user", self.virtual_fs_path)
 
     def tearDown(self):
+        self.emulator.output.close()
         self.root.destroy()
 
-    def test_extract_virtual_fs(self):
-        self.emulator.extract_virtual_fs()
-        self.assertTrue(os.path.exists("virtual_fs"))
+    def get_output(self):
+        self.emulator.output.flush()
+        return self.emulator.text_area.get("1.0", "end").strip()
+
+    def test_load_virtual_fs(self):
+        self.emulator.load_virtual_fs()
+        self.assertIn("test_file.txt", self.emulator.engine.fs.listdir("/"))
 
     def test_list_files(self):
-        self.emulator.extract_virtual_fs()
-        self.emulator.list_files()
-        output = self.emulator.text_area.get("1.0", "end").strip()
+        self.emulator.engine.list_files()
+        output = self.get_output()
         self.assertIn("test_file.txt", output)
 
     def test_print_working_directory(self):
-        self.emulator.print_working_directory()
-        output = self.emulator.text_area.get("1.0", "end").strip()
+        self.emulator.engine.print_working_directory()
+        output = self.get_output()
         self.assertEqual(output, "test_user:/")
 
     def test_touch_file(self):
-        self.emulator.extract_virtual_fs()
-        self.emulator.touch_file("new_file.txt")
-        self.assertTrue(os.path.exists("virtual_fs/new_file.txt"))
+        self.emulator.engine.touch_file(["new_file.txt"])
+        self.assertIsNotNone(self.emulator.engine.fs.lookup("/new_file.txt"))
 
     def test_touch_file_error(self):
-        self.emulator.current_path = "/nonexistent_path"
-        self.emulator.touch_file("file.txt")
-        output = self.emulator.text_area.get("1.0", "end").strip()
+        self.emulator.engine.current_path = "/nonexistent_path"
+        self.emulator.engine.touch_file(["file.txt"])
+        output = self.get_output()
         self.assertIn("Ошибка при создании файла", output)
 
     def test_chmod_file(self):
-        self.emulator.extract_virtual_fs()
-        self.emulator.touch_file("chmod_test.txt")
-        self.emulator.chmod_file("777 chmod_test.txt")
-        self.assertTrue(os.access("virtual_fs/chmod_test.txt", os.W_OK))
+        self.emulator.engine.touch_file(["chmod_test.txt"])
+        self.emulator.engine.chmod_file(["777", "chmod_test.txt"])
+        self.assertEqual(self.emulator.engine.fs.lookup("/chmod_test.txt").mode, 0o777)
 
     def test_chmod_file_not_found(self):
-        self.emulator.chmod_file("777 nonexistent_file.txt")
-        output = self.emulator.text_area.get("1.0", "end").strip()
+        self.emulator.engine.chmod_file(["777", "nonexistent_file.txt"])
+        output = self.get_output()
         self.assertIn("Файл не найден", output)
 
     def test_ls_empty_directory(self):
-        os.mkdir("virtual_fs/empty_dir")
-        self.emulator.change_directory("empty_dir")
-        self.emulator.list_files()
-        output = self.emulator.text_area.get("1.0", "end").strip()
+        self.emulator.engine.fs.base.makedirs("/empty_dir")
+        self.emulator.engine.change_directory(["empty_dir"])
+        self.emulator.engine.list_files()
+        output = self.get_output()
         self.assertEqual(output, "Пустая директория")
 
     def test_execute_command_ls(self):
-        self.emulator.extract_virtual_fs()
         self.emulator.entry.insert(0, "ls")
         self.emulator.execute_command(None)
-        output = self.emulator.text_area.get("1.0", "end").strip()
+        output = self.get_output()
         self.assertIn("test_file.txt", output)
 
     def test_execute_command_invalid(self):
         self.emulator.entry.insert(0, "invalid_cmd")
         self.emulator.execute_command(None)
-        output = self.emulator.text_area.get("1.0", "end").strip()
+        output = self.get_output()
         self.assertIn("команда не найдена", output)
 
     def test_execute_command_touch(self):
         self.emulator.entry.insert(0, "touch new_test_file.txt")
         self.emulator.execute_command(None)
-        self.assertTrue(os.path.exists("virtual_fs/new_test_file.txt"))
+        self.assertIsNotNone(self.emulator.engine.fs.lookup("/new_test_file.txt"))
 
     def test_execute_command_pwd(self):
         self.emulator.entry.insert(0, "pwd")
         self.emulator.execute_command(None)
-        output = self.emulator.text_area.get("1.0", "end").strip()
+        output = self.get_output()
         self.assertIn("test_user:/", output)
 
+    def test_output_is_buffered(self):
+        self.emulator.engine.print_working_directory()
+        self.assertEqual(self.emulator.text_area.get("1.0", "end").strip(), "")
+        self.assertEqual(self.get_output(), "test_user:/")
+
+    def test_output_scrollback_limit(self):
+        self.emulator.output.max_lines = 3
+        for i in range(10):
+            self.emulator.output.write(f"line{i}\n")
+        self.assertEqual(self.get_output(), "line7\nline8\nline9")
+        self.emulator.output.write("line10\n")
+        self.assertEqual(self.get_output(), "line8\nline9\nline10")
+
+    def test_pending_output_is_bounded(self):
+        self.emulator.output.max_lines = 3
+        for i in range(1000):
+            self.emulator.output.write(f"line{i}\n")
+        self.assertLessEqual("".join(self.emulator.output.pending).count("\n"), 6)
+        self.assertEqual(self.get_output(), "line997\nline998\nline999")
+
+
+class TestVirtualFileSystem(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Архив с вложенными директориями и файлом без явной записи о родителе
+        cls.archive_path = "test_vfs.tar"
+        with tarfile.open(cls.archive_path, "w") as tar:
+            for name, data in (("./docs/readme.txt", b"hello world"), ("./docs/deep/log.txt", b"0123456789")):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mode = 0o640
+                tar.addfile(info, io.BytesIO(data))
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.archive_path)
+        if os.path.exists(cls.archive_path + ".idx"):
+            os.remove(cls.archive_path + ".idx")
+
+    def setUp(self):
+        self.fs = VirtualFileSystem(self.archive_path)
+
+    def test_listdir(self):
+        self.assertEqual(self.fs.listdir("/"), ["docs"])
+        self.assertEqual(self.fs.listdir("/docs"), ["deep", "readme.txt"])
+
+    def test_listdir_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            self.fs.listdir("/missing")
+
+    def test_resolve(self):
+        self.assertEqual(self.fs.resolve("/docs", "deep/../readme.txt"), "/docs/readme.txt")
+        self.assertEqual(self.fs.resolve("/docs", ".."), "/")
+        self.assertEqual(self.fs.resolve("/", ".."), "/")
+
+    def test_read_lazily(self):
+        self.assertEqual(self.fs.read("/docs/readme.txt"), b"hello world")
+        self.assertEqual(self.fs.read("/docs/deep/log.txt", offset=3, size=4), b"3456")
+
+
+    def test_iter_chunks_bounded(self):
+        chunks = list(self.fs.iter_chunks("/docs/deep/log.txt", chunk_size=4))
+        self.assertEqual(chunks, [b"0123", b"4567", b"89"])
+
+    def test_index_cache_reused(self):
+        self.assertTrue(os.path.exists(self.archive_path + ".idx"))
+        with patch.object(VirtualFileSystem, "scan_archive") as mock_scan:
+            fs = VirtualFileSystem(self.archive_path)
+        mock_scan.assert_not_called()
+        self.assertEqual(fs.read("/docs/readme.txt"), b"hello world")
+
+    def test_index_cache_invalidated(self):
+        # Подмена индекса для другого архива не должна использоваться
+        with open(self.archive_path + ".idx", "w") as f:
+            f.write('{"version": 1, "signature": {"size": 0}, "entries": []}')
+        fs = VirtualFileSystem(self.archive_path)
+        self.assertEqual(fs.listdir("/"), ["docs"])
+
+
+class TestOverlayFileSystem(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.archive_path = "test_overlay.tar"
+        cls.journal_path = "test_overlay.journal"
+        with tarfile.open(cls.archive_path, "w") as tar:
+            info = tarfile.TarInfo("etc/hosts")
+            info.size = 9
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(b"localhost"))
+        cls.base = VirtualFileSystem(cls.archive_path, use_index_cache=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.archive_path)
+
+    def tearDown(self):
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def test_touch_does_not_modify_base(self):
+        fs = OverlayFileSystem(self.base)
+        fs.touch("/etc/new.conf")
+        self.assertEqual(fs.listdir("/etc"), ["hosts", "new.conf"])
+        self.assertEqual(self.base.listdir("/etc"), ["hosts"])
+
+    def test_chmod_does_not_modify_base(self):
+        fs = OverlayFileSystem(self.base)
+        fs.chmod("/etc/hosts", 0o600)
+        self.assertEqual(fs.lookup("/etc/hosts").mode, 0o600)
+        self.assertEqual(self.base.lookup("/etc/hosts").mode, 0o644)
+        self.assertEqual(fs.read("/etc/hosts"), b"localhost")
+
+    def test_sessions_are_isolated(self):
+        first = OverlayFileSystem(self.base)
+        second = OverlayFileSystem(self.base)
+        first.touch("/etc/only_first")
+        self.assertIsNone(second.lookup("/etc/only_first"))
+
+    def test_touch_missing_dir(self):
+        fs = OverlayFileSystem(self.base)
+        with self.assertRaises(FileNotFoundError):
+            fs.touch("/missing/new.txt")
+
+    def test_journal_replay(self):
+        fs = OverlayFileSystem(self.base, self.journal_path)
+        fs.touch("/etc/new.conf")
+        fs.chmod("/etc/new.conf", 0o755)
+
+        restored = OverlayFileSystem(self.base, self.journal_path)
+        self.assertEqual(restored.lookup("/etc/new.conf").mode, 0o755)
+        with open(self.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+
+class TestShellEngine(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.archive_path = "test_engine.tar"
+        with tarfile.open(cls.archive_path, "w") as tar:
+            info = tarfile.TarInfo("home/user/notes.txt")
+            info.size = 4
+            tar.addfile(info, io.BytesIO(b"note"))
+        cls.base = VirtualFileSystem(cls.archive_path, use_index_cache=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.archive_path)
+
+    def setUp(self):
+        self.output = io.StringIO()
+        self.engine = ShellEngine("ci", OverlayFileSystem(self.base), self.output)
+
+    def test_run_script(self):
+        self.engine.run_script(["cd home/user\n", "\n", "pwd\n", "ls\n"])
+        self.assertEqual(self.output.getvalue(), "ci:/home/user\nnotes.txt\n")
+        self.assertEqual(self.engine.history, ["cd home/user", "pwd", "ls"])
+
+    def test_exit_stops_script(self):
+        self.engine.run_script(["pwd", "exit", "ls"])
+        self.assertFalse(self.engine.running)
+        self.assertEqual(self.output.getvalue(), "ci:/\n")
+
+    def test_unknown_command(self):
+        self.engine.execute("rm -rf /")
+        self.assertEqual(self.output.getvalue(), "ci: команда не найдена\n")
+
+    def test_tokenize_quotes_and_escapes(self):
+        self.assertEqual(tokenize('touch "my file.txt" it\\\'s \'*\' # comment'),
+                         [("touch", False), ("my file.txt", False), ("it's", False), ("*", False)])
+        self.assertEqual(tokenize("ls *.txt"), [("ls", False), ("*.txt", True)])
+
+    def test_tokenize_unclosed_quote(self):
+        with self.assertRaises(ValueError):
+            tokenize('touch "broken')
+        self.engine.execute('touch "broken')
+        self.assertIn("незакрытая кавычка", self.output.getvalue())
+
+    def test_multiple_arguments_and_globs(self):
+        self.engine.execute("cd /home/user")
+        self.engine.execute('touch a.log b.log "c d.txt"')
+        self.engine.execute("chmod 600 *.log")
+        self.assertEqual(self.engine.fs.lookup("/home/user/a.log").mode, 0o600)
+        self.assertEqual(self.engine.fs.lookup("/home/user/b.log").mode, 0o600)
+        self.assertIsNotNone(self.engine.fs.lookup("/home/user/c d.txt"))
+        self.assertEqual(self.engine.expand_glob("/home/*/n*"), ["/home/user/notes.txt"])
+        self.assertEqual(self.engine.expand_glob("*.none"), ["*.none"])
+
+    def test_ls_recursive(self):
+        self.engine.execute("touch /home/new.txt")
+        self.output.truncate(0)
+        self.output.seek(0)
+        self.engine.execute("ls -R /home")
+        self.assertEqual(self.output.getvalue(), "/home:\nnew.txt\nuser\n\n/home/user:\nnotes.txt\n")
+
+    def test_find_filters(self):
+        self.engine.execute("touch /home/user/extra.log")
+        self.output.truncate(0)
+        self.output.seek(0)
+        self.engine.execute("find / -type f -name '*.txt'")
+        self.engine.execute("find /home -type d -maxdepth 1")
+        self.assertEqual(self.output.getvalue(), "/home/user/notes.txt\n/home\n/home/user\n")
+
+    def test_du_uses_precomputed_sizes(self):
+        self.assertEqual(self.base.lookup("/home").total_size, 4)
+        self.engine.execute("du -s /")
+        self.engine.execute("du /home")
+        self.assertEqual(self.output.getvalue(), "4\t/\n4\t/home\n4\t/home/user\n")
+
+    def test_cat_head_tail(self):
+        self.engine.execute("cat /home/user/notes.txt")
+        self.engine.execute("head -n 1 /home/user/notes.txt")
+        self.engine.execute("cat /home /missing")
+        self.assertEqual(self.output.getvalue(), "notenote"
+                         "cat: /home: Является директорией\n"
+                         "cat: /missing: Нет такого файла или директории\n")
+
+    def test_registry_is_shared(self):
+        self.assertLessEqual({"ls", "cd", "pwd", "exit", "touch", "chmod"}, set(COMMANDS))
+        self.assertIs(COMMANDS["ls"], ShellEngine.list_files)
+
+    def test_run_headless_to_file(self):
+        with open("test_engine_script.txt", "w", encoding="utf-8") as f:
+            f.write("touch a.txt\nchmod 600 a.txt\nls\n")
+        try:
+            run_headless("ci", self.archive_path, "test_engine_script.txt", "test_engine_output.txt")
+            with open("test_engine_output.txt", encoding="utf-8") as f:
+                output = f.read()
+        finally:
+            os.remove("test_engine_script.txt")
+            os.remove("test_engine_output.txt")
+            if os.path.exists(self.archive_path + ".idx"):
+                os.remove(self.archive_path + ".idx")
+        self.assertIn("Файл 'a.txt' создан.", output)
+        self.assertTrue(output.endswith("a.txt\nhome\n"))
+
+
+class TestStreamingCommands(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Файл крупнее одного блока чтения, чтобы tail читал его с конца в несколько шагов
+        cls.archive_path = "test_stream.tar"
+        cls.lines = [f"line {i}".encode() for i in range(2000)]
+        data = b"\n".join(cls.lines) + b"\n"
+        with tarfile.open(cls.archive_path, "w") as tar:
+            info = tarfile.TarInfo("var/log/big.log")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        cls.base = VirtualFileSystem(cls.archive_path, use_index_cache=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.archive_path)
+
+    def setUp(self):
+        self.output = io.StringIO()
+        self.engine = ShellEngine("ci", OverlayFileSystem(self.base), self.output)
+
+    def test_head(self):
+        self.engine.execute("head -n 3 /var/log/big.log")
+        self.assertEqual(self.output.getvalue(), "line 0\nline 1\nline 2\n")
+
+    def test_tail_reads_from_end(self):
+        offset = self.base.tail_offset("/var/log/big.log", 2, chunk_size=16)
+        self.assertEqual(self.base.read("/var/log/big.log", offset), b"line 1998\nline 1999\n")
+        self.engine.execute("tail -3 /var/log/big.log")
+        self.assertEqual(self.output.getvalue(), "line 1997\nline 1998\nline 1999\n")
+
+    def test_tail_more_lines_than_file(self):
+        self.engine.execute("touch /var/log/empty.log")
+        self.engine.execute("tail -n 5000 /var/log/big.log /var/log/empty.log")
+        output = self.output.getvalue()
+        self.assertTrue(output.startswith("Файл '/var/log/empty.log' создан.\n==> /var/log/big.log <==\nline 0\n"))
+        self.assertTrue(output.endswith("line 1999\n\n==> /var/log/empty.log <==\n"))
+
+    def test_cat_streams_chunks(self):
+        chunks = list(self.base.iter_chunks("/var/log/big.log", chunk_size=100))
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.engine.execute("cat /var/log/big.log")
+        self.assertEqual(self.output.getvalue().encode(), b"\n".join(self.lines) + b"\n")
+
+
+class TestCompressedImages(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = b"".join(f"record {i}\n".encode() for i in range(50000))
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            info = tarfile.TarInfo("data/records.txt")
+            info.size = len(cls.data)
+            tar.addfile(info, io.BytesIO(cls.data))
+        cls.tar_bytes = buffer.getvalue()
+
+        # gzip из двух членов и xz из двух потоков — как после склейки частей образа
+        half = len(cls.tar_bytes) // 2
+        with open("test_image.tar.gz", "wb") as f:
+            f.write(gzip.compress(cls.tar_bytes[:half]) + gzip.compress(cls.tar_bytes[half:]))
+        with open("test_image.tar.xz", "wb") as f:
+            f.write(lzma.compress(cls.tar_bytes[:half]) + lzma.compress(cls.tar_bytes[half:]))
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove("test_image.tar.gz")
+        os.remove("test_image.tar.xz")
+
+    def test_random_access_matches_raw(self):
+        for path in ("test_image.tar.gz", "test_image.tar.xz"):
+            with patch("compressed.CHECKPOINT_SPACING", 4096), open_image(path) as image:
+                self.assertIsInstance(image.raw, CheckpointReader)
+                for offset in (len(self.tar_bytes) - 700, 10, 300000, 150000, 0):
+                    image.seek(offset)
+                    self.assertEqual(image.read(600), self.tar_bytes[offset:offset + 600])
+
+    def test_gzip_checkpoints_recorded(self):
+        with patch("compressed.CHECKPOINT_SPACING", 4096), open_image("test_image.tar.gz") as image:
+            image.seek(len(self.tar_bytes) - 10)
+            self.assertGreater(len(image.raw.checkpoints), 1)
+
+    def test_xz_blocks_from_index(self):
+        with open_image("test_image.tar.xz") as image:
+            self.assertEqual([c.uoffset for c in image.raw.checkpoints], [0, len(self.tar_bytes) // 2])
+
+    def test_vfs_over_compressed_image(self):
+        for path in ("test_image.tar.gz", "test_image.tar.xz"):
+            fs = VirtualFileSystem(path, use_index_cache=False)
+            try:
+                offset = fs.tail_offset("/data/records.txt", 1)
+                self.assertEqual(fs.read("/data/records.txt", offset), b"record 49999\n")
+                self.assertEqual(fs.read("/data/records.txt", 0, 9), b"record 0\n")
+            finally:
+                fs.close()
+
+
+class TestShellServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.archive_path = "test_server.tar"
+        with tarfile.open(cls.archive_path, "w") as tar:
+            info = tarfile.TarInfo("srv/motd")
+            info.size = 6
+            tar.addfile(info, io.BytesIO(b"hello\n"))
+        cls.base = VirtualFileSystem(cls.archive_path, use_index_cache=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.base.close()
+        os.remove(cls.archive_path)
+
+    async def login(self, port, username):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await reader.readuntil(b"login: ")
+        writer.write(f"{username}\n".encode())
+        await reader.readuntil(b"$ ")
+        return reader, writer
+
+    async def run_command(self, session, command):
+        reader, writer = session
+        writer.write(f"{command}\n".encode())
+        output = await reader.readuntil(b"$ ")
+        return output.decode()
+
+    def test_sessions_share_image_but_not_state(self):
+        async def scenario():
+            server = ShellServer(self.base, "guest")
+            listener = await server.start(port=0)
+            port = listener.sockets[0].getsockname()[1]
+            try:
+                alice = await self.login(port, "alice")
+                bob = await self.login(port, "bob")
+                self.assertEqual(server.sessions, 2)
+
+                self.assertEqual(await self.run_command(alice, "cd srv"), "alice:/srv$ ")
+                await self.run_command(alice, "touch alice.txt")
+                self.assertEqual(await self.run_command(alice, "cat motd"), "hello\nalice:/srv$ ")
+                self.assertEqual(await self.run_command(bob, "ls /srv"), "motd\nbob:/$ ")
+                self.assertEqual(await self.run_command(bob, "pwd"), "bob:/\nbob:/$ ")
+
+                for reader, writer in (alice, bob):
+                    writer.write(b"exit\n")
+                    self.assertEqual(await reader.read(), b"")
+                    writer.close()
+            finally:
+                listener.close()
+                await listener.wait_closed()
+
+        asyncio.run(scenario())
+        self.assertEqual(self.base.listdir("/srv"), ["motd"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,416 @@
+import hashlib
+import json
+import os
+import posixpath
+import tarfile
+import threading
+import time
+from compressed import open_image
+
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+SIGNATURE_BLOCK = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class VirtualNode:
+    __slots__ = ("name", "parent", "is_dir", "mode", "size", "mtime", "offset", "children", "total_size")
+
+    def __init__(self, name, parent=None, is_dir=False, mode=0o644, size=0, mtime=0, offset=None):
+        self.name = name
+        self.parent = parent
+        self.is_dir = is_dir
+        self.mode = mode
+        self.size = size
+        self.mtime = mtime
+        self.offset = offset
+        self.children = {} if is_dir else None
+        self.total_size = size
+
+    @property
+    def path(self):
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return "/" + "/".join(reversed(parts))
+
+
+class NodeQueries:
+    """Общие запросы к дереву; наследнику достаточно определить lookup и children."""
+
+    def get_node(self, path):
+        node = self.lookup(path)
+        if node is None:
+            raise FileNotFoundError(f"Нет такого файла или директории: {path}")
+        return node
+
+    def get_dir(self, path):
+        node = self.get_node(path)
+        if not node.is_dir:
+            raise NotADirectoryError(f"Не является директорией: {path}")
+        return node
+
+    def isdir(self, path):
+        node = self.lookup(path)
+        return node is not None and node.is_dir
+
+    def get_file(self, path):
+        node = self.get_node(path)
+        if node.is_dir:
+            raise IsADirectoryError(f"Является директорией: {path}")
+        return node
+
+    def read(self, path, offset=0, size=-1):
+        offset = max(offset, 0)
+        end = None if size < 0 else offset + size
+        return b"".join(self.iter_chunks(path, offset, end))
+
+    def walk(self, path, max_depth=None):
+        """Обходит поддерево в прямом порядке, выдавая пары (путь относительно path, узел)."""
+        path = self.resolve("/", path)
+        stack = [("", self.get_node(path), 0)]
+
+        while stack:
+            relative, node, depth = stack.pop()
+            yield relative, node
+            if node.is_dir and (max_depth is None or depth < max_depth):
+                node_path = posixpath.join(path, relative) if relative else path
+                for name, child in reversed(self.children(node_path, node)):
+                    stack.append((posixpath.join(relative, name) if relative else name, child, depth + 1))
+
+
+class VirtualFileSystem(NodeQueries):
+    """Дерево виртуальной файловой системы, построенное по индексу tar-архива без распаковки."""
+
+    def __init__(self, archive_path=None, use_index_cache=True):
+        self.archive_path = archive_path
+        self.use_index_cache = use_index_cache
+        self.root = VirtualNode("", is_dir=True, mode=0o755)
+        self.image = None
+        self.image_lock = threading.Lock()
+
+        if archive_path:
+            self.load_index()
+
+    @property
+    def index_path(self):
+        return self.archive_path + INDEX_SUFFIX
+
+    def load_index(self):
+        entries = self.read_index_cache() if self.use_index_cache else None
+        if entries is None:
+            entries = self.scan_archive()
+            if self.use_index_cache:
+                self.write_index_cache(entries)
+        self.build_tree(entries)
+
+    def open_image(self):
+        # Один открытый образ на дерево: точки распаковки сжатого архива переживают отдельные чтения
+        with self.image_lock:
+            if self.image is None:
+                self.image = open_image(self.archive_path)
+            return self.image
+
+    def close(self):
+        with self.image_lock:
+            if self.image is not None:
+                self.image.close()
+                self.image = None
+
+    def read_image(self, offset, size):
+        image = self.open_image()
+        with self.image_lock:
+            image.seek(offset)
+            return image.read(size)
+
+    def scan_archive(self):
+        entries = []
+        with tarfile.open(fileobj=self.open_image(), mode="r:") as tar:
+            for member in tar:
+                if member.isdir():
+                    kind = "d"
+                elif member.isreg():
+                    kind = "f"
+                elif member.islnk():
+                    kind = "l"
+                else:
+                    kind = "o"
+                entries.append([member.name, kind, member.mode, member.size, member.mtime,
+                                member.offset_data, member.linkname])
+        return entries
+
+    def archive_signature(self):
+        stat = os.stat(self.archive_path)
+        digest = hashlib.sha256()
+        with open(self.archive_path, "rb") as file:
+            digest.update(file.read(SIGNATURE_BLOCK))
+            if stat.st_size > SIGNATURE_BLOCK:
+                file.seek(max(stat.st_size - SIGNATURE_BLOCK, SIGNATURE_BLOCK))
+                digest.update(file.read())
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest.hexdigest()}
+
+    def read_index_cache(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if index.get("version") != INDEX_VERSION or index.get("signature") != self.archive_signature():
+            return None
+        return index.get("entries")
+
+    def write_index_cache(self, entries):
+        index = {"version": INDEX_VERSION, "signature": self.archive_signature(), "entries": entries}
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(index, file, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            # Индекс — только ускорение: архив в каталоге без прав на запись открывается и без него
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def build_tree(self, entries):
+        links = []
+
+        for name, kind, mode, size, mtime, offset, linkname in entries:
+            parts = self.split_path(name)
+            if kind == "d":
+                node = self.makedirs("/" + "/".join(parts))
+                node.mode = mode
+                node.mtime = mtime
+                continue
+
+            if not parts:
+                continue
+            parent = self.makedirs("/" + "/".join(parts[:-1]))
+            node = VirtualNode(parts[-1], parent, mode=mode, mtime=mtime)
+            if kind == "f":
+                node.size = size
+                node.offset = offset
+            elif kind == "l":
+                links.append((node, linkname))
+            parent.children[node.name] = node
+
+        for node, linkname in links:
+            target = self.lookup("/" + "/".join(self.split_path(linkname)))
+            if target is not None and not target.is_dir:
+                node.size = target.size
+                node.offset = target.offset
+
+        self.compute_sizes()
+
+    def compute_sizes(self):
+        # Размеры поддеревьев считаются один раз при загрузке, чтобы du не обходил дерево заново
+        order = [self.root]
+        for node in order:
+            if node.is_dir:
+                order.extend(node.children.values())
+
+        for node in reversed(order):
+            if node.is_dir:
+                node.total_size = sum(child.total_size for child in node.children.values())
+            else:
+                node.total_size = node.size
+
+    @staticmethod
+    def split_path(path):
+        return [part for part in posixpath.normpath("/" + path).split("/") if part]
+
+    @staticmethod
+    def resolve(current_path, path):
+        if not path.startswith("/"):
+            path = posixpath.join(current_path, path)
+        return "/" + "/".join(VirtualFileSystem.split_path(path))
+
+    def lookup(self, path):
+        node = self.root
+        for part in self.split_path(path):
+            if not node.is_dir:
+                return None
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def listdir(self, path):
+        return sorted(self.get_dir(path).children)
+
+    def children(self, path, node):
+        return sorted(node.children.items())
+
+    def makedirs(self, path):
+        node = self.root
+        for part in self.split_path(path):
+            child = node.children.get(part)
+            if child is None:
+                child = VirtualNode(part, node, is_dir=True, mode=0o755)
+                node.children[part] = child
+            elif not child.is_dir:
+                raise NotADirectoryError(f"Не является директорией: {child.path}")
+            node = child
+        return node
+
+    def iter_chunks(self, path, start=0, end=None, chunk_size=CHUNK_SIZE):
+        """Читает данные файла из архива кусками не больше chunk_size байт."""
+        node = self.get_file(path)
+        end = node.size if end is None else min(end, node.size)
+        if node.offset is None or start >= end:
+            return
+
+        position = start
+        while position < end:
+            chunk = self.read_image(node.offset + position, min(chunk_size, end - position))
+            if not chunk:
+                break
+            position += len(chunk)
+            yield chunk
+
+    def tail_offset(self, path, lines, chunk_size=CHUNK_SIZE):
+        """Возвращает смещение начала последних lines строк, читая файл с конца."""
+        node = self.get_file(path)
+        if node.offset is None or lines <= 0:
+            return node.size
+
+        newlines = 0
+        position = node.size
+        while position > 0:
+            start = max(0, position - chunk_size)
+            chunk = self.read_image(node.offset + start, position - start)
+
+            end = len(chunk)
+            if position == node.size and chunk.endswith(b"\n"):
+                # Завершающий перевод строки не начинает новую строку
+                end -= 1
+            index = chunk.rfind(b"\n", 0, end)
+            while index != -1:
+                newlines += 1
+                if newlines == lines:
+                    return start + index + 1
+                index = chunk.rfind(b"\n", 0, index)
+            position = start
+        return 0
+
+
+class OverlayFileSystem(NodeQueries):
+    """Слой копирования при записи поверх неизменяемого дерева архива."""
+
+    def __init__(self, base, journal_path=None):
+        self.base = base
+        self.journal_path = journal_path
+        self.nodes = {}
+        self.entries = {}
+
+        if journal_path and os.path.exists(journal_path):
+            self.load_journal()
+
+    split_path = staticmethod(VirtualFileSystem.split_path)
+    resolve = staticmethod(VirtualFileSystem.resolve)
+
+    @property
+    def archive_path(self):
+        return self.base.archive_path
+
+    def lookup(self, path):
+        path = self.resolve("/", path)
+        node = self.nodes.get(path)
+        if node is not None:
+            return node
+        return self.base.lookup(path)
+
+    def listdir(self, path):
+        path = self.resolve("/", path)
+        names = set(self.get_dir(path).children)
+        names.update(self.entries.get(path, ()))
+        return sorted(names)
+
+    def children(self, path, node):
+        names = self.entries.get(path)
+        if not names:
+            return sorted(node.children.items())
+
+        children = dict(node.children)
+        for name in names:
+            children[name] = self.nodes[posixpath.join(path, name)]
+        return sorted(children.items())
+
+    def add_node(self, path, node):
+        self.nodes[path] = node
+        if path != "/":
+            parent_path, name = posixpath.split(path)
+            self.entries.setdefault(parent_path, set()).add(name)
+
+    def copy_node(self, path):
+        node = self.nodes.get(path)
+        if node is None:
+            base_node = self.base.get_node(path)
+            node = VirtualNode(base_node.name, base_node.parent, base_node.is_dir, base_node.mode,
+                               base_node.size, base_node.mtime, base_node.offset)
+            node.children = base_node.children
+            node.total_size = base_node.total_size
+            self.add_node(path, node)
+        return node
+
+    def touch(self, path, mtime=None):
+        path = self.resolve("/", path)
+        parts = self.split_path(path)
+        if not parts:
+            raise IsADirectoryError("Нельзя создать корневую директорию")
+
+        parent_path = "/" + "/".join(parts[:-1])
+        parent = self.get_dir(parent_path)
+        if mtime is None:
+            mtime = int(time.time())
+
+        if self.lookup(path) is None:
+            self.add_node(path, VirtualNode(parts[-1], parent, mtime=mtime))
+        else:
+            self.copy_node(path).mtime = mtime
+
+        self.write_journal({"op": "touch", "path": path, "mtime": mtime})
+        return self.nodes[path]
+
+    def chmod(self, path, mode):
+        path = self.resolve("/", path)
+        node = self.copy_node(path)
+        node.mode = mode
+        self.write_journal({"op": "chmod", "path": path, "mode": mode})
+        return node
+
+    def iter_chunks(self, path, start=0, end=None, chunk_size=CHUNK_SIZE):
+        if self.get_file(path).offset is None:
+            return iter(())
+        return self.base.iter_chunks(path, start, end, chunk_size)
+
+    def tail_offset(self, path, lines, chunk_size=CHUNK_SIZE):
+        node = self.get_file(path)
+        if node.offset is None:
+            return node.size
+        return self.base.tail_offset(path, lines, chunk_size)
+
+    def write_journal(self, record):
+        if self.journal_path:
+            with open(self.journal_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def load_journal(self):
+        journal_path, self.journal_path = self.journal_path, None
+        try:
+            with open(journal_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    record = json.loads(line)
+                    try:
+                        if record["op"] == "touch":
+                            self.touch(record["path"], record["mtime"])
+                        elif record["op"] == "chmod":
+                            self.chmod(record["path"], record["mode"])
+                    except OSError:
+                        # Запись журнала относится к другому образу — пропускаем её
+                        continue
+        finally:
+            self.journal_path = journal_path
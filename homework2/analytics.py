@@ -0,0 +1,336 @@
+import argparse
+import heapq
+import re
+import sys
+from array import array
+
+try:
+    from . import visualizer
+    from . import graph_cache
+except ImportError:
+    import visualizer
+    import graph_cache
+
+
+PARENT_ONE = 1
+PARENT_TWO = 2
+STALE = 4
+REF_PREFIXES = ('', 'refs/heads/', 'refs/tags/', 'refs/remotes/')
+# Суффиксы `~N` (N-й предок по первым родителям) и `^N` (N-й родитель), как в git
+REVISION_PATTERN = re.compile(r'(.+?)((?:[~^]\d*)*)')
+SUFFIX_PATTERN = re.compile(r'([~^])(\d*)')
+
+
+class CommitAnalytics:
+    """
+    Запросы к графу коммитов: предки, потомки, общий предок, коммиты по веткам.
+
+    Топологический порядок и номера поколений вычисляются один раз при создании.
+    Номер поколения корня равен 1, у остальных коммитов он на единицу больше
+    наибольшего номера родителей. Предок всегда имеет меньший номер, чем потомок,
+    поэтому поиск предка может не заходить в коммиты со слишком маленьким номером.
+    """
+
+    __slots__ = ('graph', 'order', 'generation')
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.order = graph.topological_order()
+        self.generation = array('I', bytes(4 * len(graph)))
+        for node in self.order:
+            parents = graph.parents(node)
+            self.generation[node] = 1 + max((self.generation[parent] for parent in parents), default=0)
+
+    def resolve(self, name, tips=None):
+        """
+        Находит коммит по имени ссылки, полному или сокращённому хешу.
+
+        После имени можно указать суффиксы, как в git: `~N` — N-й предок по первым
+        родителям (`~` — то же, что `~1`), `^N` — N-й родитель (`^` — первый, `^0` —
+        сам коммит). Суффиксы применяются слева направо: `main~2^2`.
+
+        Аргументы:
+            name (str): Ветка, тег, `HEAD` или хеш, возможно с суффиксами.
+            tips (dict): Ссылки репозитория и хеши их коммитов.
+
+        Возвращает:
+            int: Номер коммита в графе.
+
+        Исключения:
+            KeyError: Коммит не найден, сокращённый хеш неоднозначен или у коммита
+                нет нужного родителя.
+        """
+        base, suffixes = REVISION_PATTERN.fullmatch(name).groups()
+        node = self.find_commit(base, tips)
+        for operator, number in SUFFIX_PATTERN.findall(suffixes):
+            count = int(number) if number else 1
+            if operator == '~':
+                for _ in range(count):
+                    parents = self.graph.parents(node)
+                    if not parents:
+                        raise KeyError(f"У коммита {self.graph.name(node)} нет родителя ({name})")
+                    node = parents[0]
+            elif count:
+                parents = self.graph.parents(node)
+                if len(parents) < count:
+                    raise KeyError(f"У коммита {self.graph.name(node)} нет родителя номер {count} ({name})")
+                node = parents[count - 1]
+        return node
+
+    def find_commit(self, name, tips=None):
+        """Находит коммит по имени ссылки, полному или сокращённому хешу (без суффиксов)."""
+        for prefix in REF_PREFIXES:
+            if tips and prefix + name in tips:
+                node = self.graph.find(tips[prefix + name])
+                if node is not None:
+                    return node
+
+        node = self.graph.find(name)
+        if node is not None:
+            return node
+
+        matches = self.graph.find_prefix(name) if len(name) >= 4 else []
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            raise KeyError(f"Сокращённый хеш {name} неоднозначен")
+        raise KeyError(f"Коммит {name} не найден")
+
+    def walk(self, start, step, min_generation=0):
+        """
+        Обходит граф от коммитов start по связям step (родители или дети).
+
+        Аргументы:
+            start (iterable): Номера начальных коммитов.
+            step (callable): Функция, возвращающая соседей коммита.
+            min_generation (int): Коммиты с меньшим номером поколения не посещаются.
+
+        Возвращает:
+            bytearray: Отметки посещённых коммитов.
+        """
+        visited = bytearray(len(self.graph))
+        stack = [node for node in start if self.generation[node] >= min_generation and not visited[node]]
+        for node in stack:
+            visited[node] = 1
+        while stack:
+            node = stack.pop()
+            for neighbour in step(node):
+                if not visited[neighbour] and self.generation[neighbour] >= min_generation:
+                    visited[neighbour] = 1
+                    stack.append(neighbour)
+        return visited
+
+    def ancestors(self, node):
+        """Возвращает предков коммита (включая его самого) в топологическом порядке."""
+        visited = self.walk([node], self.graph.parents)
+        return [other for other in self.order if visited[other]]
+
+    def descendants(self, node):
+        """Возвращает потомков коммита (включая его самого) в топологическом порядке."""
+        visited = self.walk([node], self.graph.children)
+        return [other for other in self.order if visited[other]]
+
+    def is_ancestor(self, ancestor, node):
+        """
+        Проверяет, достижим ли ancestor из node по родителям.
+
+        Обход не заходит в коммиты с номером поколения меньше, чем у ancestor.
+        """
+        if self.generation[ancestor] > self.generation[node]:
+            return False
+        stack = [node]
+        visited = {node}
+        target = self.generation[ancestor]
+        while stack:
+            current = stack.pop()
+            if current == ancestor:
+                return True
+            for parent in self.graph.parents(current):
+                if parent not in visited and self.generation[parent] >= target:
+                    visited.add(parent)
+                    stack.append(parent)
+        return False
+
+    def merge_base(self, first, second):
+        """
+        Находит лучших общих предков двух коммитов, как `git merge-base --all`.
+
+        Коммиты обходятся по убыванию номера поколения с отметками «предок первого»
+        и «предок второго». Обход прекращается, когда в очереди остаются только
+        предки уже найденных общих коммитов (с отметкой STALE); как и в git, число
+        остальных коммитов в очереди хранится счётчиком, а не пересчитывается на каждом шаге.
+
+        Родитель всегда имеет меньший номер поколения, чем потомок, поэтому к моменту,
+        когда коммит достают из очереди, все его потомки уже обработаны: каждый коммит
+        попадает в очередь один раз, а его отметки дополняются на месте.
+
+        Возвращает:
+            list: Номера общих предков, ни один из которых не является предком другого.
+        """
+        if first == second:
+            return [first]
+
+        flags = {first: PARENT_ONE, second: PARENT_TWO}
+        queue = [(-self.generation[first], first), (-self.generation[second], second)]
+        heapq.heapify(queue)
+        nonstale = 2  # Коммиты в очереди без отметки STALE
+        candidates = []
+
+        while nonstale:
+            _, node = heapq.heappop(queue)
+            node_flags = flags[node]
+            if not node_flags & STALE:
+                nonstale -= 1
+                if node_flags & (PARENT_ONE | PARENT_TWO) == PARENT_ONE | PARENT_TWO:
+                    candidates.append(node)
+                    node_flags |= STALE
+            for parent in self.graph.parents(node):
+                parent_flags = flags.get(parent)
+                if parent_flags is None:
+                    flags[parent] = node_flags
+                    heapq.heappush(queue, (-self.generation[parent], parent))
+                    if not node_flags & STALE:
+                        nonstale += 1
+                elif parent_flags & node_flags != node_flags:
+                    flags[parent] = parent_flags | node_flags
+                    if node_flags & STALE and not parent_flags & STALE:
+                        nonstale -= 1
+
+        return [node for node in candidates
+                if not any(other != node and self.is_ancestor(node, other) for other in candidates)]
+
+    def commits_per_branch(self, tips, base=None):
+        """
+        Считает коммиты каждой ветки: всего и отсутствующих в базовой ветке.
+
+        Все ветки обходятся за один проход от потомков к родителям: у каждого коммита
+        есть битовая маска веток (и базовой ветки), из которых он достижим. Маска
+        хранится, только пока не обработаны все дети коммита, а коммиты считаются
+        по одинаковым маскам, поэтому граф не обходится заново для каждой ветки.
+
+        Аргументы:
+            tips (dict): Ссылки и хеши их коммитов.
+            base (str): Базовая ветка или хеш; по умолчанию `HEAD`.
+
+        Возвращает:
+            dict: Имя ссылки и пара (всего коммитов, коммитов вне базовой ветки).
+        """
+        base_node = self.resolve(base or 'HEAD', tips)
+        names = []
+        start = {}  # Коммит и биты веток, которые на него указывают
+        for name, sha in sorted(tips.items()):
+            node = self.graph.find(sha)
+            if node is not None:
+                start[node] = start.get(node, 0) | 1 << len(names)
+                names.append(name)
+        base_bit = 1 << len(names)
+        start[base_node] = start.get(base_node, 0) | base_bit
+
+        masks = {}  # Маски коммитов, у которых ещё не все дети обработаны
+        mask_counts = {}  # Маска и число коммитов с ней
+        for node in reversed(self.order):
+            mask = masks.pop(node, 0) | start.get(node, 0)
+            if not mask:
+                continue
+            mask_counts[mask] = mask_counts.get(mask, 0) + 1
+            for parent in self.graph.parents(node):
+                masks[parent] = masks.get(parent, 0) | mask
+
+        counts = {}
+        for i, name in enumerate(names):
+            bit = 1 << i
+            total = sum(count for mask, count in mask_counts.items() if mask & bit)
+            ahead = sum(count for mask, count in mask_counts.items() if mask & bit and not mask & base_bit)
+            counts[name] = (total, ahead)
+        return counts
+
+def parse_arguments(argv=None):
+    """
+    Разбирает аргументы командной строки для запросов к графу.
+
+    Аргументы:
+        argv (list): Аргументы; по умолчанию берутся из `sys.argv`.
+
+    Возвращает:
+        argparse.Namespace: Разобранные аргументы.
+    """
+    parser = argparse.ArgumentParser(description="Запросы к графу коммитов Git.")
+    parser.add_argument('repo_path', help="Путь к репозиторию.")
+    parser.add_argument('--backend', choices=['auto', 'native', 'git'], default='auto',
+                        help="Способ чтения коммитов.")
+    parser.add_argument('--cache', nargs='?', const=graph_cache.DEFAULT_CACHE_DIR, default=None, metavar='DIR',
+                        help="Каталог кэша графа коммитов.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('ancestors', "Предки коммита."), ('descendants', "Потомки коммита.")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('commit')
+        command.add_argument('--count', action='store_true', help="Вывести только число коммитов.")
+
+    command = commands.add_parser('merge-base', help="Лучшие общие предки двух коммитов.")
+    command.add_argument('first')
+    command.add_argument('second')
+
+    command = commands.add_parser('is-ancestor', help="Является ли первый коммит предком второго.")
+    command.add_argument('ancestor')
+    command.add_argument('commit')
+
+    command = commands.add_parser('branches', help="Число коммитов в каждой ветке.")
+    command.add_argument('--base', help="Базовая ветка для подсчёта отличающихся коммитов (по умолчанию HEAD).")
+
+    commands.add_parser('topo', help="Коммиты в топологическом порядке с номерами поколений.")
+    return parser.parse_args(argv)
+
+
+def run(args, output=sys.stdout):
+    """
+    Выполняет запрос и печатает результат.
+
+    Аргументы:
+        args (argparse.Namespace): Аргументы из `parse_arguments`.
+        output: Поток для вывода.
+
+    Возвращает:
+        int: Код завершения (для is-ancestor — 1, если коммит не является предком).
+    """
+    graph = visualizer.load_commit_graph(args.repo_path, args.backend, args.cache)
+    analytics = CommitAnalytics(graph)
+    tips = graph_cache.read_ref_tips(args.repo_path, args.backend)
+
+    if args.command in ('ancestors', 'descendants'):
+        node = analytics.resolve(args.commit, tips)
+        nodes = getattr(analytics, args.command)(node)
+        if args.count:
+            output.write(f"{len(nodes)}\n")
+        else:
+            for other in nodes:
+                output.write(f"{graph.name(other)}\n")
+    elif args.command == 'merge-base':
+        for node in analytics.merge_base(analytics.resolve(args.first, tips), analytics.resolve(args.second, tips)):
+            output.write(f"{graph.name(node)}\n")
+    elif args.command == 'is-ancestor':
+        return 0 if analytics.is_ancestor(analytics.resolve(args.ancestor, tips),
+                                          analytics.resolve(args.commit, tips)) else 1
+    elif args.command == 'branches':
+        for name, (total, ahead) in analytics.commits_per_branch(tips, args.base).items():
+            output.write(f"{name}\t{total}\t+{ahead}\n")
+    elif args.command == 'topo':
+        for node in analytics.order:
+            output.write(f"{analytics.generation[node]}\t{graph.name(node)}\n")
+    return 0
+
+
+def main():
+    """Точка входа: `python analytics.py <репозиторий> <команда> ...`."""
+    args = parse_arguments()
+    try:
+        code = run(args)
+    except (KeyError, RuntimeError) as e:
+        message = e.args[0] if isinstance(e, KeyError) and e.args else e
+        print(f"Ошибка: {message}")
+        sys.exit(2)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+
+
+LAYOUT_ENGINES = ('dot', 'sfdp', 'neato', 'fdp', 'twopi', 'circo')
+IMAGE_FORMATS = ('png', 'svg', 'pdf')
+SOURCE_FORMAT = 'dot'
+FORMATS = IMAGE_FORMATS + (SOURCE_FORMAT,)
+DEFAULT_ENGINE = 'dot'
+DEFAULT_FALLBACK = 'sfdp'
+LARGE_GRAPH_NODES = 5000
+
+
+class RenderTimeout(RuntimeError):
+    """Программа раскладки не уложилась в отведённое время."""
+
+
+class RenderResult:
+    __slots__ = ('output_format', 'output_path', 'engine', 'seconds', 'error')
+
+    def __init__(self, output_format, output_path, engine, seconds, error=None):
+        self.output_format = output_format
+        self.output_path = output_path
+        self.engine = engine
+        self.seconds = seconds
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class RenderBackend(ABC):
+    """
+    Способ получить файл заданного формата из кода Graphviz.
+
+    Наследники задают поддерживаемые форматы и команду запуска; `render` читает код
+    из файла, а `command` нужна для передачи кода через стандартный ввод.
+    """
+
+    name = None
+    formats = ()
+
+    def command(self, output_format, output_path):
+        """Возвращает команду, читающую код Graphviz со стандартного ввода, или None."""
+        return None
+
+    @abstractmethod
+    def render(self, dot_path, output_format, output_path, timeout=None):
+        """
+        Создаёт файл по коду Graphviz из dot_path.
+
+        Исключения:
+            RenderTimeout: Время ожидания истекло.
+            RuntimeError: Программа раскладки завершилась с ошибкой.
+        """
+
+
+class GraphvizBackend(RenderBackend):
+    """Раскладка и отрисовка одной из программ Graphviz (dot, sfdp, neato...)."""
+
+    formats = IMAGE_FORMATS
+
+    def __init__(self, engine=DEFAULT_ENGINE):
+        if engine not in LAYOUT_ENGINES:
+            raise ValueError(f"Неизвестная программа раскладки: {engine}")
+        self.name = engine
+
+    def command(self, output_format, output_path):
+        return [self.name, f'-T{output_format}', '-o', output_path]
+
+    def render(self, dot_path, output_format, output_path, timeout=None):
+        try:
+            result = subprocess.run(
+                self.command(output_format, output_path) + [dot_path],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            raise RenderTimeout(f"{self.name} не уложился в {timeout} с")
+
+        if result.returncode != 0:
+            raise RuntimeError(f"Ошибка при генерации {output_format.upper()}: {result.stderr}")
+
+
+class SourceBackend(RenderBackend):
+    """Сохраняет сам код Graphviz без раскладки."""
+
+    name = 'source'
+    formats = (SOURCE_FORMAT,)
+
+    def render(self, dot_path, output_format, output_path, timeout=None):
+        shutil.copyfile(dot_path, output_path)
+
+
+def get_backend(engine, output_format):
+    """
+    Выбирает способ отрисовки для формата.
+
+    Аргументы:
+        engine (str): Программа раскладки Graphviz.
+        output_format (str): Формат файла: png, svg, pdf или dot.
+
+    Возвращает:
+        RenderBackend: Подходящий способ отрисовки.
+
+    Исключения:
+        ValueError: Формат или программа не поддерживаются.
+    """
+    if output_format == SOURCE_FORMAT:
+        return SourceBackend()
+    if output_format not in IMAGE_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат: {output_format}")
+    return GraphvizBackend(engine)
+
+
+def choose_engine(node_count, engine='auto'):
+    """
+    Выбирает программу раскладки: для больших графов `dot` слишком медленный.
+
+    Аргументы:
+        node_count (int): Число узлов графа.
+        engine (str): Программа раскладки или 'auto'.
+
+    Возвращает:
+        str: Программа раскладки.
+    """
+    if engine != 'auto':
+        return engine
+    return DEFAULT_ENGINE if node_count <= LARGE_GRAPH_NODES else DEFAULT_FALLBACK
+
+
+def format_of(output_path):
+    """Определяет формат файла по расширению; по умолчанию — PNG."""
+    extension = os.path.splitext(output_path)[1].lstrip('.').lower()
+    return extension if extension in FORMATS else 'png'
+
+
+def output_paths(output_path, formats):
+    """
+    Составляет пути для всех форматов: расширение заменяется, имя остаётся.
+
+    Аргументы:
+        output_path (str): Путь, заданный пользователем.
+        formats (list): Форматы файлов.
+
+    Возвращает:
+        list: Пары (формат, путь).
+    """
+    base, extension = os.path.splitext(output_path)
+    if extension.lstrip('.').lower() not in FORMATS:
+        base = output_path
+    outputs = []
+    for output_format in formats:
+        path = output_path if format_of(output_path) == output_format else f"{base}.{output_format}"
+        outputs.append((output_format, path))
+    return outputs
+
+
+def render_with_fallback(render, engine, fallback):
+    """
+    Вызывает render(engine), а при ошибке или превышении времени — render(fallback).
+
+    Аргументы:
+        render (callable): Отрисовка программой раскладки.
+        engine (str): Основная программа.
+        fallback (str): Запасная программа или None.
+
+    Возвращает:
+        str: Программа, которой удалось отрисовать граф.
+    """
+    try:
+        render(engine)
+        return engine
+    except RuntimeError:
+        if not fallback or fallback == engine:
+            raise
+    render(fallback)
+    return fallback
+
+
+def render_file(dot_path, output_format, output_path, engine=DEFAULT_ENGINE, timeout=None, fallback=DEFAULT_FALLBACK):
+    """
+    Отрисовывает один файл; выполняется в отдельном процессе пула.
+
+    Аргументы:
+        dot_path (str): Файл с кодом Graphviz.
+        output_format (str): Формат результата.
+        output_path (str): Путь к результату.
+        engine (str): Программа раскладки.
+        timeout (float): Время ожидания одной попытки в секундах или None.
+        fallback (str): Запасная, более быстрая программа раскладки или None.
+
+    Возвращает:
+        RenderResult: Итог отрисовки; ошибка не выбрасывается, а записывается в результат.
+    """
+    start = time.perf_counter()
+    try:
+        used = render_with_fallback(
+            lambda name: get_backend(name, output_format).render(dot_path, output_format, output_path, timeout),
+            engine, None if output_format == SOURCE_FORMAT else fallback)
+        return RenderResult(output_format, output_path, used, time.perf_counter() - start)
+    except (RuntimeError, ValueError, OSError) as e:
+        return RenderResult(output_format, output_path, engine, time.perf_counter() - start, str(e))
+
+
+def render_outputs(write_source, outputs, engine=DEFAULT_ENGINE, timeout=None, fallback=DEFAULT_FALLBACK, workers=None):
+    """
+    Отрисовывает граф в несколько форматов одновременно в пуле процессов.
+
+    Код Graphviz один раз записывается во временный файл, который читают все отрисовки.
+
+    Аргументы:
+        write_source (callable): Записывает код Graphviz в переданный текстовый файл.
+        outputs (list): Пары (формат, путь).
+        engine (str): Программа раскладки.
+        timeout (float): Время ожидания одной попытки в секундах или None.
+        fallback (str): Запасная программа раскладки или None.
+        workers (int): Число процессов; по умолчанию по числу файлов.
+
+    Возвращает:
+        list: RenderResult для каждого файла в порядке outputs.
+    """
+    descriptor, dot_path = tempfile.mkstemp(suffix='.dot')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            write_source(file)
+
+        with ProcessPoolExecutor(max_workers=workers or len(outputs)) as pool:
+            futures = [pool.submit(render_file, dot_path, output_format, output_path, engine, timeout, fallback)
+                       for output_format, output_path in outputs]
+            return [future.result() for future in futures]
+    finally:
+        os.remove(dot_path)
@@ -0,0 +1,155 @@
+import os
+import shlex
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+try:
+    from . import visualizer
+    from . import backends
+except ImportError:
+    import visualizer
+    import backends
+
+
+class BatchJob:
+    """Один репозиторий из манифеста и итог его обработки."""
+
+    __slots__ = ('repo_path', 'output_path', 'nodes', 'extract_seconds', 'render_seconds', 'results', 'error')
+
+    def __init__(self, repo_path, output_path):
+        self.repo_path = repo_path
+        self.output_path = output_path
+        self.nodes = None
+        self.extract_seconds = None
+        self.render_seconds = None
+        self.results = []
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None and all(result.ok for result in self.results)
+
+
+def read_manifest(path):
+    """
+    Читает манифест: в каждой строке путь к репозиторию и путь к изображению.
+
+    Пути с пробелами берутся в кавычки; пустые строки и строки с `#` пропускаются.
+
+    Аргументы:
+        path (str): Путь к манифесту.
+
+    Возвращает:
+        list: Задания BatchJob в порядке манифеста.
+
+    Исключения:
+        ValueError: Строка манифеста не содержит двух путей.
+    """
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            fields = shlex.split(line, comments=True)
+            if not fields:
+                continue
+            if len(fields) != 2:
+                raise ValueError(f"{path}:{number}: ожидается '<репозиторий> <изображение>'")
+            jobs.append(BatchJob(*fields))
+    return jobs
+
+
+def extract(repo_path, args):
+    """
+    Читает граф одного репозитория; выполняется в процессе пула извлечения.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        args (argparse.Namespace): Аргументы командной строки.
+
+    Возвращает:
+        tuple: Граф коммитов и время чтения в секундах.
+    """
+    start = time.perf_counter()
+    if not os.path.isdir(repo_path):
+        raise RuntimeError(f"Репозиторий {repo_path} не найден.")
+    graph = visualizer.build_graph(repo_path, args)
+    return graph, time.perf_counter() - start
+
+
+def render(job, graph, args):
+    """Отрисовывает граф задания; выполняется в потоке пула отрисовки, сами программы — отдельные процессы."""
+    start = time.perf_counter()
+    engine = backends.choose_engine(len(graph), args.engine)
+    fallback = visualizer.render_fallback(args)
+    for output in visualizer.output_targets(job.output_path, args):
+        job.results.extend(visualizer.render_graph(graph, [output], engine, args.timeout, fallback))
+    job.render_seconds = time.perf_counter() - start
+
+
+def run_batch(jobs, args, extract_workers=None, render_workers=None):
+    """
+    Обрабатывает все задания: чтение графов и отрисовка идут в разных пулах.
+
+    Чтение — работа Python, поэтому идёт в пуле процессов. Отрисовку выполняют
+    внешние программы Graphviz, и пул потоков ограничивает число одновременно
+    запущенных `dot`. Граф отдаётся на отрисовку, как только прочитан; ошибка
+    одного репозитория не останавливает остальные.
+
+    Аргументы:
+        jobs (list): Задания BatchJob.
+        args (argparse.Namespace): Аргументы командной строки.
+        extract_workers (int): Число процессов чтения.
+        render_workers (int): Число одновременных отрисовок.
+
+    Возвращает:
+        list: Те же задания с заполненными временами и ошибками.
+    """
+    with ProcessPoolExecutor(max_workers=extract_workers) as extractors, \
+            ThreadPoolExecutor(max_workers=render_workers or os.cpu_count()) as renderers:
+        pending = {}
+        for job in jobs:
+            pending[extractors.submit(extract, job.repo_path, args)] = job
+
+        renders = []
+        for future in as_completed(pending):
+            job = pending[future]
+            try:
+                graph, job.extract_seconds = future.result()
+            except Exception as e:
+                job.error = str(e)
+                continue
+            job.nodes = len(graph)
+            renders.append((renderers.submit(render, job, graph, args), job))
+
+        for future, job in renders:
+            try:
+                future.result()
+            except Exception as e:
+                job.error = str(e)
+    return jobs
+
+
+def format_report(jobs):
+    """
+    Составляет итоговый отчёт по заданиям.
+
+    Аргументы:
+        jobs (list): Обработанные задания BatchJob.
+
+    Возвращает:
+        str: Таблица с временем чтения и отрисовки, числом узлов и ошибками.
+    """
+    def seconds(value):
+        return '-' if value is None else f"{value:.2f}"
+
+    lines = [f"{'репозиторий':<40} {'узлы':>8} {'чтение, с':>10} {'отрисовка, с':>13}  итог"]
+    for job in jobs:
+        errors = [job.error] if job.error else [f"{result.output_path}: {result.error}"
+                                                for result in job.results if not result.ok]
+        status = 'ок' if not errors else 'ошибка: ' + '; '.join(errors)
+        nodes = '-' if job.nodes is None else job.nodes
+        lines.append(f"{job.repo_path:<40} {nodes:>8} {seconds(job.extract_seconds):>10} "
+                     f"{seconds(job.render_seconds):>13}  {status}")
+
+    failed = sum(not job.ok for job in jobs)
+    lines.append(f"Всего: {len(jobs)}, успешно: {len(jobs) - failed}, с ошибками: {failed}")
+    return "\n".join(lines)
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    from . import visualizer
+except ImportError:
+    import visualizer
+
+
+SHAPES = ('linear', 'branched', 'merges')
+DEFAULT_SIZES = (1000, 10000)
+BRANCH_COUNT = 16
+DEFAULT_TOLERANCE = 1.5
+MIN_SECONDS = 0.05
+RENDER_LIMIT = 5000
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+START_TIME = 1600000000
+
+
+def fast_import_stream(shape, size):
+    """
+    Генерирует поток для `git fast-import` с историей заданной формы.
+
+    Коммиты пустые (без файлов): для графа важны только связи.
+
+    Аргументы:
+        shape (str): 'linear' — одна цепочка, 'branched' — BRANCH_COUNT веток от общего
+            корня, 'merges' — основная ветка, в которую постоянно вливаются короткие ветки.
+        size (int): Число коммитов.
+
+    Возвращает:
+        iterator: Фрагменты потока.
+    """
+    def commit(mark, ref, parents):
+        header = (f"commit {ref}\nmark :{mark}\n"
+                  f"committer Bench <bench@example.com> {START_TIME + mark} +0000\ndata 2\n{mark % 100:02d}\n")
+        if parents:
+            header += f"from :{parents[0]}\n"
+        for parent in parents[1:]:
+            header += f"merge :{parent}\n"
+        return header + "\n"
+
+    yield commit(1, 'refs/heads/main', [])
+    main = side = 1
+    for mark in range(2, size + 1):
+        if shape == 'linear':
+            yield commit(mark, 'refs/heads/main', [mark - 1])
+        elif shape == 'branched':
+            branch = mark % BRANCH_COUNT
+            tip = mark - BRANCH_COUNT if mark > BRANCH_COUNT + 1 else 1
+            yield commit(mark, f'refs/heads/b{branch}', [tip])
+        elif mark % 3 == 0:
+            yield commit(mark, 'refs/heads/side', [main])
+            side = mark
+        elif mark % 3 == 1:
+            yield commit(mark, 'refs/heads/main', [main, side])
+            main = mark
+        else:
+            yield commit(mark, 'refs/heads/main', [main])
+            main = mark
+
+
+def create_repository(path, shape, size):
+    """
+    Создаёт «голый» репозиторий с синтетической историей через `git fast-import`.
+
+    Аргументы:
+        path (str): Каталог репозитория.
+        shape (str): Форма истории (см. fast_import_stream).
+        size (int): Число коммитов.
+
+    Исключения:
+        RuntimeError: Ошибка выполнения `git`.
+    """
+    subprocess.run(['git', 'init', '-q', '--bare', path], check=True)
+    process = subprocess.Popen(['git', '-C', path, 'fast-import', '--quiet'], stdin=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, encoding='utf-8')
+    with process:
+        for chunk in fast_import_stream(shape, size):
+            process.stdin.write(chunk)
+        process.stdin.close()
+        errors = process.stderr.read()
+    if process.returncode != 0:
+        raise RuntimeError(f"Ошибка при создании репозитория: {errors}")
+    subprocess.run(['git', '-C', path, 'symbolic-ref', 'HEAD', 'refs/heads/main'], check=True)
+
+
+def repository_for(workdir, shape, size):
+    """Возвращает путь к синтетическому репозиторию, создавая его при первом обращении."""
+    path = os.path.join(workdir, f"{shape}-{size}.git")
+    if not os.path.isdir(path):
+        temp_path = f"{path}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        create_repository(temp_path, shape, size)
+        os.replace(temp_path, path)
+    return path
+
+
+def measure(function):
+    """
+    Выполняет function и измеряет время и пик выделенной Python памяти.
+
+    Возвращает:
+        tuple: Результат, секунды и пик памяти в байтах.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = function()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_stages(repo_path, size, scratch):
+    """
+    Замеряет этапы визуализации одного репозитория.
+
+    Этапы: чтение через `git log` и напрямую из объектов, генерация кода Graphviz
+    строкой и потоком в файл, отрисовка PNG из готовой строки (`save_graph`) и потоком
+    (`stream_graph_png`). Отрисовка замеряется, только если установлен `dot` и граф
+    не больше RENDER_LIMIT коммитов; иначе этап остаётся в словаре со значением None.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию.
+        size (int): Число коммитов.
+        scratch (str): Каталог для временных файлов.
+
+    Возвращает:
+        dict: Этап и пара (секунды, пик памяти в байтах) или None, если этап пропущен.
+    """
+    stages = {}
+
+    _, seconds, peak = measure(lambda: visualizer.get_commit_tree(repo_path))
+    stages['get_commit_tree'] = (seconds, peak)
+
+    graph, seconds, peak = measure(lambda: visualizer.load_commit_graph(repo_path, 'native'))
+    stages['load_commit_graph'] = (seconds, peak)
+
+    graph_code, seconds, peak = measure(lambda: visualizer.generate_graphviz_code(graph))
+    stages['generate_graphviz_code'] = (seconds, peak)
+
+    dot_path = os.path.join(scratch, 'graph.dot')
+    _, seconds, peak = measure(lambda: visualizer.stream_graph(graph, dot_path))
+    stages['stream_graph_dot'] = (seconds, peak)
+
+    render = shutil.which('dot') is not None and size <= RENDER_LIMIT
+    png_path = os.path.join(scratch, 'graph.png')
+    for stage, function in (('save_graph', lambda: visualizer.save_graph(graph_code, png_path)),
+                            ('stream_graph_png', lambda: visualizer.stream_graph(graph, png_path))):
+        stages[stage] = measure(function)[1:] if render else None
+    return stages
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, check_time=False):
+    """
+    Сравнивает замеры с сохранёнными и находит ухудшения.
+
+    Пик памяти Python почти не зависит от машины и сравнивается всегда. Время зависит
+    от процессора и нагрузки, поэтому сравнивается только по запросу и только с замерами,
+    сделанными на той же машине; этапы короче MIN_SECONDS пропускаются: у них шум больше разницы.
+
+    Аргументы:
+        results (dict): Ключ «форма/размер/этап» и словарь с полями seconds и peak.
+        baseline (dict): Сохранённые замеры в том же виде (поле seconds может отсутствовать).
+        tolerance (float): Во сколько раз значение может превысить сохранённое.
+        check_time (bool): Сравнивать и время.
+
+    Возвращает:
+        list: Описания ухудшений.
+    """
+    regressions = []
+    for key, current in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if (check_time and 'seconds' in previous and current['seconds'] > MIN_SECONDS
+                and current['seconds'] > previous['seconds'] * tolerance):
+            regressions.append(f"{key}: время {previous['seconds']:.3f} с -> {current['seconds']:.3f} с")
+        if current['peak'] > previous['peak'] * tolerance:
+            regressions.append(f"{key}: память {previous['peak'] / 2**20:.1f} МБ -> {current['peak'] / 2**20:.1f} МБ")
+    return regressions
+
+
+def run_benchmark(shapes, sizes, workdir, output=sys.stdout):
+    """
+    Замеряет все сочетания форм и размеров и печатает таблицу.
+
+    Возвращает:
+        dict: Ключ «форма/размер/этап» и словарь с полями seconds и peak.
+    """
+    results = {}
+    output.write(f"{'форма':<10} {'коммиты':>9} {'этап':<24} {'время, с':>10} {'пик, МБ':>10}\n")
+    for shape in shapes:
+        for size in sizes:
+            repo_path = repository_for(workdir, shape, size)
+            with tempfile.TemporaryDirectory() as scratch:
+                stages = run_stages(repo_path, size, scratch)
+            for stage, measured in stages.items():
+                if measured is None:
+                    output.write(f"{shape:<10} {size:>9} {stage:<24} {'пропущен':>10}\n")
+                    continue
+                seconds, peak = measured
+                results[f"{shape}/{size}/{stage}"] = {'seconds': seconds, 'peak': peak}
+                output.write(f"{shape:<10} {size:>9} {stage:<24} {seconds:>10.3f} {peak / 2**20:>10.1f}\n")
+    return results
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры визуализатора на синтетических репозиториях.")
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES),
+                        help="Формы истории.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES),
+                        help="Число коммитов, например 1000 100000 1000000.")
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'visualizer-benchmark'),
+                        help="Каталог для синтетических репозиториев (создаются один раз).")
+    parser.add_argument('--baseline', help="Файл с сохранёнными замерами; по умолчанию benchmark_baseline.json.")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Записать текущие замеры в файл --baseline (указывается явно).")
+    parser.add_argument('--check-time', action='store_true',
+                        help="Сравнивать и время (только с замерами, записанными на этой же машине).")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Допустимое ухудшение (во сколько раз).")
+    args = parser.parse_args(argv)
+    # Замеры с временем зависят от машины: общий файл не должен перезаписываться по умолчанию
+    if args.update_baseline and args.baseline is None:
+        parser.error("для --update-baseline укажите файл --baseline, например в каталоге --workdir")
+    if args.baseline is None:
+        args.baseline = BASELINE_FILE
+    return args
+
+
+def main():
+    """Запускает замеры и сравнивает их с сохранёнными; при ухудшении завершается с кодом 1."""
+    args = parse_arguments()
+    os.makedirs(args.workdir, exist_ok=True)
+    results = run_benchmark(args.shapes, args.sizes, args.workdir)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    if args.update_baseline:
+        if os.path.abspath(args.baseline) == BASELINE_FILE:
+            # В общем файле хранятся только пики памяти: время зависит от машины
+            results = {key: {'peak': current['peak']} for key, current in results.items()}
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f"Замеры сохранены в {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance, args.check_time)
+    for regression in regressions:
+        print(f"Ухудшение: {regression}")
+    if regressions:
+        sys.exit(1)
+    print("Ухудшений нет" if baseline else "Сохранённых замеров нет; запустите с --update-baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import bisect
+import hashlib
+from array import array
+
+
+KEY_SIZE = 20
+
+
+def name_to_key(name):
+    """
+    Переводит имя коммита в двоичный ключ длиной KEY_SIZE байт.
+
+    Аргументы:
+        name (str | bytes): Шестнадцатеричный хеш, двоичный хеш или произвольное имя.
+
+    Возвращает:
+        tuple: Ключ и признак того, что имя нельзя восстановить по ключу.
+    """
+    if isinstance(name, bytes) and len(name) == KEY_SIZE:
+        return name, False
+    if len(name) == KEY_SIZE * 2:
+        try:
+            key = bytes.fromhex(name)
+            if key.hex() == name:
+                return key, False
+        except (TypeError, ValueError):
+            pass
+    # Имена не в виде хеша (например, в тестах) хранятся отдельно
+    if isinstance(name, str):
+        name = name.encode('utf-8')
+    return hashlib.sha1(b'name:' + name).digest(), True
+
+
+class CompactGraph:
+    """
+    Компактный граф коммитов: хеши хранятся одним массивом байтов, коммиты — целыми номерами.
+
+    Номер коммита — порядок его первого появления, поэтому при топологическом входе
+    родители получают меньшие номера, чем потомки. Родители хранятся в `array('I')`:
+    у коммита с номером i это `parent_ids[parent_start[i]:parent_start[i] + parent_count[i]]`.
+    Дети и отсортированный индекс для поиска по хешу строятся только по запросу.
+    """
+
+    __slots__ = ('keys', 'names', 'parent_start', 'parent_count', 'parent_ids',
+                 'child_offsets', 'child_ids', 'sorted_ids')
+
+    def __init__(self):
+        self.keys = bytearray()
+        self.names = {}
+        self.parent_start = array('I')
+        self.parent_count = array('I')
+        self.parent_ids = array('I')
+        self.child_offsets = None
+        self.child_ids = None
+        self.sorted_ids = None
+
+    @classmethod
+    def from_parents(cls, items, known_only=False):
+        """
+        Строит граф из потока пар (коммит, список родителей), не храня его целиком.
+
+        Аргументы:
+            items (iterable): Пары (имя коммита, имена родителей), лучше в порядке «родители раньше потомков».
+            known_only (bool): Пропускать родителей, которые ещё не встречались. При входе
+                «родители раньше потомков» так отбрасываются коммиты за границей выборки.
+
+        Возвращает:
+            CompactGraph: Построенный граф.
+        """
+        graph = cls()
+        ids = {}
+        for name, parents in items:
+            node = graph.intern(ids, name)
+            if known_only:
+                keys = (name_to_key(parent)[0] for parent in parents)
+                parent_ids = [ids[key] for key in keys if key in ids]
+            else:
+                parent_ids = [graph.intern(ids, parent) for parent in parents]
+            graph.set_parents(node, parent_ids)
+        return graph
+
+    @classmethod
+    def from_tree(cls, commits, commit_links):
+        """
+        Строит граф из списка коммитов и списка связей в формате `get_commit_tree`.
+
+        Аргументы:
+            commits (list): Список коммитов.
+            commit_links (list): Связи (родитель, потомок).
+
+        Возвращает:
+            CompactGraph: Граф, в котором номера коммитов совпадают с их позициями в списке.
+        """
+        graph = cls()
+        ids = {}
+        for commit in commits:
+            graph.intern(ids, commit)
+
+        edges = array('I')
+        for parent, child in commit_links:
+            edges.append(graph.intern(ids, parent))
+            edges.append(graph.intern(ids, child))
+
+        # Сортировка подсчётом: родители каждого коммита идут подряд в исходном порядке
+        for i in range(1, len(edges), 2):
+            graph.parent_count[edges[i]] += 1
+        total = 0
+        for node in range(len(graph)):
+            graph.parent_start[node] = total
+            total += graph.parent_count[node]
+
+        fill = array('I', graph.parent_start)
+        graph.parent_ids = array('I', bytes(4 * total))
+        for i in range(0, len(edges), 2):
+            child = edges[i + 1]
+            graph.parent_ids[fill[child]] = edges[i]
+            fill[child] += 1
+        return graph
+
+    def intern(self, ids, name):
+        """Возвращает номер коммита, при первом появлении добавляя его в граф."""
+        key, named = name_to_key(name)
+        node = ids.get(key)
+        if node is None:
+            node = ids[key] = self.add(key)
+            if named:
+                self.names[node] = name.decode('utf-8') if isinstance(name, bytes) else name
+        return node
+
+    def add(self, key):
+        """Добавляет коммит с двоичным ключом без родителей и возвращает его номер."""
+        node = len(self.parent_start)
+        self.keys += key
+        self.parent_start.append(0)
+        self.parent_count.append(0)
+        return node
+
+    def set_parents(self, node, parent_ids):
+        """Записывает родителей коммита; у каждого коммита они задаются один раз."""
+        self.parent_start[node] = len(self.parent_ids)
+        self.parent_count[node] = len(parent_ids)
+        self.parent_ids.extend(parent_ids)
+
+    def __len__(self):
+        return len(self.parent_start)
+
+    def key(self, node):
+        """Возвращает двоичный ключ коммита."""
+        return bytes(self.keys[node * KEY_SIZE:(node + 1) * KEY_SIZE])
+
+    def name(self, node):
+        """Возвращает имя коммита: шестнадцатеричный хеш или исходное имя."""
+        name = self.names.get(node)
+        if name is None:
+            name = self.keys[node * KEY_SIZE:(node + 1) * KEY_SIZE].hex()
+        return name
+
+    def find(self, name):
+        """
+        Находит номер коммита по имени двоичным поиском по отсортированным ключам.
+
+        Аргументы:
+            name (str | bytes): Имя или хеш коммита.
+
+        Возвращает:
+            int: Номер коммита или None, если его нет в графе.
+        """
+        if self.sorted_ids is None:
+            self.sorted_ids = array('I', sorted(range(len(self)), key=self.key))
+        key = name_to_key(name)[0]
+        position = bisect.bisect_left(self.sorted_ids, key, key=self.key)
+        if position < len(self.sorted_ids) and self.key(self.sorted_ids[position]) == key:
+            return self.sorted_ids[position]
+        return None
+
+    def find_prefix(self, prefix, limit=2):
+        """
+        Находит коммиты, шестнадцатеричный хеш которых начинается с prefix.
+
+        Аргументы:
+            prefix (str): Начало хеша.
+            limit (int): Наибольшее число результатов.
+
+        Возвращает:
+            list: Номера найденных коммитов.
+        """
+        prefix = prefix.lower()
+        if self.sorted_ids is None:
+            self.sorted_ids = array('I', sorted(range(len(self)), key=self.key))
+        try:
+            start = bytes.fromhex(prefix + '0' * (len(prefix) % 2))
+        except ValueError:
+            return []
+
+        matches = []
+        position = bisect.bisect_left(self.sorted_ids, start, key=self.key)
+        while position < len(self.sorted_ids) and len(matches) < limit:
+            node = self.sorted_ids[position]
+            if not self.key(node).hex().startswith(prefix):
+                break
+            if node not in self.names:
+                matches.append(node)
+            position += 1
+        return matches
+
+    def parents(self, node):
+        """Возвращает номера родителей коммита."""
+        start = self.parent_start[node]
+        return self.parent_ids[start:start + self.parent_count[node]]
+
+    def children(self, node):
+        """Возвращает номера детей коммита; обратные связи строятся при первом вызове."""
+        if self.child_offsets is None:
+            self.build_children()
+        return self.child_ids[self.child_offsets[node]:self.child_offsets[node + 1]]
+
+    def build_children(self):
+        offsets = array('I', bytes(4 * (len(self) + 1)))
+        for _, parent in self.edges_by_child():
+            offsets[parent + 1] += 1
+        for node in range(len(self)):
+            offsets[node + 1] += offsets[node]
+
+        fill = array('I', offsets)
+        children = array('I', bytes(4 * offsets[-1]))
+        for child, parent in self.edges_by_child():
+            children[fill[parent]] = child
+            fill[parent] += 1
+        self.child_offsets = offsets
+        self.child_ids = children
+
+    def edges(self):
+        """Перебирает связи (родитель, потомок) в порядке номеров потомков."""
+        for child, parent in self.edges_by_child():
+            yield parent, child
+
+    def edges_by_child(self):
+        parent_ids = self.parent_ids
+        for child in range(len(self)):
+            start = self.parent_start[child]
+            for position in range(start, start + self.parent_count[child]):
+                yield child, parent_ids[position]
+
+    def topological_order(self):
+        """
+        Упорядочивает коммиты так, чтобы родители шли раньше потомков (алгоритм Кана).
+
+        Возвращает:
+            array: Номера коммитов в топологическом порядке.
+        """
+        pending = array('I', self.parent_count)
+        order = array('I', (node for node in range(len(self)) if not pending[node]))
+        position = 0
+        while position < len(order):
+            for child in self.children(order[position]):
+                pending[child] -= 1
+                if not pending[child]:
+                    order.append(child)
+            position += 1
+        return order
+
+    def edge_count(self):
+        return sum(self.parent_count)
+
+    def to_tree(self):
+        """
+        Переводит граф обратно в списки, как у `get_commit_tree`.
+
+        Возвращает:
+            tuple: Список коммитов и список связей (родитель, потомок).
+        """
+        commits = [self.name(node) for node in range(len(self))]
+        commit_links = [(commits[parent], commits[child]) for parent, child in self.edges()]
+        return commits, commit_links
@@ -0,0 +1,634 @@
+import mmap
+import os
+import struct
+import zlib
+from array import array
+
+try:
+    from .compact_graph import CompactGraph
+except ImportError:
+    from compact_graph import CompactGraph
+
+
+WORKTREE_REF_PREFIXES = ('refs/worktree/', 'refs/bisect/', 'refs/rewritten/')
+OBJECT_TYPES = {1: 'commit', 2: 'tree', 3: 'blob', 4: 'tag'}
+OFS_DELTA = 6
+REF_DELTA = 7
+PACK_INDEX_MAGIC = b'\377tOc'
+COMMIT_GRAPH_MAGIC = b'CGPH'
+GRAPH_PARENT_NONE = 0x70000000
+GRAPH_EXTRA_EDGES = 0x80000000
+GRAPH_LAST_EDGE = 0x80000000
+DELTA_CACHE_SIZE = 256
+INFLATE_SLACK = 64
+
+
+def find_git_dir(repo_path):
+    """
+    Находит каталог с данными Git для рабочей копии или «голого» репозитория.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию.
+
+    Возвращает:
+        str: Путь к каталогу `.git`.
+
+    Исключения:
+        ValueError: Каталог не является репозиторием Git.
+    """
+    dot_git = os.path.join(repo_path, '.git')
+    if os.path.isdir(dot_git):
+        return dot_git
+
+    if os.path.isfile(dot_git):
+        with open(dot_git, 'r', encoding='utf-8') as file:
+            content = file.read().strip()
+        if content.startswith('gitdir:'):
+            git_dir = content[len('gitdir:'):].strip()
+            return os.path.normpath(os.path.join(repo_path, git_dir))
+
+    if os.path.isdir(os.path.join(repo_path, 'objects')) and os.path.isfile(os.path.join(repo_path, 'HEAD')):
+        return repo_path
+
+    raise ValueError(f"{repo_path} не является репозиторием Git")
+
+
+def find_common_dir(git_dir):
+    """
+    Находит общий каталог репозитория для связанной рабочей копии (`git worktree`).
+
+    У связанной рабочей копии `.git` указывает на `.git/worktrees/<имя>`: там лежат её HEAD
+    и собственные ссылки, а объекты, ветки и packed-refs — в каталоге из файла `commondir`.
+
+    Аргументы:
+        git_dir (str): Каталог данных Git рабочей копии.
+
+    Возвращает:
+        str: Общий каталог или сам git_dir, если файла `commondir` нет.
+    """
+    path = os.path.join(git_dir, 'commondir')
+    if not os.path.isfile(path):
+        return git_dir
+    with open(path, 'r', encoding='utf-8') as file:
+        return os.path.normpath(os.path.join(git_dir, file.read().strip()))
+
+
+def apply_delta(base, delta):
+    """
+    Восстанавливает объект по базовому объекту и дельте из pack-файла.
+
+    Аргументы:
+        base (bytes): Содержимое базового объекта.
+        delta (bytes): Инструкции дельты.
+
+    Возвращает:
+        bytes: Содержимое восстановленного объекта.
+    """
+    position = 0
+    for _ in range(2):  # Размеры базового и итогового объектов
+        while delta[position] & 0x80:
+            position += 1
+        position += 1
+
+    result = bytearray()
+    while position < len(delta):
+        opcode = delta[position]
+        position += 1
+        if opcode & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if opcode & (1 << i):
+                    offset |= delta[position] << (8 * i)
+                    position += 1
+            for i in range(3):
+                if opcode & (1 << (4 + i)):
+                    size |= delta[position] << (8 * i)
+                    position += 1
+            result += base[offset:offset + (size or 0x10000)]
+        elif opcode:
+            result += delta[position:position + opcode]
+            position += opcode
+        else:
+            raise ValueError("Некорректная инструкция дельты")
+    return bytes(result)
+
+
+def parse_parents(commit_data):
+    """
+    Извлекает хеши родителей из содержимого объекта коммита.
+
+    Аргументы:
+        commit_data (bytes): Содержимое коммита.
+
+    Возвращает:
+        list: Хеши родителей в двоичном виде (20 байт).
+    """
+    parents = []
+    for line in commit_data.split(b'\n'):
+        if not line:
+            break
+        if line.startswith(b'parent '):
+            parents.append(bytes.fromhex(line[7:47].decode('ascii')))
+    return parents
+
+
+class PackFile:
+    """Pack-файл с индексом: поиск объекта по хешу и восстановление дельт."""
+
+    def __init__(self, repository, index_path):
+        self.repository = repository
+        with open(index_path, 'rb') as file:
+            self.index = file.read()
+
+        if self.index[:4] == PACK_INDEX_MAGIC:
+            if struct.unpack('>I', self.index[4:8])[0] != 2:
+                raise ValueError(f"Неподдерживаемая версия индекса {index_path}")
+            self.fanout = struct.unpack('>256I', self.index[8:1032])
+            self.count = self.fanout[255]
+            self.names_start = 1032
+            self.offsets_start = self.names_start + 24 * self.count
+            self.large_start = self.offsets_start + 4 * self.count
+            self.version = 2
+        else:
+            self.fanout = struct.unpack('>256I', self.index[:1024])
+            self.count = self.fanout[255]
+            self.version = 1
+
+        with open(index_path[:-len('.idx')] + '.pack', 'rb') as file:
+            self.pack = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def name_at(self, position):
+        if self.version == 2:
+            start = self.names_start + 20 * position
+        else:
+            start = 1024 + 24 * position + 4
+        return self.index[start:start + 20]
+
+    def offset_at(self, position):
+        if self.version == 1:
+            return struct.unpack_from('>I', self.index, 1024 + 24 * position)[0]
+
+        offset = struct.unpack_from('>I', self.index, self.offsets_start + 4 * position)[0]
+        if offset & 0x80000000:
+            large = self.large_start + 8 * (offset & 0x7FFFFFFF)
+            offset = struct.unpack_from('>Q', self.index, large)[0]
+        return offset
+
+    def find(self, sha):
+        low = self.fanout[sha[0] - 1] if sha[0] else 0
+        high = self.fanout[sha[0]]
+        while low < high:
+            middle = (low + high) // 2
+            name = self.name_at(middle)
+            if name < sha:
+                low = middle + 1
+            elif name > sha:
+                high = middle
+            else:
+                return self.offset_at(middle)
+        return None
+
+    def inflate(self, position, size):
+        # Вход подаётся кусками: остаток всего файла zlib скопировал бы в unconsumed_tail
+        decompressor = zlib.decompressobj()
+        view = memoryview(self.pack)
+        step = size + INFLATE_SLACK
+        data = b''
+        while len(data) < size and not decompressor.eof and position < len(view):
+            data += decompressor.decompress(view[position:position + step], size - len(data))
+            position += step
+        if len(data) != size:
+            raise ValueError("Повреждённый объект в pack-файле")
+        return data
+
+    def read_header(self, offset):
+        byte = self.pack[offset]
+        type_number = (byte >> 4) & 0x07
+        size = byte & 0x0F
+        shift = 4
+        offset += 1
+        while byte & 0x80:
+            byte = self.pack[offset]
+            size |= (byte & 0x7F) << shift
+            shift += 7
+            offset += 1
+        return type_number, size, offset
+
+    def read_at(self, offset):
+        deltas = []
+
+        while True:
+            cached = self.repository.delta_cache.get((id(self), offset))
+            if cached is not None:
+                object_type, data = cached
+                break
+
+            type_number, size, position = self.read_header(offset)
+            if type_number == OFS_DELTA:
+                byte = self.pack[position]
+                distance = byte & 0x7F
+                position += 1
+                while byte & 0x80:
+                    byte = self.pack[position]
+                    distance = ((distance + 1) << 7) | (byte & 0x7F)
+                    position += 1
+                deltas.append((offset, position, size))
+                offset -= distance
+            elif type_number == REF_DELTA:
+                base_sha = self.pack[position:position + 20]
+                deltas.append((offset, position + 20, size))
+                base_offset = self.find(base_sha)
+                if base_offset is None:
+                    object_type, data = self.repository.read_object(base_sha)
+                    break
+                offset = base_offset
+            elif type_number in OBJECT_TYPES:
+                object_type, data = OBJECT_TYPES[type_number], self.inflate(position, size)
+                break
+            else:
+                raise ValueError(f"Неизвестный тип объекта {type_number} в pack-файле")
+
+        for delta_offset, position, size in reversed(deltas):
+            data = apply_delta(data, self.inflate(position, size))
+            self.repository.remember_delta((id(self), delta_offset), (object_type, data))
+        return object_type, data
+
+    def close(self):
+        self.pack.close()
+
+
+class CommitGraph:
+    """Файл commit-graph (или цепочка таких файлов): родители коммита по его номеру без чтения объектов."""
+
+    def __init__(self, paths):
+        self.layers = []
+        self.total = 0
+        for path in paths:
+            self.load_layer(path)
+
+    def load_layer(self, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        if data[:4] != COMMIT_GRAPH_MAGIC or data[4] != 1 or data[5] != 1:
+            raise ValueError(f"Неподдерживаемый формат {path}")
+
+        chunks = {}
+        chunk_count = data[6]
+        for i in range(chunk_count + 1):
+            chunk_id, offset = struct.unpack_from('>4sQ', data, 8 + 12 * i)
+            chunks[chunk_id] = offset
+
+        fanout = struct.unpack_from('>256I', data, chunks[b'OIDF'])
+        count = fanout[255]
+        self.layers.append({
+            'data': data,
+            'base': self.total,
+            'count': count,
+            'fanout': fanout,
+            'oids': chunks[b'OIDL'],
+            'commits': chunks[b'CDAT'],
+            'edges': chunks.get(b'EDGE'),
+        })
+        self.total += count
+
+    def position(self, sha):
+        for layer in self.layers:
+            low = layer['fanout'][sha[0] - 1] if sha[0] else 0
+            high = layer['fanout'][sha[0]]
+            data, oids = layer['data'], layer['oids']
+            while low < high:
+                middle = (low + high) // 2
+                name = data[oids + 20 * middle:oids + 20 * middle + 20]
+                if name < sha:
+                    low = middle + 1
+                elif name > sha:
+                    high = middle
+                else:
+                    return layer['base'] + middle
+        return None
+
+    def layer_of(self, position):
+        for layer in self.layers:
+            if position < layer['base'] + layer['count']:
+                return layer, position - layer['base']
+        raise ValueError(f"Номер коммита {position} вне commit-graph")
+
+    def oid(self, position):
+        layer, local = self.layer_of(position)
+        start = layer['oids'] + 20 * local
+        return layer['data'][start:start + 20]
+
+    def parents(self, position):
+        layer, local = self.layer_of(position)
+        data = layer['data']
+        first, second = struct.unpack_from('>II', data, layer['commits'] + 36 * local + 20)
+
+        parents = []
+        if first != GRAPH_PARENT_NONE:
+            parents.append(first)
+        if second == GRAPH_PARENT_NONE:
+            return parents
+        if not second & GRAPH_EXTRA_EDGES:
+            parents.append(second)
+            return parents
+
+        # Коммит слияния с тремя и более родителями: остальные лежат в списке EDGE
+        edge = layer['edges'] + 4 * (second & 0x7FFFFFFF)
+        while True:
+            value = struct.unpack_from('>I', data, edge)[0]
+            parents.append(value & 0x7FFFFFFF)
+            if value & GRAPH_LAST_EDGE:
+                return parents
+            edge += 4
+
+
+class GitRepository:
+    """
+    Чтение коммитов прямо из `.git/objects` без запуска `git`.
+
+    Поддерживаются отдельные (loose) объекты, pack-файлы с индексами версий 1 и 2,
+    дельты обоих видов и файл commit-graph, если он есть.
+    """
+
+    def __init__(self, repo_path):
+        self.git_dir = find_git_dir(repo_path)
+        self.common_dir = find_common_dir(self.git_dir)
+        self.object_dirs = [os.path.join(self.common_dir, 'objects')]
+        if not os.path.isdir(self.object_dirs[0]):
+            raise ValueError(f"Каталог объектов {self.object_dirs[0]} не найден")
+        self.object_dirs.extend(self.read_alternates(self.object_dirs[0]))
+        self.packs = None
+        self.delta_cache = {}
+        self.commit_graph = self.load_commit_graph()
+        self.shallow = self.read_shallow()
+
+    @staticmethod
+    def read_alternates(objects_dir):
+        path = os.path.join(objects_dir, 'info', 'alternates')
+        if not os.path.isfile(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as file:
+            return [os.path.normpath(os.path.join(objects_dir, line.strip()))
+                    for line in file if line.strip() and not line.startswith('#')]
+
+    def read_shallow(self):
+        path = os.path.join(self.common_dir, 'shallow')
+        if not os.path.isfile(path):
+            return set()
+        with open(path, 'r', encoding='ascii') as file:
+            return {bytes.fromhex(line.strip()) for line in file if line.strip()}
+
+    def load_commit_graph(self):
+        info_dir = os.path.join(self.object_dirs[0], 'info')
+        chain = os.path.join(info_dir, 'commit-graphs', 'commit-graph-chain')
+        try:
+            if os.path.isfile(chain):
+                with open(chain, 'r', encoding='ascii') as file:
+                    names = [line.strip() for line in file if line.strip()]
+                return CommitGraph([os.path.join(info_dir, 'commit-graphs', f'graph-{name}.graph')
+                                    for name in names])
+            if os.path.isfile(os.path.join(info_dir, 'commit-graph')):
+                return CommitGraph([os.path.join(info_dir, 'commit-graph')])
+        except (OSError, ValueError, KeyError, struct.error):
+            # Без commit-graph коммиты просто читаются из объектов
+            pass
+        return None
+
+    def load_packs(self):
+        self.packs = []
+        for objects_dir in self.object_dirs:
+            pack_dir = os.path.join(objects_dir, 'pack')
+            if not os.path.isdir(pack_dir):
+                continue
+            for name in sorted(os.listdir(pack_dir)):
+                if name.endswith('.idx') and os.path.isfile(os.path.join(pack_dir, name[:-4] + '.pack')):
+                    self.packs.append(PackFile(self, os.path.join(pack_dir, name)))
+
+    def remember_delta(self, key, value):
+        if len(self.delta_cache) >= DELTA_CACHE_SIZE:
+            self.delta_cache.pop(next(iter(self.delta_cache)))
+        self.delta_cache[key] = value
+
+    def read_object(self, sha):
+        """
+        Читает объект по двоичному хешу.
+
+        Аргументы:
+            sha (bytes): Хеш объекта (20 байт).
+
+        Возвращает:
+            tuple: Тип объекта и его содержимое.
+
+        Исключения:
+            KeyError: Объект не найден.
+        """
+        hex_sha = sha.hex()
+        for objects_dir in self.object_dirs:
+            path = os.path.join(objects_dir, hex_sha[:2], hex_sha[2:])
+            if os.path.isfile(path):
+                with open(path, 'rb') as file:
+                    raw = zlib.decompress(file.read())
+                header, _, data = raw.partition(b'\0')
+                return header.split(b' ')[0].decode('ascii'), data
+
+        if self.packs is None:
+            self.load_packs()
+        for pack in self.packs:
+            offset = pack.find(sha)
+            if offset is not None:
+                return pack.read_at(offset)
+
+        raise KeyError(f"Объект {hex_sha} не найден")
+
+    def ref_dir(self, name):
+        """Каталог, где хранится ссылка: HEAD и ссылки рабочей копии — свои у каждой рабочей копии."""
+        if not name.startswith('refs/') or name.startswith(WORKTREE_REF_PREFIXES):
+            return self.git_dir
+        return self.common_dir
+
+    def read_ref(self, name, depth=0):
+        path = os.path.join(self.ref_dir(name), name)
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                value = file.read().strip()
+            if value.startswith('ref:'):
+                if depth > 10:
+                    return None
+                return self.read_ref(value[4:].strip(), depth + 1)
+            return value
+        return self.packed_refs().get(name)
+
+    def packed_refs(self):
+        refs = {}
+        path = os.path.join(self.common_dir, 'packed-refs')
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if line.startswith(('#', '^')) or not line.strip():
+                        continue
+                    sha, name = line.strip().split(' ', 1)
+                    refs[name] = sha
+        return refs
+
+    def refs(self):
+        """
+        Собирает все ссылки репозитория, как `git log --all`: ветки, теги, удалённые ветки и HEAD.
+
+        Возвращает:
+            dict: Имя ссылки и хеш, на который она указывает.
+        """
+        refs = self.packed_refs()
+        for base_dir in dict.fromkeys((self.common_dir, self.git_dir)):
+            for root, _, files in os.walk(os.path.join(base_dir, 'refs')):
+                for name in files:
+                    ref_name = os.path.relpath(os.path.join(root, name), base_dir).replace(os.sep, '/')
+                    if self.ref_dir(ref_name) != base_dir:
+                        continue
+                    value = self.read_ref(ref_name)
+                    if value:
+                        refs[ref_name] = value
+
+        head = self.read_ref('HEAD')
+        if head:
+            refs['HEAD'] = head
+        return refs
+
+    def peel(self, sha):
+        """Раскрывает аннотированные теги до коммита; для ссылок не на коммит возвращает None."""
+        for _ in range(100):
+            try:
+                object_type, data = self.read_object(sha)
+            except KeyError:
+                return None
+            if object_type == 'commit':
+                return sha
+            if object_type != 'tag':
+                return None
+            sha = bytes.fromhex(data[7:47].decode('ascii'))
+        return None
+
+    def ref_tips(self):
+        """
+        Возвращает коммиты, на которые указывают ссылки.
+
+        Исключения:
+            ValueError: Не найдено ни одной ссылки на коммит; так чтение объектов сообщает
+                об ошибке, а не выдаёт пустой граф.
+        """
+        tips = {}
+        for name, value in self.refs().items():
+            try:
+                commit = self.peel(bytes.fromhex(value))
+            except ValueError:
+                continue
+            if commit is not None:
+                tips[name] = commit
+        if not tips:
+            raise ValueError(f"В {self.git_dir} не найдено ни одной ссылки на коммит")
+        return tips
+
+    def object_parents(self, sha):
+        """Читает родителей коммита из его объекта."""
+        if sha in self.shallow:
+            return []
+        object_type, data = self.read_object(sha)
+        if object_type != 'commit':
+            raise ValueError(f"Объект {sha.hex()} не является коммитом")
+        return parse_parents(data)
+
+    def load_graph(self, tips=None, known=()):
+        """
+        Строит компактный граф коммитов, достижимых из ссылок.
+
+        Коммиты добавляются в граф прямо во время обхода, а их номера служат отметками
+        посещения, поэтому ни словаря родителей, ни отдельного списка порядка не создаётся.
+        Номера идут в порядке обхода, а не топологически.
+
+        Коммиты из commit-graph обходятся по их номерам в этом файле: родитель берётся
+        по номеру, без двоичного поиска по хешу. Объекты читаются только для коммитов,
+        которых в commit-graph нет (например, созданных после его записи).
+
+        Аргументы:
+            tips (iterable): Двоичные хеши, с которых начинается обход; по умолчанию — все ссылки.
+            known (set): Шестнадцатеричные хеши уже известных коммитов: они попадают в граф
+                без родителей, и обход на них останавливается.
+
+        Возвращает:
+            CompactGraph: Граф коммитов.
+        """
+        if tips is None:
+            tips = self.ref_tips().values()
+        graph = CompactGraph()
+        commit_graph = self.commit_graph
+        # Номер в графе по номеру в commit-graph (-1 — ещё не встречался) и по хешу для остальных
+        by_position = array('i', [-1]) * commit_graph.total if commit_graph is not None else None
+        ids = {}
+        # Пары (номер в графе, номер в commit-graph или -1), родители которых ещё не прочитаны
+        stack = []
+
+        def visit(sha):
+            position = commit_graph.position(sha) if commit_graph is not None else None
+            if position is not None:
+                node = by_position[position]
+                if node < 0:
+                    node = by_position[position] = graph.add(sha)
+                    if not known or sha.hex() not in known:
+                        stack.append((node, position))
+                return node
+            node = ids.get(sha)
+            if node is None:
+                node = ids[sha] = graph.add(sha)
+                if not known or sha.hex() not in known:
+                    stack.append((node, -1))
+            return node
+
+        for sha in tips:
+            visit(sha)
+        while stack:
+            node, position = stack.pop()
+            if position < 0:
+                parents = [visit(parent) for parent in self.object_parents(graph.key(node))]
+            elif self.shallow and graph.key(node) in self.shallow:
+                parents = []
+            else:
+                parents = []
+                for parent_position in commit_graph.parents(position):
+                    parent = by_position[parent_position]
+                    if parent < 0:
+                        sha = commit_graph.oid(parent_position)
+                        parent = by_position[parent_position] = graph.add(sha)
+                        if not known or sha.hex() not in known:
+                            stack.append((parent, parent_position))
+                    parents.append(parent)
+            graph.set_parents(node, parents)
+        return graph
+
+    def commit_tree(self, tips=None, known=()):
+        """
+        Строит дерево коммитов в том же виде, что и `get_commit_tree`.
+
+        Аргументы:
+            tips (iterable): Двоичные хеши, с которых начинается обход; по умолчанию — все ссылки.
+            known (set): Шестнадцатеричные хеши уже известных коммитов: они не попадают
+                в список коммитов, но связи с ними сохраняются.
+
+        Возвращает:
+            tuple: Список коммитов (родители раньше потомков) и список связей (родитель, потомок).
+        """
+        graph = self.load_graph(tips, known)
+        names = [graph.name(node) for node in range(len(graph))]
+        commits = []
+        commit_links = []
+        for node in graph.topological_order():
+            commit = names[node]
+            if known and commit in known:
+                continue
+            commits.append(commit)
+            commit_links.extend((names[parent], commit) for parent in graph.parents(node))
+        return commits, commit_links
+
+    def close(self):
+        for pack in self.packs or ():
+            pack.close()
+        self.packs = None
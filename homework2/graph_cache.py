@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+try:
+    from .git_objects import GitRepository
+except ImportError:
+    from git_objects import GitRepository
+
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'graphviz_visualizer')
+
+
+def cache_file(cache_dir, repo_path):
+    """
+    Возвращает путь к файлу кэша для репозитория.
+
+    Аргументы:
+        cache_dir (str): Каталог кэша.
+        repo_path (str): Путь к репозиторию Git.
+
+    Возвращает:
+        str: Путь к файлу кэша, имя которого — хеш абсолютного пути репозитория.
+    """
+    key = hashlib.sha1(os.path.abspath(repo_path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def read_cache(path, repo_path):
+    """
+    Читает сохранённый граф коммитов.
+
+    Аргументы:
+        path (str): Путь к файлу кэша.
+        repo_path (str): Путь к репозиторию Git, для которого кэш должен быть записан.
+
+    Возвращает:
+        dict: Ссылки, коммиты и индексы их родителей или None, если кэша нет или он не подходит.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if cache.get('version') != CACHE_VERSION or cache.get('repo') != os.path.abspath(repo_path):
+        return None
+    if len(cache.get('commits', ())) != len(cache.get('parents', ())):
+        return None
+    return cache
+
+
+def write_cache(path, cache):
+    """
+    Атомарно записывает граф коммитов: файл заменяется целиком, поэтому прерванная запись не портит кэш.
+
+    Аргументы:
+        path (str): Путь к файлу кэша.
+        cache (dict): Ссылки, коммиты и индексы их родителей.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            json.dump(cache, file, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def read_ref_tips_git(repo_path):
+    """
+    Получает коммиты, на которые указывают ссылки, через `git for-each-ref`.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+
+    Возвращает:
+        dict: Имя ссылки и хеш коммита (аннотированные теги раскрываются).
+
+    Исключения:
+        RuntimeError: Ошибка выполнения команды `git`.
+    """
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'for-each-ref',
+         '--format=%(refname) %(objecttype) %(objectname) %(*objecttype) %(*objectname)'],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8'
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Ошибка при получении ссылок: {result.stderr}")
+
+    tips = {}
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if len(fields) >= 3 and fields[1] == 'commit':
+            tips[fields[0]] = fields[2]
+        elif len(fields) == 5 and fields[3] == 'commit':
+            tips[fields[0]] = fields[4]
+
+    head = subprocess.run(
+        ['git', '-C', repo_path, 'rev-parse', '--verify', '-q', 'HEAD^{commit}'],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8'
+    )
+    if head.returncode == 0 and head.stdout.strip():
+        tips['HEAD'] = head.stdout.strip()
+    return tips
+
+
+def read_ref_tips(repo_path, backend='auto'):
+    """
+    Получает коммиты, на которые указывают ссылки, выбранным способом.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        backend (str): 'native', 'git' или 'auto', как в `load_commit_tree`.
+
+    Возвращает:
+        dict: Имя ссылки и хеш коммита.
+    """
+    if backend != 'native':
+        try:
+            return read_ref_tips_git(repo_path)
+        except (OSError, RuntimeError):
+            if backend == 'git':
+                raise
+    try:
+        repository = GitRepository(repo_path)
+        try:
+            return {name: sha.hex() for name, sha in repository.ref_tips().items()}
+        finally:
+            repository.close()
+    except (OSError, ValueError, KeyError) as e:
+        raise RuntimeError(f"Ошибка при получении ссылок: {e}")
+
+
+def tips_reachable(cache, old_tips, tips):
+    """
+    Проверяет, что все коммиты из кэша по-прежнему достижимы из ссылок.
+
+    Ссылка, которая просто сдвинулась вперёд, оставляет старый коммит среди предков
+    нового. Если же ветку удалили или переписали, часть кэша устарела.
+
+    Аргументы:
+        cache (dict): Граф коммитов, уже дополненный новыми коммитами.
+        old_tips (dict): Ссылки, для которых был построен кэш.
+        tips (dict): Текущие ссылки репозитория.
+
+    Возвращает:
+        bool: True, если старые вершины ссылок достижимы из новых.
+    """
+    current = set(tips.values())
+    missing = {sha for sha in old_tips.values() if sha not in current}
+    if not missing:
+        return True
+
+    commits = cache['commits']
+    parents = cache['parents']
+    index = {commit: position for position, commit in enumerate(commits)}
+    stack = [index[sha] for sha in current if sha in index]
+    visited = set(stack)
+    # Обход прекращается, как только найдены все старые вершины
+    while stack and missing:
+        position = stack.pop()
+        missing.discard(commits[position])
+        for parent in parents[position]:
+            if parent not in visited:
+                visited.add(parent)
+                stack.append(parent)
+    return not missing
+
+
+def build_cache(repo_path, tips, commits, commit_links):
+    """
+    Переводит дерево коммитов в вид для хранения: родители задаются номерами коммитов.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        tips (dict): Ссылки репозитория.
+        commits (list): Коммиты (родители раньше потомков).
+        commit_links (list): Связи (родитель, потомок).
+
+    Возвращает:
+        dict: Граф коммитов для записи в кэш.
+    """
+    cache = {'version': CACHE_VERSION, 'repo': os.path.abspath(repo_path), 'tips': tips,
+             'commits': [], 'parents': []}
+    extend_cache(cache, commits, commit_links)
+    return cache
+
+
+def extend_cache(cache, commits, commit_links):
+    """
+    Дописывает в кэш новые коммиты; их родители уже есть в кэше или среди новых коммитов.
+
+    Аргументы:
+        cache (dict): Граф коммитов из кэша.
+        commits (list): Новые коммиты (родители раньше потомков).
+        commit_links (list): Связи новых коммитов с родителями.
+    """
+    index = {commit: position for position, commit in enumerate(cache['commits'])}
+    start = len(cache['commits'])
+    for commit in commits:
+        if commit in index:
+            continue
+        index[commit] = len(cache['commits'])
+        cache['commits'].append(commit)
+        cache['parents'].append([])
+
+    for parent, child in commit_links:
+        if parent in index and index[child] >= start:
+            cache['parents'][index[child]].append(index[parent])
+
+
+def cache_to_tree(cache):
+    """
+    Восстанавливает дерево коммитов из кэша.
+
+    Аргументы:
+        cache (dict): Граф коммитов из кэша.
+
+    Возвращает:
+        tuple: Список коммитов и список связей (родитель, потомок), как у `get_commit_tree`.
+    """
+    commits = cache['commits']
+    commit_links = [(commits[parent], commit) for commit, parents in zip(commits, cache['parents'])
+                    for parent in parents]
+    return commits, commit_links
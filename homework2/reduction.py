@@ -0,0 +1,164 @@
+try:
+    from .compact_graph import CompactGraph
+except ImportError:
+    from compact_graph import CompactGraph
+
+
+SHORT_HASH = 7
+
+
+def keep_nodes(graph, keep):
+    """
+    Оставляет в графе только выбранные коммиты.
+
+    Удалённые коммиты не разрывают историю: каждый оставшийся коммит связывается
+    с ближайшими оставшимися предками, до которых можно дойти через удалённые.
+
+    Аргументы:
+        graph (CompactGraph): Исходный граф.
+        keep (set): Номера коммитов, которые нужно оставить.
+
+    Возвращает:
+        CompactGraph: Уменьшенный граф.
+    """
+    nearest = {}
+    items = []
+    for node in graph.topological_order():
+        ancestors = []
+        for parent in graph.parents(node):
+            if parent in keep:
+                ancestors.append(parent)
+            else:
+                ancestors.extend(nearest.get(parent, ()))
+        ancestors = list(dict.fromkeys(ancestors))
+
+        if node in keep:
+            items.append((graph.name(node), [graph.name(parent) for parent in ancestors]))
+        elif ancestors:
+            nearest[node] = ancestors
+    return CompactGraph.from_parents(items)
+
+
+def structural_nodes(graph, tips=()):
+    """
+    Находит коммиты, определяющие форму истории.
+
+    Аргументы:
+        graph (CompactGraph): Граф коммитов.
+        tips (iterable): Номера коммитов, на которые указывают ветки и теги.
+
+    Возвращает:
+        set: Корни, слияния, точки ветвления и вершины ссылок.
+    """
+    keep = set(tips)
+    for node in range(len(graph)):
+        parents = len(graph.parents(node))
+        if parents != 1 or len(graph.children(node)) != 1:
+            keep.add(node)
+    return keep
+
+
+def collapse_chains(graph, tips=(), min_length=2):
+    """
+    Заменяет линейные цепочки коммитов одним узлом-сводкой.
+
+    Коммит входит в цепочку, если у него ровно один родитель и ровно один потомок
+    и на него не указывает ссылка. Узел-сводка называется по первому и последнему
+    коммиту цепочки и содержит их число.
+
+    Аргументы:
+        graph (CompactGraph): Исходный граф.
+        tips (iterable): Номера коммитов, которые нельзя сворачивать.
+        min_length (int): Минимальная длина сворачиваемой цепочки.
+
+    Возвращает:
+        CompactGraph: Граф со свёрнутыми цепочками.
+    """
+    protected = set(tips)
+    order = graph.topological_order()
+
+    def linear(node):
+        return node not in protected and len(graph.parents(node)) == 1 and len(graph.children(node)) == 1
+
+    chain_of = {}
+    chains = []
+    for node in order:
+        if not linear(node):
+            continue
+        parent = graph.parents(node)[0]
+        if parent in chain_of:
+            chain = chain_of[parent]
+            chains[chain].append(node)
+        else:
+            chain = len(chains)
+            chains.append([node])
+        chain_of[node] = chain
+
+    names = {}
+    for chain in chains:
+        if len(chain) >= min_length:
+            first, last = graph.name(chain[0]), graph.name(chain[-1])
+            names[chain[0]] = f"{first[:SHORT_HASH]}..{last[:SHORT_HASH]} ({len(chain)})"
+
+    def name_of(node):
+        if node in chain_of and len(chains[chain_of[node]]) >= min_length:
+            return names[chains[chain_of[node]][0]]
+        return graph.name(node)
+
+    items = []
+    for node in order:
+        if node in chain_of and len(chains[chain_of[node]]) >= min_length and chains[chain_of[node]][0] != node:
+            continue
+        items.append((name_of(node), [name_of(parent) for parent in graph.parents(node)]))
+    return CompactGraph.from_parents(items)
+
+
+def limit_nodes(graph, max_nodes):
+    """
+    Оставляет не больше max_nodes самых новых коммитов в топологическом порядке.
+
+    Аргументы:
+        graph (CompactGraph): Исходный граф.
+        max_nodes (int): Наибольшее число коммитов.
+
+    Возвращает:
+        CompactGraph: Граф с последними коммитами истории.
+
+    Исключения:
+        ValueError: max_nodes меньше 1.
+    """
+    if max_nodes < 1:
+        raise ValueError(f"Число узлов должно быть не меньше 1: {max_nodes}")
+    if len(graph) <= max_nodes:
+        return graph
+    order = graph.topological_order()
+    return keep_nodes(graph, set(order[len(order) - max_nodes:]))
+
+
+def reduce_graph(graph, tips=(), collapse=False, simplify=False, max_nodes=None):
+    """
+    Применяет выбранные способы уменьшения графа.
+
+    Аргументы:
+        graph (CompactGraph): Граф коммитов.
+        tips (iterable): Хеши коммитов, на которые указывают ветки и теги.
+        collapse (bool): Сворачивать линейные цепочки.
+        simplify (bool): Оставить только корни, ветвления, слияния и вершины ссылок.
+        max_nodes (int): Наибольшее число узлов в результате или None.
+
+    Возвращает:
+        CompactGraph: Уменьшенный граф.
+    """
+    tips = list(tips)
+
+    def tip_nodes():
+        nodes = (graph.find(tip) for tip in tips)
+        return {node for node in nodes if node is not None}
+
+    if simplify:
+        graph = keep_nodes(graph, structural_nodes(graph, tip_nodes()))
+    if collapse:
+        graph = collapse_chains(graph, tip_nodes())
+    if max_nodes is not None:
+        graph = limit_nodes(graph, max_nodes)
+    return graph
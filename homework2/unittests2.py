@@ -1,21 +1,37 @@
 import unittest
-from unittest.mock import patch, mock_open, call
+from unittest.mock import patch, mock_open, call, ANY
 import subprocess
+import io
 import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from graphviz_visualizer import visualizer
+from graphviz_visualizer import git_objects
+from graphviz_visualizer import graph_cache
+from graphviz_visualizer import compact_graph
+from graphviz_visualizer import reduction
+from graphviz_visualizer import backends
+from graphviz_visualizer import batch
+from graphviz_visualizer import analytics
+from graphviz_visualizer import benchmark
 
 
 class TestVisualizer(unittest.TestCase):
+    # Создаёт имитацию процесса `git log`, построчно отдающего заданный вывод.
+    @staticmethod
+    def make_process(mock_popen, stdout, returncode=0, stderr=''):
+        process = mock_popen.return_value
+        process.stdout = io.StringIO(stdout)
+        process.stderr = io.StringIO(stderr)
+        process.returncode = returncode
+        return process
+
     # Тестирует функцию получения дерева коммитов при успешной работе команды `git log`.
-    @patch('subprocess.run')
-    def test_get_commit_tree(self, mock_run):
-        # Имитация успешного выполнения команды `git log`.
-        mock_run.return_value = subprocess.CompletedProcess(
-            args=['git', '-C', 'fake_repo', 'log', '--pretty=format:%H', '--reverse'],
-            returncode=0,
-            stdout='commit1\ncommit2\ncommit3',
-            stderr=''
-        )
+    @patch('subprocess.Popen')
+    def test_get_commit_tree(self, mock_popen):
+        # Имитация успешного выполнения команды `git log` (хеш коммита и хеши его родителей).
+        self.make_process(mock_popen, 'commit1\ncommit2 commit1\ncommit3 commit2\n')
 
         # Проверка результата функции.
         commits, commit_links = visualizer.get_commit_tree('fake_repo')
@@ -23,17 +39,28 @@ class TestVisualizer(unittest.TestCase):
         # Убедимся, что возвращаются ожидаемые коммиты и связи.
         self.assertEqual(commits, ['commit1', 'commit2', 'commit3'])
         self.assertEqual(commit_links, [('commit1', 'commit2'), ('commit2', 'commit3')])
+        mock_popen.assert_called_once_with(
+            ['git', '-C', 'fake_repo', 'log', '--all', '--topo-order', '--reverse', '--pretty=format:%H %P'],
+            stdout=subprocess.PIPE, stderr=ANY, text=True, encoding='utf-8')
+
+    # Тестирует, что ветвления и слияния строятся по настоящим родителям, а не по порядку журнала.
+    @patch('subprocess.Popen')
+    def test_get_commit_tree_merge(self, mock_popen):
+        self.make_process(mock_popen, 'root\nfeature root\nmain root\nmerge main feature\n')
+
+        commits, commit_links = visualizer.get_commit_tree('fake_repo')
+
+        self.assertEqual(commits, ['root', 'feature', 'main', 'merge'])
+        self.assertEqual(commit_links, [('root', 'feature'), ('root', 'main'),
+                                        ('main', 'merge'), ('feature', 'merge')])
+        # Хеши в связях — те же объекты, что и в списке коммитов.
+        self.assertIs(commit_links[0][0], commits[0])
 
     # Тестирует функцию получения дерева коммитов при ошибке команды `git log`.
-    @patch('subprocess.run')
-    def test_get_commit_tree_error(self, mock_run):
+    @patch('subprocess.Popen')
+    def test_get_commit_tree_error(self, mock_popen):
         # Имитация ошибки выполнения команды `git log`.
-        mock_run.return_value = subprocess.CompletedProcess(
-            args=['git', '-C', 'fake_repo', 'log', '--pretty=format:%H', '--reverse'],
-            returncode=1,
-            stdout='',
-            stderr='Error: fake error message'
-        )
+        self.make_process(mock_popen, '', returncode=1, stderr='Error: fake error message')
 
         # Проверка, что вызывается RuntimeError с ожидаемым сообщением.
         with self.assertRaises(RuntimeError) as context:
@@ -41,6 +68,17 @@ class TestVisualizer(unittest.TestCase):
 
         self.assertIn('Ошибка при получении коммитов', str(context.exception))
 
+    # Тестирует, что текст ошибки настоящего `git log` доходит до исключения.
+    def test_get_commit_tree_git_error(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with self.assertRaises(RuntimeError) as context:
+                visualizer.get_commit_tree(directory)
+            # После «Ошибка при получении коммитов:» идёт сообщение git из stderr
+            self.assertTrue(str(context.exception).split(':', 1)[1].strip())
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
     # Тестирует генерацию кода Graphviz на основе коммитов и их связей.
     def test_generate_graphviz_code(self):
         commits = ['commit1', 'commit2', 'commit3']
@@ -115,6 +153,592 @@ class TestVisualizer(unittest.TestCase):
         mock_run.assert_called_once_with(['dot', '-Tpng', dot_file, '-o', output_path], stdout=subprocess.PIPE,
                                          stderr=subprocess.PIPE, text=True)
 
+    # Тестирует передачу кода Graphviz в `dot` через стандартный ввод без временного файла.
+    @patch('subprocess.Popen')
+    def test_stream_graph(self, mock_popen):
+        graph = compact_graph.CompactGraph.from_tree(['commit1', 'commit2'], [('commit1', 'commit2')])
+        process = mock_popen.return_value
+        process.returncode = 0
+
+        visualizer.stream_graph(graph, 'output_path.png')
+
+        written = ''.join(c.args[0] for c in process.stdin.write.call_args_list)
+        self.assertEqual(written, visualizer.generate_graphviz_code(graph) + "\n")
+        process.stdin.close.assert_called_once()
+        self.assertEqual(mock_popen.call_args[0][0], ['dot', '-Tpng', '-o', 'output_path.png'])
+        self.assertEqual(mock_popen.call_args[1]['stdin'], subprocess.PIPE)
+
+    # Тестирует ошибку `dot` при потоковой передаче и запись кода в файл `.dot`.
+    @patch('subprocess.Popen')
+    def test_stream_graph_error(self, mock_popen):
+        graph = compact_graph.CompactGraph.from_tree(['commit1'], [])
+        process = mock_popen.return_value
+        process.returncode = 1
+
+        with self.assertRaises(RuntimeError) as context:
+            visualizer.stream_graph(graph, 'output_path.png')
+        self.assertIn('Ошибка при генерации PNG', str(context.exception))
+
+        directory = tempfile.mkdtemp()
+        try:
+            dot_path = os.path.join(directory, 'graph.dot')
+            visualizer.stream_graph(graph, dot_path)
+            with open(dot_path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), visualizer.generate_graphviz_code(graph) + "\n")
+            self.assertEqual(mock_popen.call_count, 1)
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestCompactGraph(unittest.TestCase):
+    HASHES = ['%040x' % (i * 0x1234567) for i in range(1, 5)]
+
+    # Тестирует, что граф из списков возвращает те же коммиты и связи.
+    def test_from_tree_round_trip(self):
+        root, left, right, merge = self.HASHES
+        commits = [root, left, right, merge]
+        commit_links = [(root, left), (root, right), (left, merge), (right, merge)]
+
+        graph = compact_graph.CompactGraph.from_tree(commits, commit_links)
+
+        self.assertEqual(len(graph), 4)
+        self.assertEqual(graph.edge_count(), 4)
+        self.assertEqual(graph.to_tree(), (commits, commit_links))
+        self.assertEqual(graph.key(0), bytes.fromhex(root))
+        self.assertEqual(list(graph.parents(3)), [1, 2])
+        self.assertEqual(list(graph.children(0)), [1, 2])
+        self.assertEqual(graph.find(right), 2)
+        self.assertEqual(graph.find(bytes.fromhex(merge)), 3)
+        self.assertIsNone(graph.find('f' * 40))
+
+    # Тестирует построение из потока пар с двоичными хешами и именами не в виде хеша.
+    def test_from_parents(self):
+        root, child = (bytes.fromhex(h) for h in self.HASHES[:2])
+        graph = compact_graph.CompactGraph.from_parents([(root, []), (child, [root]), ('tip', [child])])
+
+        self.assertEqual(graph.to_tree(), ([root.hex(), child.hex(), 'tip'],
+                                           [(root.hex(), child.hex()), (child.hex(), 'tip')]))
+        self.assertEqual(graph.find('tip'), 2)
+        self.assertEqual(list(graph.children(2)), [])
+
+    # Тестирует, что код Graphviz по компактному графу совпадает с кодом по спискам.
+    def test_generate_graphviz_code_from_graph(self):
+        commits = ['commit1', 'commit2', 'commit3']
+        commit_links = [('commit1', 'commit2'), ('commit2', 'commit3')]
+        graph = compact_graph.CompactGraph.from_tree(commits, commit_links)
+
+        self.assertEqual(visualizer.generate_graphviz_code(graph),
+                         visualizer.generate_graphviz_code(commits, commit_links))
+
+
+class TestReduction(unittest.TestCase):
+    # Строит граф: цепочка r-a-b-c, ветка c-d-e и слияние m(c..e, b).
+    def setUp(self):
+        commit_links = [('r', 'a'), ('a', 'b'), ('b', 'c'), ('c', 'd'), ('d', 'e'), ('e', 'm'), ('b', 'm')]
+        self.graph = compact_graph.CompactGraph.from_tree(['r', 'a', 'b', 'c', 'd', 'e', 'm'], commit_links)
+
+    def tree(self, graph):
+        commits, commit_links = graph.to_tree()
+        return commits, sorted(commit_links)
+
+    # Тестирует, что остаются только корни, ветвления, слияния и вершины ссылок, а связи идут через удалённые коммиты.
+    def test_simplify(self):
+        graph = reduction.reduce_graph(self.graph, ['d'], simplify=True)
+        self.assertEqual(self.tree(graph), (['r', 'b', 'd', 'm'], [('b', 'd'), ('b', 'm'), ('d', 'm'), ('r', 'b')]))
+
+    # Тестирует свёртку линейных цепочек в узлы-сводки.
+    def test_collapse_chains(self):
+        graph = reduction.reduce_graph(self.graph, collapse=True)
+        self.assertEqual(self.tree(graph), (['r', 'a', 'b', 'c..e (3)', 'm'],
+                                            [('a', 'b'), ('b', 'c..e (3)'), ('b', 'm'), ('c..e (3)', 'm'), ('r', 'a')]))
+        # Коммит со ссылкой разрывает цепочку, а цепочки из одного коммита не сворачиваются.
+        graph = reduction.reduce_graph(self.graph, ['d'], collapse=True)
+        self.assertEqual(graph.to_tree()[0], ['r', 'a', 'b', 'c', 'd', 'e', 'm'])
+
+    # Тестирует ограничение числа узлов самыми новыми коммитами.
+    def test_max_nodes(self):
+        graph = reduction.reduce_graph(self.graph, max_nodes=3)
+        self.assertEqual(self.tree(graph), (['d', 'e', 'm'], [('d', 'e'), ('e', 'm')]))
+        self.assertIs(reduction.reduce_graph(self.graph, max_nodes=100), self.graph)
+        for max_nodes in (0, -1):
+            with self.assertRaises(ValueError):
+                reduction.limit_nodes(self.graph, max_nodes)
+
+    # Тестирует выборку по диапазону: родители за границей выборки отбрасываются.
+    @patch('subprocess.Popen')
+    def test_window(self, mock_popen):
+        TestVisualizer.make_process(mock_popen, 'c b\nd c\n')
+
+        revisions = visualizer.window_revisions(since='2 weeks ago', ref_range='v1..main')
+        graph = visualizer.load_commit_graph('fake_repo', revisions=revisions)
+
+        self.assertEqual(revisions, ['v1..main', '--since=2 weeks ago'])
+        self.assertEqual(graph.to_tree(), (['c', 'd'], [('c', 'd')]))
+        self.assertIsNone(visualizer.window_revisions())
+
+
+class TestBackends(unittest.TestCase):
+    # Тестирует выбор программы раскладки и путей для нескольких форматов.
+    def test_choose_engine_and_paths(self):
+        self.assertEqual(backends.choose_engine(10), 'dot')
+        self.assertEqual(backends.choose_engine(backends.LARGE_GRAPH_NODES + 1), 'sfdp')
+        self.assertEqual(backends.choose_engine(10, 'neato'), 'neato')
+        self.assertEqual(backends.output_paths('out/graph.png', ['png', 'svg', 'dot']),
+                         [('png', 'out/graph.png'), ('svg', 'out/graph.svg'), ('dot', 'out/graph.dot')])
+        self.assertEqual(backends.output_paths('graph', ['pdf']), [('pdf', 'graph.pdf')])
+        with self.assertRaises(ValueError):
+            backends.get_backend('dot', 'gif')
+
+    # Тестирует переход на запасную программу, если основная не уложилась во время.
+    @patch('subprocess.run')
+    def test_render_file_fallback(self, mock_run):
+        mock_run.side_effect = [subprocess.TimeoutExpired('dot', 5),
+                                subprocess.CompletedProcess(args=[], returncode=0, stderr='')]
+
+        result = backends.render_file('graph.dot', 'svg', 'graph.svg', 'dot', timeout=5)
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.engine, 'sfdp')
+        self.assertEqual(mock_run.call_args_list[0][0][0], ['dot', '-Tsvg', '-o', 'graph.svg', 'graph.dot'])
+        self.assertEqual(mock_run.call_args_list[1][0][0], ['sfdp', '-Tsvg', '-o', 'graph.svg', 'graph.dot'])
+        self.assertEqual(mock_run.call_args_list[1][1]['timeout'], 5)
+
+    # Тестирует отрисовку в несколько форматов: ошибка одного файла не мешает остальным.
+    @patch('subprocess.run')
+    def test_render_outputs(self, mock_run):
+        mock_run.return_value = subprocess.CompletedProcess(args=[], returncode=1, stderr='syntax error')
+        graph = compact_graph.CompactGraph.from_tree(['commit1', 'commit2'], [('commit1', 'commit2')])
+        directory = tempfile.mkdtemp()
+        try:
+            outputs = backends.output_paths(os.path.join(directory, 'graph.png'), ['png', 'dot'])
+            with patch.object(backends, 'ProcessPoolExecutor', ThreadPoolExecutor):
+                results = visualizer.render_graph(graph, outputs, fallback=None)
+
+            self.assertFalse(results[0].ok)
+            self.assertIn('Ошибка при генерации PNG', results[0].error)
+            self.assertTrue(results[1].ok)
+            with open(outputs[1][1], encoding='utf-8') as f:
+                self.assertEqual(f.read(), visualizer.generate_graphviz_code(graph) + "\n")
+        finally:
+            shutil.rmtree(directory)
+
+    # Тестирует запасную программу при потоковой отрисовке одного файла.
+    @patch('graphviz_visualizer.visualizer.stream_graph')
+    def test_render_graph_single_fallback(self, mock_stream):
+        mock_stream.side_effect = [backends.RenderTimeout('dot не уложился в 1 с'), None]
+        graph = compact_graph.CompactGraph.from_tree(['commit1'], [])
+
+        results = visualizer.render_graph(graph, [('png', 'graph.png')], 'dot', timeout=1)
+
+        self.assertTrue(results[0].ok)
+        self.assertEqual(results[0].engine, 'sfdp')
+        mock_stream.assert_called_with(graph, 'graph.png', 'sfdp', 'png', 1)
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.repo_path = os.path.join(self.directory, 'repo')
+        subprocess.run(['git', 'init', '-q', self.repo_path], check=True)
+        subprocess.run(['git', '-C', self.repo_path, '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                        'commit', '-q', '--allow-empty', '-m', 'a'], check=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write_manifest(self, text):
+        path = os.path.join(self.directory, 'manifest.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    # Тестирует разбор манифеста: комментарии, пустые строки и пути в кавычках.
+    def test_read_manifest(self):
+        path = self.write_manifest('# репозитории\n\nrepo1 out1.png\n"my repo" "out 2.png"  # второй\n')
+        jobs = batch.read_manifest(path)
+        self.assertEqual([(job.repo_path, job.output_path) for job in jobs],
+                         [('repo1', 'out1.png'), ('my repo', 'out 2.png')])
+
+        with self.assertRaises(ValueError):
+            batch.read_manifest(self.write_manifest('repo1\n'))
+
+    # Тестирует, что ошибка одного репозитория не останавливает остальные и попадает в отчёт.
+    def test_run_batch(self):
+        dot_path = os.path.join(self.directory, 'graph.dot')
+        missing = os.path.join(self.directory, 'missing')
+        jobs = [batch.BatchJob(missing, 'none.png'), batch.BatchJob(self.repo_path, dot_path)]
+        args = visualizer.parse_arguments(['--batch', 'manifest.txt'])
+
+        with patch.object(batch, 'ProcessPoolExecutor', ThreadPoolExecutor):
+            batch.run_batch(jobs, args, 2, 2)
+
+        self.assertFalse(jobs[0].ok)
+        self.assertIn('не найден', jobs[0].error)
+        self.assertTrue(jobs[1].ok)
+        self.assertEqual(jobs[1].nodes, 1)
+        self.assertTrue(os.path.exists(dot_path))
+
+        report = batch.format_report(jobs)
+        self.assertIn('Всего: 2, успешно: 1, с ошибками: 1', report)
+        self.assertIn(missing, report)
+
+    # Тестирует проверку аргументов: пакетный режим исключает пути в командной строке.
+    def test_batch_arguments(self):
+        with patch('sys.stderr', new_callable=io.StringIO):
+            with self.assertRaises(SystemExit):
+                visualizer.parse_arguments([])
+            with self.assertRaises(SystemExit):
+                visualizer.parse_arguments(['repo', 'out.png', '--batch', 'manifest.txt'])
+            with self.assertRaises(SystemExit):
+                visualizer.parse_arguments(['repo', 'out.png', '--max-nodes', '0'])
+
+
+class TestAnalytics(unittest.TestCase):
+    # Перекрёстные слияния: у m1 и m2 два лучших общих предка (x и y).
+    def setUp(self):
+        commit_links = [('r', 'x'), ('r', 'y'), ('x', 'm1'), ('y', 'm1'), ('y', 'm2'), ('x', 'm2'),
+                        ('m1', 'a'), ('m2', 'b')]
+        self.graph = compact_graph.CompactGraph.from_tree(['r', 'x', 'y', 'm1', 'm2', 'a', 'b'], commit_links)
+        self.analytics = analytics.CommitAnalytics(self.graph)
+        self.tips = {'refs/heads/main': 'a', 'refs/heads/topic': 'b', 'HEAD': 'a'}
+
+    def node(self, name):
+        return self.graph.find(name)
+
+    def names(self, nodes):
+        return sorted(self.graph.name(node) for node in nodes)
+
+    # Тестирует номера поколений и топологический порядок.
+    def test_generation_numbers(self):
+        generations = {self.graph.name(node): self.analytics.generation[node] for node in range(len(self.graph))}
+        self.assertEqual(generations, {'r': 1, 'x': 2, 'y': 2, 'm1': 3, 'm2': 3, 'a': 4, 'b': 4})
+        position = {node: i for i, node in enumerate(self.analytics.order)}
+        self.assertTrue(all(position[parent] < position[child] for parent, child in self.graph.edges()))
+
+    # Тестирует поиск предков, потомков и проверку достижимости.
+    def test_reachability(self):
+        self.assertEqual(self.names(self.analytics.ancestors(self.node('m1'))), ['m1', 'r', 'x', 'y'])
+        self.assertEqual(self.names(self.analytics.descendants(self.node('y'))), ['a', 'b', 'm1', 'm2', 'y'])
+        self.assertTrue(self.analytics.is_ancestor(self.node('r'), self.node('b')))
+        self.assertFalse(self.analytics.is_ancestor(self.node('m1'), self.node('b')))
+        self.assertFalse(self.analytics.is_ancestor(self.node('a'), self.node('r')))
+
+    # Тестирует поиск лучших общих предков.
+    def test_merge_base(self):
+        self.assertEqual(self.names(self.analytics.merge_base(self.node('a'), self.node('b'))), ['x', 'y'])
+        self.assertEqual(self.names(self.analytics.merge_base(self.node('a'), self.node('m1'))), ['m1'])
+        self.assertEqual(self.names(self.analytics.merge_base(self.node('x'), self.node('y'))), ['r'])
+
+    # Тестирует подсчёт коммитов по веткам и поиск коммита по имени ветки.
+    def test_commits_per_branch(self):
+        self.assertEqual(self.analytics.resolve('main', self.tips), self.node('a'))
+        with self.assertRaises(KeyError):
+            self.analytics.resolve('missing', self.tips)
+        self.assertEqual(self.analytics.commits_per_branch(self.tips),
+                         {'HEAD': (5, 0), 'refs/heads/main': (5, 0), 'refs/heads/topic': (5, 2)})
+
+    # Тестирует суффиксы `~N` и `^N` после имени коммита.
+    def test_resolve_suffixes(self):
+        def resolve(name):
+            return self.graph.name(self.analytics.resolve(name, self.tips))
+
+        self.assertEqual(resolve('main~'), 'm1')
+        self.assertEqual(resolve('main~2'), 'x')
+        self.assertEqual(resolve('main^^2'), 'y')
+        self.assertEqual(resolve('topic~1^2'), 'x')
+        self.assertEqual(resolve('HEAD^0'), 'a')
+        self.assertEqual(resolve('main~3'), 'r')
+        with self.assertRaisesRegex(KeyError, 'нет родителя'):
+            self.analytics.resolve('main~4', self.tips)
+        with self.assertRaisesRegex(KeyError, 'нет родителя номер 3'):
+            self.analytics.resolve('m1^3', self.tips)
+
+    # Тестирует поиск по сокращённому хешу.
+    def test_resolve_prefix(self):
+        hashes = ['ab200' + '0' * 35, 'ab201' + '0' * 35, 'cd3' + '0' * 37]
+        graph = compact_graph.CompactGraph.from_tree(hashes, [])
+        query = analytics.CommitAnalytics(graph)
+        self.assertEqual(query.resolve('CD30'), 2)
+        self.assertEqual(query.resolve('ab201'), 1)
+        with self.assertRaisesRegex(KeyError, 'неоднозначен'):
+            query.resolve('ab20')
+        with self.assertRaisesRegex(KeyError, 'не найден'):
+            query.resolve('ab3')
+
+    # Тестирует команды командной строки.
+    @patch('graphviz_visualizer.graph_cache.read_ref_tips')
+    @patch('graphviz_visualizer.visualizer.load_commit_graph')
+    def test_cli(self, mock_load, mock_tips):
+        mock_load.return_value = self.graph
+        mock_tips.return_value = self.tips
+
+        output = io.StringIO()
+        analytics.run(analytics.parse_arguments(['repo', 'merge-base', 'main', 'topic']), output)
+        self.assertEqual(sorted(output.getvalue().split()), ['x', 'y'])
+
+        output = io.StringIO()
+        analytics.run(analytics.parse_arguments(['repo', 'branches', '--base', 'topic']), output)
+        self.assertIn('refs/heads/main\t5\t+2', output.getvalue())
+
+        self.assertEqual(analytics.run(analytics.parse_arguments(['repo', 'is-ancestor', 'x', 'main'])), 0)
+        self.assertEqual(analytics.run(analytics.parse_arguments(['repo', 'is-ancestor', 'main', 'x'])), 1)
+
+
+class TestBenchmark(unittest.TestCase):
+    # Тестирует, что синтетические репозитории имеют заданную форму и размер.
+    def test_synthetic_repositories(self):
+        workdir = tempfile.mkdtemp()
+        try:
+            for shape, merges in (('linear', 0), ('branched', 0), ('merges', 9)):
+                repo_path = benchmark.repository_for(workdir, shape, 30)
+                commits, commit_links = visualizer.get_commit_tree(repo_path)
+                self.assertEqual(len(commits), 30)
+                children = {}
+                for _, child in commit_links:
+                    children[child] = children.get(child, 0) + 1
+                self.assertEqual(sum(count > 1 for count in children.values()), merges)
+
+            tips = graph_cache.read_ref_tips_git(benchmark.repository_for(workdir, 'branched', 30))
+            self.assertEqual(len([name for name in tips if name.startswith('refs/heads/b')]), benchmark.BRANCH_COUNT)
+        finally:
+            shutil.rmtree(workdir)
+
+    # Тестирует, что пропущенная отрисовка видна в таблице, но не попадает в замеры.
+    @patch('graphviz_visualizer.benchmark.shutil.which', return_value=None)
+    def test_skipped_render_stages(self, mock_which):
+        workdir = tempfile.mkdtemp()
+        try:
+            output = io.StringIO()
+            results = benchmark.run_benchmark(['linear'], [30], workdir, output)
+        finally:
+            shutil.rmtree(workdir)
+        self.assertIn('linear/30/get_commit_tree', results)
+        self.assertNotIn('linear/30/save_graph', results)
+        skipped = [line for line in output.getvalue().splitlines() if 'пропущен' in line]
+        self.assertEqual([line.split()[2] for line in skipped], ['save_graph', 'stream_graph_png'])
+
+    # Тестирует, что общий файл замеров не перезаписывается без явного --baseline.
+    def test_update_baseline_requires_path(self):
+        with patch('sys.stderr', io.StringIO()), self.assertRaises(SystemExit):
+            benchmark.parse_arguments(['--update-baseline'])
+        self.assertEqual(benchmark.parse_arguments([]).baseline, benchmark.BASELINE_FILE)
+        self.assertEqual(benchmark.parse_arguments(['--baseline', 'local.json', '--update-baseline']).baseline,
+                         'local.json')
+
+    # Тестирует поиск ухудшений относительно сохранённых замеров.
+    def test_compare(self):
+        baseline = {'linear/1000/a': {'seconds': 1.0, 'peak': 1000},
+                    'linear/1000/b': {'seconds': 0.001, 'peak': 1000}}
+        results = {'linear/1000/a': {'seconds': 2.0, 'peak': 1100},
+                   'linear/1000/b': {'seconds': 0.01, 'peak': 5000},
+                   'linear/1000/c': {'seconds': 9.0, 'peak': 9000}}
+
+        # По умолчанию время не сравнивается: оно зависит от машины
+        regressions = benchmark.compare(results, baseline, tolerance=1.5)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('linear/1000/b: память', regressions[0])
+
+        regressions = benchmark.compare(results, baseline, tolerance=1.5, check_time=True)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('linear/1000/a: время', regressions[0])
+        self.assertIn('linear/1000/b: память', regressions[1])
+
+
+class TestNativeReader(unittest.TestCase):
+    # Создаёт настоящий репозиторий с ветвлением, слиянием и аннотированным тегом.
+    @classmethod
+    def setUpClass(cls):
+        cls.repo_path = tempfile.mkdtemp()
+
+        def git(*args):
+            return subprocess.run(['git', '-C', cls.repo_path, *args], check=True,
+                                  stdout=subprocess.PIPE, text=True).stdout.strip()
+
+        cls.git = staticmethod(git)
+        git('init', '-q', '-b', 'main')
+        git('config', 'user.email', 'test@example.com')
+        git('config', 'user.name', 'test')
+        for name in ('a', 'b'):
+            with open(os.path.join(cls.repo_path, name), 'w') as f:
+                f.write(name)
+            git('add', name)
+            git('commit', '-q', '-m', name)
+        git('checkout', '-q', '-b', 'feature', 'HEAD~1')
+        with open(os.path.join(cls.repo_path, 'c'), 'w') as f:
+            f.write('c')
+        git('add', 'c')
+        git('commit', '-q', '-m', 'c')
+        git('checkout', '-q', 'main')
+        git('merge', '-q', '--no-edit', 'feature')
+        git('tag', '-a', 'v1', '-m', 'v1', 'HEAD~1')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.repo_path, ignore_errors=True)
+
+    # Ожидаемый граф берётся из вывода `git log`.
+    def expected_tree(self):
+        commits, commit_links = visualizer.get_commit_tree(self.repo_path)
+        return set(commits), sorted(commit_links)
+
+    def assert_native_matches(self):
+        commits, commit_links = visualizer.get_commit_tree_native(self.repo_path)
+        self.assertEqual((set(commits), sorted(commit_links)), self.expected_tree())
+        graph_commits, graph_links = visualizer.load_commit_graph(self.repo_path, 'native').to_tree()
+        self.assertEqual((set(graph_commits), sorted(graph_links)), self.expected_tree())
+        positions = {commit: i for i, commit in enumerate(commits)}
+        self.assertTrue(all(positions[parent] < positions[child] for parent, child in commit_links))
+
+    # Тестирует чтение отдельных (loose) объектов.
+    def test_loose_objects(self):
+        self.assert_native_matches()
+        self.assertEqual(len(visualizer.get_commit_tree_native(self.repo_path)[1]), 4)
+
+    # Тестирует чтение pack-файлов с дельтами и файла commit-graph.
+    def test_packed_objects_and_commit_graph(self):
+        self.git('repack', '-adfq', '--window=50')
+        self.assert_native_matches()
+        self.git('commit-graph', 'write', '--reachable')
+        repository = git_objects.GitRepository(self.repo_path)
+        try:
+            self.assertIsNotNone(repository.commit_graph)
+            # Коммиты из commit-graph обходятся без чтения объектов
+            with patch.object(repository, 'object_parents') as mock_parents:
+                self.assertEqual(len(repository.load_graph()), 4)
+            mock_parents.assert_not_called()
+        finally:
+            repository.close()
+        self.assert_native_matches()
+
+        # Коммит, созданный после записи commit-graph, читается из объекта
+        late = self.git('commit-tree', 'HEAD^{tree}', '-p', 'HEAD', '-m', 'late')
+        self.git('branch', 'late', late)
+        try:
+            self.assert_native_matches()
+        finally:
+            self.git('branch', '-D', 'late')
+
+    # Тестирует связанную рабочую копию: объекты и ветки в общем каталоге, HEAD — свой.
+    def test_linked_worktree(self):
+        worktree_path = os.path.join(tempfile.mkdtemp(), 'worktree')
+        try:
+            self.git('worktree', 'add', '-q', '-b', 'side', worktree_path, 'HEAD~1')
+            repository = git_objects.GitRepository(worktree_path)
+            try:
+                tips = repository.ref_tips()
+            finally:
+                repository.close()
+            self.assertEqual(tips['HEAD'].hex(), self.git('rev-parse', 'HEAD~1'))
+            self.assertEqual(tips['refs/heads/main'].hex(), self.git('rev-parse', 'main'))
+
+            graph = visualizer.load_commit_graph(worktree_path, 'native')
+            self.assertEqual(len(graph), len(visualizer.load_commit_graph(self.repo_path, 'native')))
+            self.assertEqual(len(graph), 4)
+        finally:
+            self.git('worktree', 'remove', '--force', worktree_path)
+            shutil.rmtree(os.path.dirname(worktree_path), ignore_errors=True)
+
+    # Тестирует ошибку вместо пустого графа, когда ссылок нет.
+    def test_no_refs_raises(self):
+        repo_path = tempfile.mkdtemp()
+        try:
+            subprocess.run(['git', 'init', '-q', repo_path], check=True)
+            with self.assertRaises(RuntimeError):
+                visualizer.load_commit_graph(repo_path, 'native')
+        finally:
+            shutil.rmtree(repo_path, ignore_errors=True)
+
+    # Тестирует восстановление объекта по дельте: копирование из базы и вставка новых байтов.
+    def test_apply_delta(self):
+        base = b'hello world'
+        delta = bytes([11, 13, 0x91, 6, 5, 2]) + b'! ' + bytes([0x90, 5]) + bytes([1]) + b'!'
+        self.assertEqual(git_objects.apply_delta(base, delta), b'world! hello!')
+
+    # Тестирует переход на чтение объектов, если `git` недоступен.
+    @patch('graphviz_visualizer.visualizer.get_commit_tree')
+    @patch('graphviz_visualizer.visualizer.get_commit_tree_native')
+    def test_load_commit_tree_fallback(self, mock_native, mock_git):
+        mock_git.side_effect = FileNotFoundError('git')
+        mock_native.return_value = (['commit1'], [])
+
+        self.assertEqual(visualizer.load_commit_tree('fake_repo'), (['commit1'], []))
+        with self.assertRaises(FileNotFoundError):
+            visualizer.load_commit_tree('fake_repo', backend='git')
+
+
+class TestGraphCache(unittest.TestCase):
+    # Создаёт репозиторий с двумя коммитами и пустой каталог кэша.
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.git('init', '-q', '-b', 'main')
+        self.git('config', 'user.email', 'test@example.com')
+        self.git('config', 'user.name', 'test')
+        self.commit('a')
+        self.commit('b')
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path, ignore_errors=True)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def git(self, *args):
+        return subprocess.run(['git', '-C', self.repo_path, *args], check=True,
+                              stdout=subprocess.PIPE, text=True).stdout.strip()
+
+    def commit(self, name):
+        with open(os.path.join(self.repo_path, name), 'w') as f:
+            f.write(name)
+        self.git('add', name)
+        self.git('commit', '-q', '-m', name)
+
+    def load(self, backend):
+        commits, commit_links = visualizer.load_commit_tree(self.repo_path, backend, self.cache_dir)
+        expected_commits, expected_links = visualizer.get_commit_tree(self.repo_path)
+        self.assertEqual(set(commits), set(expected_commits))
+        self.assertEqual(sorted(commit_links), sorted(expected_links))
+        return commits
+
+    # Тестирует, что без изменений граф берётся из кэша, а после нового коммита читается только он.
+    def test_incremental_update(self):
+        for backend in ('native', 'git'):
+            shutil.rmtree(self.cache_dir)
+            self.load(backend)
+
+            with patch.object(visualizer, 'get_commit_tree_native') as mock_native, \
+                    patch.object(visualizer, 'get_commit_tree') as mock_git:
+                commits, _ = visualizer.load_commit_tree(self.repo_path, backend, self.cache_dir)
+                mock_native.assert_not_called()
+                mock_git.assert_not_called()
+            self.assertEqual(len(commits), len(set(commits)))
+
+            self.commit(f'c_{backend}')
+            with patch.object(visualizer, 'load_commit_tree', wraps=visualizer.load_commit_tree) as mock_full, \
+                    patch.object(visualizer, 'load_new_commits', wraps=visualizer.load_new_commits) as mock_new:
+                commits = self.load(backend)
+                mock_new.assert_called_once()
+                self.assertEqual(mock_full.call_count, 1)
+            self.assertEqual(commits[-1], self.git('rev-parse', 'HEAD'))
+
+    # Тестирует полное перестроение графа, если история ветки была переписана.
+    def test_rewritten_history(self):
+        self.load('native')
+        self.git('commit', '-q', '--amend', '-m', 'b2')
+        with patch.object(graph_cache, 'build_cache', wraps=graph_cache.build_cache) as mock_build:
+            commits = self.load('native')
+            mock_build.assert_called_once()
+        self.assertEqual(len(commits), 2)
+
+    # Тестирует, что повреждённый или чужой файл кэша не используется.
+    def test_read_cache_invalid(self):
+        path = graph_cache.cache_file(self.cache_dir, self.repo_path)
+        with open(path, 'w') as f:
+            f.write('{broken')
+        self.assertIsNone(graph_cache.read_cache(path, self.repo_path))
+
+        graph_cache.write_cache(path, graph_cache.build_cache('other_repo', {}, [], []))
+        self.assertIsNone(graph_cache.read_cache(path, self.repo_path))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,60 +1,331 @@
+import argparse
 import subprocess
 import sys
 import os
+import tempfile
+import time
+import zlib
 
-def get_commit_tree(repo_path):
+try:
+    from .git_objects import GitRepository
+    from . import graph_cache
+    from .compact_graph import CompactGraph
+    from .reduction import reduce_graph
+    from . import backends
+except ImportError:
+    from git_objects import GitRepository
+    import graph_cache
+    from compact_graph import CompactGraph
+    from reduction import reduce_graph
+    import backends
+
+def iter_commit_parents(repo_path, revisions=('--all',)):
     """
-    Получает дерево коммитов в репозитории.
+    Построчно читает вывод `git log` и перебирает коммиты вместе с их родителями.
 
     Аргументы:
         repo_path (str): Путь к репозиторию Git.
+        revisions (iterable): Ревизии для `git log`; по умолчанию все ссылки.
 
     Возвращает:
-        tuple: Список коммитов и их связей.
+        iterator: Пары (хеш коммита, список хешей родителей), родители раньше потомков.
 
     Исключения:
         RuntimeError: Ошибка выполнения команды `git log`.
     """
-    result = subprocess.run(
-        ['git', '-C', repo_path, 'log', '--pretty=format:%H', '--reverse'],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        encoding='utf-8'
-    )
+    # stderr пишется в файл: если git заполнит канал ошибок, пока мы читаем stdout, оба процесса зависнут
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            ['git', '-C', repo_path, 'log', *revisions, '--topo-order', '--reverse', '--pretty=format:%H %P'],
+            stdout=subprocess.PIPE,
+            stderr=errors,
+            text=True,
+            encoding='utf-8'
+        )
 
-    if result.returncode != 0:
-        raise RuntimeError(f"Ошибка: {result.stderr}")
+        with process:
+            for line in process.stdout:
+                hashes = line.split()
+                if hashes:
+                    yield hashes[0], hashes[1:]
+
+        if process.returncode != 0:
+            errors.seek(0)
+            raise RuntimeError(f"Ошибка при получении коммитов: {errors.read().decode('utf-8', 'replace')}")
+
+def get_commit_tree(repo_path, revisions=('--all',)):
+    """
+    Получает дерево коммитов в репозитории со всех веток.
+
+    Вывод `git log` построчно собирается в `CompactGraph`, и списки строятся уже из него,
+    так что отдельного строкового представления при чтении нет. Связи строятся по настоящим
+    родителям коммитов, а не по порядку в журнале, так что ветвления и слияния сохраняются.
+    Одинаковые хеши в списке коммитов и в связях ссылаются на один и тот же объект строки.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        revisions (iterable): Ревизии для `git log`; по умолчанию все ссылки. Родители
+            за границей выборки тоже попадают в список коммитов (сразу после первого
+            коммита, который на них ссылается), чтобы связи с ними сохранились.
+
+    Возвращает:
+        tuple: Список коммитов (родители раньше потомков) и список связей (родитель, потомок).
+
+    Исключения:
+        RuntimeError: Ошибка выполнения команды `git log`.
+    """
+    return CompactGraph.from_parents(iter_commit_parents(repo_path, revisions)).to_tree()
+
+def get_commit_tree_native(repo_path, tips=None, known=()):
+    """
+    Получает дерево коммитов, читая объекты `.git/objects` напрямую, без запуска `git`.
+
+    Если в репозитории есть файл commit-graph, родители берутся из него без распаковки объектов.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        tips (iterable): Хеши коммитов, с которых начинается обход; по умолчанию все ссылки.
+        known (set): Хеши уже известных коммитов, на которых обход останавливается.
+
+    Возвращает:
+        tuple: Список коммитов (родители раньше потомков) и список связей (родитель, потомок).
+
+    Исключения:
+        RuntimeError: Репозиторий не удалось прочитать.
+    """
+    try:
+        repository = GitRepository(repo_path)
+        try:
+            if tips is not None:
+                tips = [bytes.fromhex(tip) for tip in tips]
+            return repository.commit_tree(tips, known)
+        finally:
+            repository.close()
+    except (OSError, ValueError, KeyError, IndexError, zlib.error) as e:
+        raise RuntimeError(f"Ошибка при получении коммитов: {e}")
+
+def load_commit_tree(repo_path, backend='auto', cache_dir=None):
+    """
+    Получает дерево коммитов выбранным способом.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        backend (str): 'native' — чтение объектов, 'git' — вызов `git log`,
+            'auto' — `git log` с переходом на чтение объектов, если git недоступен.
+            Без файла commit-graph чтение объектов медленнее `git log`, поэтому по умолчанию
+            используется git.
+        cache_dir (str): Каталог кэша графа; если задан, читаются только новые коммиты.
+
+    Возвращает:
+        tuple: Список коммитов и список связей.
+    """
+    if cache_dir is not None:
+        return load_commit_tree_cached(repo_path, cache_dir, backend)
+    if backend == 'native':
+        return get_commit_tree_native(repo_path)
+    try:
+        return get_commit_tree(repo_path)
+    except (OSError, RuntimeError):
+        if backend == 'git':
+            raise
+        return get_commit_tree_native(repo_path)
+
+def load_new_commits(repo_path, new_tips, old_tips, known, backend='auto'):
+    """
+    Получает коммиты, достижимые из новых вершин ссылок, но ещё не известные.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        new_tips (list): Хеши коммитов, с которых начинается обход.
+        old_tips (list): Хеши вершин ссылок из кэша: всё, что достижимо из них, уже известно.
+        known (set): Хеши коммитов из кэша.
+        backend (str): Способ чтения коммитов.
+
+    Возвращает:
+        tuple: Новые коммиты (родители раньше потомков) и их связи с родителями.
+    """
+    if backend == 'native':
+        return get_commit_tree_native(repo_path, new_tips, known)
+    try:
+        return get_commit_tree(repo_path, [*new_tips, '--not', *old_tips])
+    except (OSError, RuntimeError):
+        if backend == 'git':
+            raise
+        return get_commit_tree_native(repo_path, new_tips, known)
 
-    commits = result.stdout.splitlines()
-    commit_links = [(commits[i], commits[i + 1]) for i in range(len(commits) - 1)]
-    return commits, commit_links
+def update_commit_cache(repo_path, cache_dir, backend='auto'):
+    """
+    Обновляет кэш графа коммитов, обрабатывая только коммиты, которых в нём ещё нет.
+
+    Если ссылки не изменились, граф берётся из кэша без чтения объектов. Если ссылки
+    сдвинулись вперёд, читаются только новые коммиты. Если ветки были удалены или
+    переписаны, граф строится заново.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        cache_dir (str): Каталог кэша.
+        backend (str): Способ чтения коммитов.
 
-def generate_graphviz_code(commits, commit_links):
+    Возвращает:
+        dict: Граф коммитов из кэша (см. `graph_cache`).
+    """
+    path = graph_cache.cache_file(cache_dir, repo_path)
+    cache = graph_cache.read_cache(path, repo_path)
+    tips = graph_cache.read_ref_tips(repo_path, backend)
+
+    if cache is not None and cache['tips'] == tips:
+        return cache
+
+    if cache is not None:
+        known = set(cache['commits'])
+        old_tips = cache['tips']
+        new_tips = sorted({sha for sha in tips.values() if sha not in known})
+        try:
+            if new_tips:
+                commits, commit_links = load_new_commits(repo_path, new_tips, sorted(set(old_tips.values())),
+                                                         known, backend)
+                graph_cache.extend_cache(cache, commits, commit_links)
+        except RuntimeError:
+            # Старые вершины могли быть удалены сборкой мусора после переписывания истории
+            cache = None
+        if cache is not None:
+            cache['tips'] = tips
+            if not graph_cache.tips_reachable(cache, old_tips, tips):
+                cache = None
+
+    if cache is None:
+        commits, commit_links = load_commit_tree(repo_path, backend)
+        cache = graph_cache.build_cache(repo_path, tips, commits, commit_links)
+
+    graph_cache.write_cache(path, cache)
+    return cache
+
+def load_commit_tree_cached(repo_path, cache_dir, backend='auto'):
+    """
+    Получает дерево коммитов через кэш (см. `update_commit_cache`).
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        cache_dir (str): Каталог кэша.
+        backend (str): Способ чтения коммитов.
+
+    Возвращает:
+        tuple: Список коммитов и список связей.
+    """
+    return graph_cache.cache_to_tree(update_commit_cache(repo_path, cache_dir, backend))
+
+def load_commit_graph(repo_path, backend='auto', cache_dir=None, revisions=None):
+    """
+    Получает граф коммитов в компактном виде, не создавая промежуточных списков строк.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        backend (str): Способ чтения коммитов, как в `load_commit_tree`.
+        cache_dir (str): Каталог кэша графа или None.
+        revisions (list): Ревизии и ограничения `git log` (диапазон, даты). Если заданы,
+            коммиты читаются через `git log`, а родители за границей выборки отбрасываются.
+
+    Возвращает:
+        CompactGraph: Граф коммитов.
+
+    Исключения:
+        RuntimeError: Ошибка при получении коммитов.
+    """
+    if revisions is not None:
+        return CompactGraph.from_parents(iter_commit_parents(repo_path, revisions), known_only=True)
+
+    if cache_dir is not None:
+        cache = update_commit_cache(repo_path, cache_dir, backend)
+        commits = cache['commits']
+        return CompactGraph.from_parents(
+            (commit, [commits[parent] for parent in parents]) for commit, parents in zip(commits, cache['parents']))
+
+    if backend != 'native':
+        try:
+            return CompactGraph.from_parents(iter_commit_parents(repo_path))
+        except (OSError, RuntimeError):
+            if backend == 'git':
+                raise
+    try:
+        repository = GitRepository(repo_path)
+        try:
+            return repository.load_graph()
+        finally:
+            repository.close()
+    except (OSError, ValueError, KeyError, IndexError, zlib.error) as e:
+        raise RuntimeError(f"Ошибка при получении коммитов: {e}")
+
+def window_revisions(since=None, until=None, ref_range=None):
+    """
+    Составляет ревизии `git log` для выборки части истории.
+
+    Аргументы:
+        since (str): Начальная дата в любом формате, который понимает git.
+        until (str): Конечная дата.
+        ref_range (str): Диапазон ссылок, например `v1.0..main`.
+
+    Возвращает:
+        list: Аргументы `git log` или None, если выборка не задана.
+    """
+    if since is None and until is None and ref_range is None:
+        return None
+    revisions = [ref_range] if ref_range else ['--all']
+    if since:
+        revisions.append(f'--since={since}')
+    if until:
+        revisions.append(f'--until={until}')
+    return revisions
+
+def iter_graphviz_lines(graph):
+    """
+    Построчно генерирует код Graphviz, не собирая его в одну строку.
+
+    Аргументы:
+        graph (CompactGraph): Граф коммитов.
+
+    Возвращает:
+        iterator: Строки кода Graphviz без перевода строки.
+    """
+    yield "digraph G {"
+    yield "    rankdir=LR;"
+
+    for node in range(len(graph)):
+        yield f'    "{graph.name(node)}" [shape=ellipse];'
+
+    for parent, child in graph.edges():
+        yield f'    "{graph.name(parent)}" -> "{graph.name(child)}";'
+
+    yield "}"
+
+def generate_graphviz_code(commits, commit_links=None):
     """
     Генерирует код Graphviz для графа коммитов.
 
     Аргументы:
-        commits (list): Список коммитов.
-        commit_links (list): Связи между коммитами.
+        commits (CompactGraph | list): Граф коммитов или список коммитов.
+        commit_links (list): Связи между коммитами, если передан список коммитов.
 
     Возвращает:
         str: Код Graphviz.
     """
-    lines = ["digraph G {", "    rankdir=LR;"]
-
-    for commit in commits:
-        lines.append(f'    "{commit}" [shape=ellipse];')
+    graph = commits if isinstance(commits, CompactGraph) else CompactGraph.from_tree(commits, commit_links)
+    return "\n".join(iter_graphviz_lines(graph))
 
-    for parent, child in commit_links:
-        lines.append(f'    "{parent}" -> "{child}";')
+def write_graphviz(graph, file):
+    """
+    Записывает код Graphviz в файл по мере генерации.
 
-    lines.append("}")
-    return "\n".join(lines)
+    Аргументы:
+        graph (CompactGraph): Граф коммитов.
+        file: Текстовый файл или поток, открытый на запись.
+    """
+    for line in iter_graphviz_lines(graph):
+        file.write(line)
+        file.write("\n")
 
 def save_graph(graph_code, output_path):
     """
-    Сохраняет граф в PNG.
+    Сохраняет готовый код Graphviz в PNG через временный файл `.dot`.
 
     Аргументы:
         graph_code (str): Код Graphviz.
@@ -75,34 +346,249 @@ def save_graph(graph_code, output_path):
     )
 
     if result.returncode != 0:
-        raise RuntimeError(f"Ошибка: {result.stderr}")
+        raise RuntimeError(f"Ошибка при генерации PNG: {result.stderr}")
 
     os.remove(dot_file)
 
+def stream_graph(graph, output_path, engine=backends.DEFAULT_ENGINE, output_format=None, timeout=None):
+    """
+    Сохраняет граф, передавая код Graphviz программе раскладки через стандартный ввод.
+
+    Код не собирается в строку и не пишется во временный файл, поэтому память не
+    зависит от размера истории. Для формата `dot` код Graphviz записывается
+    в файл построчно без запуска Graphviz.
+
+    Аргументы:
+        graph (CompactGraph): Граф коммитов.
+        output_path (str): Путь к результату.
+        engine (str): Программа раскладки (dot, sfdp, neato...).
+        output_format (str): Формат результата; по умолчанию определяется по расширению.
+        timeout (float): Время ожидания в секундах или None.
+
+    Исключения:
+        RenderTimeout: Время ожидания истекло.
+        RuntimeError: Ошибка генерации изображения.
+    """
+    output_format = output_format or backends.format_of(output_path)
+    if output_format == backends.SOURCE_FORMAT:
+        with open(output_path, 'w', encoding='utf-8') as file:
+            write_graphviz(graph, file)
+        return
+
+    command = backends.get_backend(engine, output_format).command(output_format, output_path)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    # stderr пишется в файл: заполненный канал остановил бы dot, пока мы пишем в stdin
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=errors,
+            text=True,
+            encoding='utf-8'
+        )
+        try:
+            try:
+                write_graphviz(graph, process.stdin)
+                process.stdin.close()
+            except BrokenPipeError:
+                # dot завершился раньше времени; причина будет в stderr
+                pass
+            process.wait(None if deadline is None else max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            raise backends.RenderTimeout(f"{engine} не уложился в {timeout} с")
+        finally:
+            if process.returncode is None:
+                process.kill()
+                process.wait()
+
+        if process.returncode != 0:
+            errors.seek(0)
+            raise RuntimeError(f"Ошибка при генерации {output_format.upper()}: "
+                               f"{errors.read().decode('utf-8', 'replace')}")
+
+def render_graph(graph, outputs, engine=backends.DEFAULT_ENGINE, timeout=None,
+                 fallback=backends.DEFAULT_FALLBACK, workers=None):
+    """
+    Отрисовывает граф в один или несколько файлов.
+
+    Один файл отрисовывается потоково через стандартный ввод. Несколько файлов
+    отрисовываются одновременно в пуле процессов по общему временному файлу `.dot`.
+    Если программа раскладки завершилась с ошибкой или не уложилась во время,
+    граф отрисовывается запасной программой.
+
+    Аргументы:
+        graph (CompactGraph): Граф коммитов.
+        outputs (list): Пары (формат, путь).
+        engine (str): Программа раскладки.
+        timeout (float): Время ожидания одной попытки в секундах или None.
+        fallback (str): Запасная программа раскладки или None.
+        workers (int): Число процессов для нескольких файлов.
+
+    Возвращает:
+        list: backends.RenderResult для каждого файла.
+    """
+    if len(outputs) != 1:
+        return backends.render_outputs(lambda file: write_graphviz(graph, file), outputs,
+                                       engine, timeout, fallback, workers)
+
+    output_format, output_path = outputs[0]
+    start = time.perf_counter()
+    if output_format == backends.SOURCE_FORMAT:
+        fallback = None
+    try:
+        used = backends.render_with_fallback(
+            lambda name: stream_graph(graph, output_path, name, output_format, timeout), engine, fallback)
+        return [backends.RenderResult(output_format, output_path, used, time.perf_counter() - start)]
+    except (RuntimeError, ValueError, OSError) as e:
+        return [backends.RenderResult(output_format, output_path, engine, time.perf_counter() - start, str(e))]
+
+def build_graph(repo_path, args):
+    """
+    Читает и при необходимости уменьшает граф коммитов по аргументам командной строки.
+
+    Аргументы:
+        repo_path (str): Путь к репозиторию Git.
+        args (argparse.Namespace): Аргументы из `parse_arguments`.
+
+    Возвращает:
+        CompactGraph: Граф для отрисовки.
+    """
+    revisions = window_revisions(args.since, args.until, args.ref_range)
+    graph = load_commit_graph(repo_path, args.backend, args.cache, revisions)
+    if args.collapse_chains or args.simplify or args.max_nodes is not None:
+        tips = []
+        if args.collapse_chains or args.simplify:
+            tips = graph_cache.read_ref_tips(repo_path, args.backend).values()
+        graph = reduce_graph(graph, tips, args.collapse_chains, args.simplify, args.max_nodes)
+    return graph
+
+def output_targets(output_path, args):
+    """Возвращает пары (формат, путь) для всех запрошенных форматов."""
+    formats = args.formats or [backends.format_of(output_path)]
+    return backends.output_paths(output_path, list(dict.fromkeys(formats)))
+
+def render_fallback(args):
+    """Возвращает запасную программу раскладки или None."""
+    return None if args.fallback == 'none' else args.fallback
+
+def parse_arguments(argv=None):
+    """
+    Разбирает аргументы командной строки.
+
+    Аргументы:
+        argv (list): Аргументы; по умолчанию берутся из `sys.argv`.
+
+    Возвращает:
+        argparse.Namespace: Разобранные аргументы.
+    """
+    parser = argparse.ArgumentParser(description="Визуализатор графа коммитов Git.")
+    parser.add_argument('repo_path', nargs='?', help="Путь к репозиторию.")
+    parser.add_argument('output_path', nargs='?',
+                        help="Путь для сохранения PNG (или кода Graphviz, если путь оканчивается на .dot).")
+    parser.add_argument('--backend', choices=['auto', 'native', 'git'], default='auto',
+                        help="Способ чтения коммитов: через `git log` (auto, git) или напрямую из .git/objects.")
+    parser.add_argument('--cache', nargs='?', const=graph_cache.DEFAULT_CACHE_DIR, default=None, metavar='DIR',
+                        help="Хранить граф между запусками и читать только новые коммиты.")
+    parser.add_argument('--since', help="Показывать коммиты не старше даты (как `git log --since`).")
+    parser.add_argument('--until', help="Показывать коммиты не новее даты.")
+    parser.add_argument('--range', dest='ref_range', metavar='RANGE',
+                        help="Показывать только диапазон ссылок, например v1.0..main.")
+    parser.add_argument('--collapse-chains', action='store_true',
+                        help="Сворачивать линейные цепочки коммитов в один узел.")
+    parser.add_argument('--simplify', action='store_true',
+                        help="Оставить только корни, ветвления, слияния и коммиты с ветками и тегами.")
+    parser.add_argument('--max-nodes', type=int, metavar='N',
+                        help="Оставить не больше N самых новых узлов.")
+    parser.add_argument('--format', dest='formats', action='append', choices=backends.FORMATS,
+                        help="Формат результата; можно указать несколько раз. По умолчанию — по расширению пути.")
+    parser.add_argument('--engine', choices=('auto',) + backends.LAYOUT_ENGINES, default='auto',
+                        help="Программа раскладки; auto выбирает sfdp для больших графов.")
+    parser.add_argument('--fallback', choices=('none',) + backends.LAYOUT_ENGINES, default=backends.DEFAULT_FALLBACK,
+                        help="Запасная программа раскладки при ошибке или превышении времени.")
+    parser.add_argument('--timeout', type=float, metavar='SEC',
+                        help="Время ожидания одной отрисовки в секундах.")
+    parser.add_argument('--jobs', type=int, metavar='N',
+                        help="Число одновременных отрисовок для нескольких форматов.")
+    parser.add_argument('--batch', metavar='MANIFEST',
+                        help="Обработать все пары '<репозиторий> <изображение>' из файла манифеста.")
+    parser.add_argument('--extract-workers', type=int, metavar='N',
+                        help="Число процессов чтения графов в пакетном режиме.")
+    parser.add_argument('--render-workers', type=int, metavar='N',
+                        help="Число одновременных отрисовок в пакетном режиме.")
+    args = parser.parse_args(argv)
+    if args.batch is None and (args.repo_path is None or args.output_path is None):
+        parser.error("нужно указать репозиторий и путь к изображению или манифест --batch")
+    if args.batch is not None and args.repo_path is not None:
+        parser.error("при --batch пути берутся из манифеста")
+    if args.max_nodes is not None and args.max_nodes < 1:
+        parser.error("--max-nodes должно быть не меньше 1")
+    return args
+
+def run_batch_mode(args):
+    """
+    Обрабатывает манифест и печатает отчёт по каждому репозиторию.
+
+    Аргументы:
+        args (argparse.Namespace): Аргументы командной строки.
+    """
+    try:
+        from . import batch
+    except ImportError:
+        import batch
+
+    try:
+        jobs = batch.read_manifest(args.batch)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
+    batch.run_batch(jobs, args, args.extract_workers, args.render_workers)
+    print(batch.format_report(jobs))
+    if not all(job.ok for job in jobs):
+        sys.exit(1)
+
 def main():
     """
     Основная функция. Запускает скрипт с аргументами:
         - repo_path: путь к репозиторию.
-        - output_path: путь для сохранения PNG.
+        - output_path: путь для сохранения PNG или `.dot`.
+        - --backend: способ чтения коммитов (auto, native, git).
+        - --cache: каталог кэша графа коммитов.
+        - --since, --until, --range: выборка части истории.
+        - --collapse-chains, --simplify, --max-nodes: уменьшение графа для больших репозиториев.
+        - --format, --engine, --fallback, --timeout, --jobs: форматы и способ отрисовки.
+        - --batch, --extract-workers, --render-workers: пакетная обработка по манифесту.
     """
-    if len(sys.argv) != 3:
-        print("Использование: python visualizer.py <repo_path> <output_path>")
-        sys.exit(1)
+    args = parse_arguments()
+    if args.batch is not None:
+        run_batch_mode(args)
+        return
 
-    repo_path, output_path = sys.argv[1:3]
+    repo_path, output_path = args.repo_path, args.output_path
 
     if not os.path.isdir(repo_path):
         print(f"Ошибка: Репозиторий {repo_path} не найден.")
         sys.exit(1)
 
     try:
-        commits, commit_links = get_commit_tree(repo_path)
-        graph_code = generate_graphviz_code(commits, commit_links)
-        save_graph(graph_code, output_path)
-        print(f"Граф успешно сохранен в {output_path}")
+        graph = build_graph(repo_path, args)
+        outputs = output_targets(output_path, args)
+        engine = backends.choose_engine(len(graph), args.engine)
+        results = render_graph(graph, outputs, engine, args.timeout, render_fallback(args), args.jobs)
     except Exception as e:
         print(f"Ошибка: {e}")
         sys.exit(1)
 
+    failed = False
+    for result in results:
+        if result.ok:
+            print(f"Граф успешно сохранен в {result.output_path} ({result.engine}, {result.seconds:.2f} с)")
+        else:
+            print(f"Ошибка: {result.output_path}: {result.error}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -1,174 +1,542 @@
 import argparse
+import hashlib
+import io
 import re
+import shutil
 import sys
 import os
+import tempfile
+from collections import namedtuple
 
-def resolve_value(value, is_inside_struct=False):
-    """Преобразование строки в соответствующее значение Python (int, bool, list, dict, str)."""
-    value = value.strip().rstrip(',')
+Token = namedtuple('Token', 'kind value line column')  # Лексема и её позиция во входном тексте
+Reference = namedtuple('Reference', 'name line column')  # Вычисление константы `?(имя)` до подстановки
+
+EOF = 'EOF'
+CHUNK_SIZE = 1 << 20  # Размер части файла при потоковом чтении, в символах
+TOOL_VERSION = "1"  # Входит в ключ кэша: увеличивается при любом изменении разбора или вывода
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'config_to_toml')
+DEFAULT_CACHE_SIZE = 64  # Предел размера кэша, в мегабайтах
+TOKEN_PATTERN = re.compile(r'''
+    (?P<SPACE>\s+)
+  | (?P<COMMENT>\#[^\n]*)
+  | (?P<NUMBER>\d+)
+  | (?P<STRING>"[^"\n]*")
+  | (?P<NAME>[a-zA-Z][_a-zA-Z0-9]*)
+  | (?P<SYMBOL>[{}\[\]=,;()?])
+''', re.VERBOSE)
+
+def syntax_error(line, column, message):
+    """Создание исключения с позицией ошибки во входном тексте."""
+    return SyntaxError(f"Синтаксическая ошибка в строке {line}, столбец {column}: {message}")
+
+def tokenize_chunks(chunks):
+    """
+    Разбиение текста, поступающего частями, на лексемы за один проход; пробелы и комментарии пропускаются.
+
+    Лексема, которая упирается в конец прочитанной части, откладывается до следующей части,
+    поэтому в памяти одновременно находятся только текущая часть и её необработанный хвост.
+    """
+    line, line_start = 1, 0  # line_start — смещение начала текущей строки от начала текста
+    offset = 0  # Смещение буфера от начала текста
+    buffer = ""
+    chunks = iter(chunks)
+    final = False
+
+    while not final:
+        chunk = next(chunks, None)
+        final = chunk is None
+        if chunk:
+            buffer += chunk
+        position, end = 0, len(buffer)
+
+        while position < end:
+            match = TOKEN_PATTERN.match(buffer, position)
+            if not final and (match is None or match.end() == end):  # Лексема может продолжиться
+                break
+            if match is None:
+                message = "незакрытая строка" if buffer[position] == '"' else f"неожиданный символ {buffer[position]!r}"
+                raise syntax_error(line, offset + position - line_start + 1, message)
+
+            kind = match.lastgroup
+            if kind == 'SPACE':  # Переводы строк нужны только для подсчёта позиции
+                newlines = buffer.count('\n', position, match.end())
+                if newlines:
+                    line += newlines
+                    line_start = offset + buffer.rfind('\n', position, match.end()) + 1
+            elif kind != 'COMMENT':
+                value = match.group()
+                yield Token(value if kind == 'SYMBOL' else kind, value, line, offset + position - line_start + 1)
+            position = match.end()
+
+        buffer = buffer[position:]
+        offset += position
 
-    # Определение типа значения по содержимому строки
-    if value.startswith('"') and value.endswith('"'):  # Строка
-        return value.strip('"')
-    elif re.match(r'^\d+$', value):  # Целое число
-        return int(value)
-    elif value.lower() == "true":  # Логическое значение True
-        return True
-    elif value.lower() == "false":  # Логическое значение False
+    yield Token(EOF, '', line, offset - line_start + 1)
+
+def tokenize(text):
+    """Разбиение текста на лексемы."""
+    return tokenize_chunks((text,))
+
+def tokenize_file(file, chunk_size=CHUNK_SIZE):
+    """Разбиение на лексемы текстового файла, читаемого частями по chunk_size символов."""
+    return tokenize_chunks(iter(lambda: file.read(chunk_size), ''))
+
+class Parser:
+    """Разбор лексем без рекурсии: открытые массивы и словари хранятся в явном стеке."""
+
+    def __init__(self, tokens):
+        self._tokens = iter(tokens)
+        self._current = next(self._tokens)
+
+    def _advance(self):
+        token = self._current
+        if token.kind != EOF:
+            self._current = next(self._tokens)
+        return token
+
+    def _accept(self, kind):
+        return self._advance() if self._current.kind == kind else None
+
+    def _expect(self, kind, expected=None):
+        if self._current.kind != kind:
+            raise self._error(expected or f"'{kind}'")
+        return self._advance()
+
+    def _error(self, expected, token=None):
+        token = token or self._current
+        found = "конец файла" if token.kind == EOF else f"'{token.value}'"
+        return syntax_error(token.line, token.column, f"ожидалось {expected}, получено {found}")
+
+    def _member_key(self):
+        """Чтение `имя =` очередного элемента словаря; None, если словарь закрыт."""
+        if self._accept('}'):
+            return None
+        key = self._expect('NAME', "имя или '}'").value
+        self._expect('=')
+        return key
+
+    def _opens_struct(self, token):
+        """Словарь открывается `{` или, как в описании языка, `struct {`."""
+        if token.kind == '{':
+            return True
+        if token.kind == 'NAME' and token.value == 'struct' and self._current.kind == '{':
+            self._advance()
+            return True
         return False
-    elif value.startswith("[") and value.endswith("]"):  # Массив
-        return parse_array(value[1:-1])
-    elif value.startswith("{") and value.endswith("}"):  # Словарь
-        return parse_struct(value[1:-1])
-    elif is_inside_struct:  # Обработка значения в структуре
+
+    def _scalar(self, token, bare_names):
+        if token.kind == 'NUMBER':
+            return int(token.value)
+        if token.kind == 'STRING':
+            return token.value[1:-1]
+        if token.kind == 'NAME':
+            if token.value.lower() == 'true':
+                return True
+            if token.value.lower() == 'false':
+                return False
+            if bare_names:  # Внутри структур имя без кавычек считается строкой
+                return token.value
+        raise self._error("значение", token)
+
+    def _reference(self, token):
+        """Чтение `?(имя)` после знака `?`."""
+        self._expect('(')
+        name = self._expect('NAME', "имя константы").value
+        self._expect(')')
+        return Reference(name, token.line, token.column)
+
+    def parse_value(self, bare_names=False, references=None):
+        """
+        Разбор одного значения любой вложенности.
+
+        Если передан список references, в значении допускаются `?(имя)`: на их место
+        ставится Reference, а в references добавляется тройка (контейнер, ключ, ссылка).
+        Ссылку, которая сама является значением, записывает вызывающий код.
+        """
+        stack = []  # Открытые контейнеры: [список или словарь, ключ текущего элемента]
+
+        while True:
+            # Ожидается значение: скаляр или начало контейнера
+            token = self._advance()
+            if token.kind == '[':
+                if not self._accept(']'):
+                    stack.append([[], None])
+                    continue
+                value = []
+            elif self._opens_struct(token):
+                key = self._member_key()
+                if key is not None:
+                    stack.append([{}, key])
+                    continue
+                value = {}
+            elif token.kind == '?' and references is not None:
+                value = self._reference(token)
+            else:
+                value = self._scalar(token, bare_names or bool(stack))
+
+            # Значение готово: кладём его в контейнер и закрываем завершённые контейнеры
+            while stack:
+                frame = stack[-1]
+                container = frame[0]
+                if isinstance(container, list):
+                    if isinstance(value, Reference):
+                        references.append((container, len(container), value))
+                    container.append(value)
+                    if self._accept(','):
+                        if not self._accept(']'):  # Допускается запятая после последнего элемента
+                            break
+                    else:
+                        self._expect(']', "',' или ']'")
+                else:
+                    if isinstance(value, Reference):
+                        references.append((container, frame[1], value))
+                    container[frame[1]] = value
+                    if self._accept(','):
+                        frame[1] = self._member_key()
+                        if frame[1] is not None:
+                            break
+                    else:
+                        self._expect('}', "',' или '}'")
+                value = stack.pop()[0]
+            else:
+                return value
+
+    def parse_single(self, bare_names=False):
+        """Разбор текста, состоящего из одного значения."""
+        value = self.parse_value(bare_names)
+        self._expect(EOF, "конец значения")
         return value
-    else:
+
+    def statements(self):
+        """
+        Разбор файла по одному объявлению верхнего уровня.
+
+        Для каждого объявления выдаётся четвёрка (константа ли, имя, значение, ссылки):
+        для `set имя = значение;` — (True, имя, значение, ссылки), для блока `struct` —
+        (False, None, словарь, ссылки), для `имя = значение` — (False, имя, значение, ссылки).
+        Ссылки — тройки из parse_value; если ссылкой является само значение, её записывает вызывающий код.
+        Константа объявляется один раз: иначе ссылка в полном и потоковом режимах получила бы разные значения.
+        """
+        declared = set()  # Имена уже объявленных констант
+        while self._current.kind != EOF:
+            token = self._expect('NAME', "имя, set или struct")
+            references = []
+            if token.value == 'set' and self._current.kind == 'NAME':  # Объявление константы
+                name_token = self._advance()
+                name = name_token.value
+                if name in declared:
+                    raise syntax_error(name_token.line, name_token.column, f"константа '{name}' уже объявлена")
+                declared.add(name)
+                self._expect('=')
+                value = self.parse_value(references=references)
+                self._expect(';')
+                yield True, name, value, references
+            elif token.value == 'struct' and self._current.kind == '{':  # Блок `struct`
+                value = self.parse_value(references=references)
+                self._accept(';')
+                yield False, None, value, references
+            else:  # Прочие ключи-значения
+                self._expect('=')
+                value = self.parse_value(references=references)
+                self._accept(';')
+                yield False, token.value, value, references
+
+    def parse_config(self):
+        """Разбор всего файла: объявления `set`, блоки `struct` и пары `имя = значение`."""
+        constants = {}  # Константы, задаваемые через `set`
+        dependencies = {}  # Ссылки `?(имя)` внутри значения каждой константы
+        sections = []  # Блоки `struct` и пары `имя = значение` в порядке появления
+        references = []  # Ссылки `?(имя)` вне объявлений констант
+
+        for constant, key, value, slots in self.statements():
+            if constant:
+                constants[key] = value
+                dependencies[key] = slots
+                if isinstance(value, Reference):
+                    slots.append((constants, key, value))
+            else:
+                section = value if key is None else {key: value}
+                if isinstance(value, Reference):
+                    slots.append((section, key, value))
+                sections.append(section)
+                references.extend(slots)
+
+        resolve_constants(constants, dependencies)
+        substitute_references(references, constants)
+
+        result = {}  # Итоговая структура данных
+        for section in sections:
+            result.update(section)
+        result.update(constants)
+        return result
+
+def undefined_constant(reference):
+    """Создание исключения для ссылки на необъявленную константу."""
+    return syntax_error(reference.line, reference.column, f"константа '{reference.name}' не объявлена")
+
+def resolve_constants(constants, dependencies):
+    """Вычисление констант: каждая вычисляется один раз, после всех констант, на которые ссылается."""
+    resolved = set()
+
+    for root in constants:
+        if root in resolved:
+            continue
+        # Обход графа зависимостей в глубину без рекурсии: [константа, её ссылки, ссылка, ждущая её значения]
+        stack = [[root, iter(dependencies[root]), None]]
+        on_path = {root}
+        while stack:
+            frame = stack[-1]
+            for container, key, reference in frame[1]:
+                name = reference.name
+                if name not in constants:
+                    raise undefined_constant(reference)
+                if name in resolved:
+                    container[key] = constants[name]
+                    continue
+                if name in on_path:
+                    cycle = [entry[0] for entry in stack]
+                    cycle = cycle[cycle.index(name):] + [name]
+                    raise syntax_error(reference.line, reference.column,
+                                       f"циклическая зависимость констант: {' -> '.join(cycle)}")
+                stack.append([name, iter(dependencies[name]), (container, key)])
+                on_path.add(name)
+                break
+            else:  # Все ссылки подставлены: значение константы окончательное
+                stack.pop()
+                on_path.discard(frame[0])
+                resolved.add(frame[0])
+                if frame[2] is not None:
+                    container, key = frame[2]
+                    container[key] = constants[frame[0]]
+
+def substitute_references(references, constants):
+    """Подстановка вычисленных констант на место ссылок `?(имя)`."""
+    for container, key, reference in references:
+        if reference.name not in constants:
+            raise undefined_constant(reference)
+        container[key] = constants[reference.name]
+
+def resolve_value(value, is_inside_struct=False):
+    """Преобразование строки в соответствующее значение Python (int, bool, list, dict, str)."""
+    value = value.strip().rstrip(',')
+    try:
+        return Parser(tokenize(value)).parse_single(bare_names=is_inside_struct)
+    except SyntaxError:
         raise ValueError(f"Некорректное значение: {value}")
 
 def parse_array(array_content):
     """Парсинг массива (списка), поддерживает вложенные структуры."""
-    parsed_array = []
-    buffer = ""
-    brace_depth = 0  # Уровень вложенности скобок
-    inside_quotes = False
-
-    for char in array_content:
-        if char == '"' and brace_depth == 0:  # Обработка кавычек
-            inside_quotes = not inside_quotes
-            buffer += char
-        elif char in '[{' and not inside_quotes:  # Увеличиваем вложенность
-            brace_depth += 1
-            buffer += char
-        elif char in ']}' and not inside_quotes:  # Уменьшаем вложенность
-            brace_depth -= 1
-            buffer += char
-            if brace_depth == 0:  # Завершаем элемент массива
-                parsed_array.append(resolve_value(buffer.strip(), is_inside_struct=True))
-                buffer = ""
-        elif char == ',' and not inside_quotes and brace_depth == 0:  # Разделитель элементов массива
-            if buffer.strip():
-                parsed_array.append(resolve_value(buffer.strip(), is_inside_struct=True))
-            buffer = ""
-        else:
-            buffer += char
-
-    # Добавляем последний элемент массива
-    if buffer.strip():
-        parsed_array.append(resolve_value(buffer.strip(), is_inside_struct=True))
-
-    return parsed_array
+    return Parser(tokenize(f"[{array_content}]")).parse_single()
 
 def parse_struct(struct_content):
     """Парсинг структуры (словаря), поддерживает вложенные структуры."""
-    parsed_struct = {}
-    buffer = ""
-    brace_depth = 0
-    current_key = None  # Текущий ключ словаря
-    inside_quotes = False
-
-    for char in struct_content:
-        if char == '"' and brace_depth == 0:  # Обработка кавычек
-            inside_quotes = not inside_quotes
-            buffer += char
-        elif char in '[{' and not inside_quotes:  # Увеличиваем вложенность
-            brace_depth += 1
-            buffer += char
-        elif char in ']}' and not inside_quotes:  # Уменьшаем вложенность
-            brace_depth -= 1
-            buffer += char
-        elif char == '=' and brace_depth == 0 and not inside_quotes:  # Разделитель ключ-значение
-            current_key = buffer.strip()
-            buffer = ""
-        elif char == ',' and brace_depth == 0 and not inside_quotes:  # Разделитель элементов словаря
-            if current_key:
-                parsed_struct[current_key] = resolve_value(buffer.strip(), is_inside_struct=True)
-                current_key = None
-            buffer = ""
-        else:
-            buffer += char
-
-    # Добавляем последний элемент словаря
-    if buffer.strip() and current_key:
-        parsed_struct[current_key] = resolve_value(buffer.strip(), is_inside_struct=True)
-
-    return parsed_struct
+    return Parser(tokenize(f"{{{struct_content}}}")).parse_single()
 
 def parse_config(input_data):
     """Основной процесс парсинга конфигурационного файла."""
-    constants = {}  # Константы, задаваемые через `set`
-    result = {}  # Итоговая структура данных
-    lines = input_data.splitlines()
-    inside_struct = False  # Флаг для обработки блока `struct`
-    struct_buffer = []
+    return Parser(tokenize(input_data)).parse_config()
 
-    for line in lines:
-        line = line.strip()
+BARE_KEY = re.compile(r'[A-Za-z0-9_-]+')
+STRING_ESCAPES = {code: f"\\u{code:04X}" for code in [*range(0x20), 0x7F]}  # Управляющие символы
+STRING_ESCAPES.update({ord('"'): '\\"', ord('\\'): '\\\\', ord('\b'): '\\b', ord('\t'): '\\t',
+                       ord('\n'): '\\n', ord('\f'): '\\f', ord('\r'): '\\r'})
 
-        # Игнорируем пустые строки и комментарии
-        if not line or line.startswith("#"):
-            continue
+def quote_string(value):
+    """Строка TOML в двойных кавычках с экранированием кавычек, обратной черты и управляющих символов."""
+    return f'"{value.translate(STRING_ESCAPES)}"'
 
-        if line.startswith("set "):  # Обработка констант
-            match = re.match(r'set\s+([a-zA-Z][_a-zA-Z0-9]*)\s*=\s*(.+);', line)
-            if match:
-                key, value = match.groups()
-                constants[key] = resolve_value(value.strip())
-            else:
-                raise SyntaxError(f"Синтаксическая ошибка в строке: {line}")
-
-        elif line.startswith("struct {"):  # Начало блока `struct`
-            inside_struct = True
-            struct_buffer = []
-        elif inside_struct and line == "}":  # Конец блока `struct`
-            inside_struct = False
-            struct_content = " ".join(struct_buffer)
-            parsed_struct = parse_struct(struct_content)
-            result.update(parsed_struct)
-        elif inside_struct:  # Сбор строк блока `struct`
-            struct_buffer.append(line)
-        else:  # Прочие ключи-значения
-            match = re.match(r'([a-zA-Z][_a-zA-Z0-9]*)\s*=\s*(.+)', line)
-            if match:
-                key, value = match.groups()
-                result[key.strip()] = resolve_value(value.strip())
-            else:
-                raise SyntaxError(f"Синтаксическая ошибка в строке: {line}")
+def format_key(key):
+    """Ключ TOML: без кавычек, если состоит только из допустимых символов."""
+    return key if BARE_KEY.fullmatch(key) else quote_string(key)
+
+def format_scalar(value):
+    """Запись строки, числа или логического значения в синтаксисе TOML."""
+    if isinstance(value, bool):  # bool проверяется раньше int: True — тоже int
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        return quote_string(value)
+    raise TypeError(f"Неподдерживаемое значение: {value!r}")
+
+def write_value(value, file):
+    """Запись значения в файл; массивы и встроенные таблицы любой вложенности обходятся без рекурсии."""
+    stack = []  # Открытые контейнеры: [итератор элементов, закрывающая скобка, первый элемент, таблица]
 
-    result.update(constants)
-    return result
+    while True:
+        if isinstance(value, list):
+            file.write("[")
+            stack.append([iter(value), "]", True, False])
+        elif isinstance(value, dict):
+            file.write("{ " if value else "{")
+            stack.append([iter(value.items()), " }" if value else "}", True, True])
+        else:
+            file.write(format_scalar(value))
+
+        # Переход к следующему элементу ближайшего незакрытого контейнера
+        while stack:
+            frame = stack[-1]
+            item = next(frame[0], stack)  # Сам стек служит признаком конца итератора
+            if item is stack:
+                file.write(frame[1])
+                stack.pop()
+                continue
+            if not frame[2]:
+                file.write(", ")
+            frame[2] = False
+            if frame[3]:
+                key, item = item
+                file.write(f"{format_key(key)} = ")
+            value = item
+            break
+        else:
+            return
+
+def write_toml(parsed_data, file, parent_key=None, continued=False):
+    """
+    Запись словаря в формате TOML прямо в файловый объект: сначала значения таблицы, затем её подтаблицы.
+
+    continued означает, что в файл уже что-то записано и перед первой таблицей нужна пустая строка.
+    """
+    stack = [(parent_key, parsed_data)]  # Таблицы, ожидающие записи
+    written = continued  # Перед заголовком таблицы, кроме самого первого, пишется пустая строка
+
+    while stack:
+        section_name, table = stack.pop()
+        if section_name != parent_key:
+            if written:
+                file.write("\n")
+            file.write(f"[{section_name}]\n")
+            written = True
+
+        child_sections = []  # Вложенные секции
+        for key, value in table.items():
+            if isinstance(value, dict):
+                key = format_key(key)
+                child_sections.append((f"{section_name}.{key}" if section_name else key, value))
+            else:
+                file.write(f"{format_key(key)} = ")
+                write_value(value, file)
+                file.write("\n")
+                written = True
+        stack.extend(reversed(child_sections))
 
 def generate_toml(parsed_data, parent_key=None):
     """Генерация TOML файла из словаря."""
-    toml_lines = []
-    child_sections = []  # Вложенные секции
-
-    for key, value in parsed_data.items():
-        if isinstance(value, dict):  # Вложенные словари
-            section_name = f"{parent_key}.{key}" if parent_key else key
-            child_sections.append((section_name, value))
-        elif isinstance(value, list):  # Массивы
-            array_values = ', '.join(
-                f'"{v}"' if isinstance(v, str) else str(v).lower() for v in value
-            )
-            toml_lines.append(f"{key} = [{array_values}]")
-        elif isinstance(value, str):  # Строки
-            toml_lines.append(f'{key} = "{value}"')
-        elif isinstance(value, (int, bool)):  # Логические и числовые значения
-            toml_lines.append(f"{key} = {str(value).lower()}")
-
-    for i, (section_name, child_data) in enumerate(child_sections):
-        if toml_lines or i > 0:  # Пустая строка перед секцией
-            toml_lines.append("")
-        toml_lines.append(f"[{section_name}]")
-        toml_lines.append(generate_toml(child_data, section_name))
-
-    return "\n".join(toml_lines)
+    buffer = io.StringIO()
+    write_toml(parsed_data, buffer, parent_key)
+    return buffer.getvalue().rstrip("\n")
+
+def convert_stream(infile, outfile, chunk_size=CHUNK_SIZE):
+    """
+    Потоковое преобразование: каждое объявление верхнего уровня записывается в TOML, как только закрыто.
+
+    В памяти держатся только текущее объявление, таблица констант и имена записанных ключей.
+    Поэтому константа должна быть объявлена до использования, значения верхнего уровня
+    должны идти до первой таблицы (в TOML нельзя вернуться к корневой таблице),
+    а ключи верхнего уровня не должны повторяться.
+    """
+    constants = {}  # Константы, объявленные к текущему месту файла
+    written = set()  # Ключи верхнего уровня, уже записанные в outfile
+    tables_written = False
+
+    for constant, key, value, slots in Parser(tokenize_file(infile, chunk_size)).statements():
+        section = value if key is None else {key: value}
+        if isinstance(value, Reference):
+            slots.append((section, key, value))
+        substitute_references(slots, constants)
+        if constant:
+            constants[key] = section[key]
+
+        for name, item in section.items():
+            if name in written:
+                raise ValueError(f"ключ '{name}' уже записан; в потоковом режиме ключи верхнего уровня не повторяются")
+            if tables_written and not isinstance(item, dict):
+                raise ValueError(f"значение '{name}' идёт после таблицы; "
+                                 f"в потоковом режиме значения верхнего уровня должны идти до первой таблицы")
+        write_toml(section, outfile, continued=bool(written))
+        written.update(section)
+        tables_written = tables_written or any(isinstance(item, dict) for item in section.values())
+
+def convert_file(input_path, output_path, stream=False):
+    """Преобразование файла конфигурации в файл TOML целиком или потоково."""
+    if stream:
+        with open(input_path, 'r') as infile, open(output_path, 'w', encoding='utf-8') as outfile:
+            convert_stream(infile, outfile)
+    else:
+        with open(input_path, 'r') as infile:
+            input_data = infile.read()
+
+        parsed_data = parse_config(input_data)
+
+        with open(output_path, 'w', encoding='utf-8') as outfile:
+            write_toml(parsed_data, outfile)
+
+def cache_key(input_path, stream=False):
+    """Ключ кэша: хеш содержимого входного файла, версии инструмента и режима (порядок ключей в режимах разный)."""
+    digest = hashlib.sha256(f"{TOOL_VERSION}\0{'stream' if stream else 'full'}\0".encode())
+    with open(input_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_lookup(cache_dir, key, output_path):
+    """Копирование сохранённого TOML в output_path; False, если в кэше его нет."""
+    path = os.path.join(cache_dir, f"{key}.toml")
+    try:
+        shutil.copyfile(path, output_path)
+        os.utime(path)  # Время изменения — время последнего обращения, по нему вытесняются старые записи
+    except OSError:  # Недоступная или повреждённая запись — просто промах, файл преобразуется заново
+        return False
+    return True
+
+def cache_store(cache_dir, key, output_path, max_size):
+    """Атомарное сохранение готового TOML в кэш и вытеснение давно не использованных записей."""
+    os.makedirs(cache_dir, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file, open(output_path, 'rb') as source:
+            shutil.copyfileobj(source, file)
+        os.replace(temp_path, os.path.join(cache_dir, f"{key}.toml"))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    evict_cache(cache_dir, max_size)
+
+def evict_cache(cache_dir, max_size):
+    """Удаление записей кэша, начиная с самых давно использованных, пока общий размер больше max_size байт."""
+    entries = []
+    with os.scandir(cache_dir) as scan:
+        for entry in scan:
+            if entry.name.endswith('.toml'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # Запись удалил параллельно работающий процесс
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
 
 def main():
     """Точка входа программы."""
     parser = argparse.ArgumentParser(description="Конвертировать конфигурацию в TOML")
     parser.add_argument("--input", required=True, help="Путь к входному файлу конфигурации")
     parser.add_argument("--output", required=True, help="Путь к выходному файлу TOML")
+    parser.add_argument("--stream", action="store_true",
+                        help="Читать файл частями и записывать каждое объявление сразу после разбора "
+                             "(константы объявляются до использования)")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, default=None, metavar="DIR",
+                        help="Каталог кэша готовых TOML; неизменённые файлы не разбираются повторно")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, metavar="MB",
+                        help="Предел размера кэша в мегабайтах")
     args = parser.parse_args()
 
     if not os.path.isfile(args.input):  # Проверка входного файла
@@ -176,14 +544,18 @@ def main():
         sys.exit(1)
 
     try:
-        with open(args.input, 'r') as infile:
-            input_data = infile.read()
-
-        parsed_data = parse_config(input_data)
-        toml_data = generate_toml(parsed_data)
-
-        with open(args.output, 'w') as outfile:
-            outfile.write(toml_data)
+        if args.cache is None:
+            convert_file(args.input, args.output, args.stream)
+        else:
+            key = cache_key(args.input, args.stream)
+            if cache_lookup(args.cache, key, args.output):
+                print(f"Конфигурация взята из кэша и сохранена в {args.output}.")
+                return
+            convert_file(args.input, args.output, args.stream)
+            try:
+                cache_store(args.cache, key, args.output, args.cache_size << 20)
+            except OSError as e:  # Результат уже записан, ошибка кэша на него не влияет
+                print(f"Предупреждение: не удалось сохранить результат в кэш: {e}")
 
         print(f"Конфигурация успешно преобразована и сохранена в {args.output}.")
     except Exception as e:
@@ -1,5 +1,9 @@
+import io
+import os
+import tempfile
 import unittest
-from config_to_toml import resolve_value, parse_array, parse_struct, parse_config, generate_toml
+from config_to_toml import resolve_value, parse_array, parse_struct, parse_config, generate_toml, tokenize, write_toml
+from config_to_toml import tokenize_chunks, convert_stream, convert_file, cache_key, cache_lookup, cache_store
 
 class TestConfigToToml(unittest.TestCase):
 
@@ -65,6 +69,93 @@ class TestConfigToToml(unittest.TestCase):
         }
         self.assertEqual(parse_config(input_data), expected_result)
 
+    def test_parse_config_layout(self):
+        """Тест разбора конфигурации независимо от расположения строк."""
+        input_data = 'set limit = 10; struct { server = struct { port = 8080, hosts = ["a", "b"] }, debug = true }'
+        expected_result = {
+            "server": {"port": 8080, "hosts": ["a", "b"]},
+            "debug": True,
+            "limit": 10,
+        }
+        self.assertEqual(parse_config(input_data), expected_result)
+
+        input_data = """struct
+        {
+            server =
+                { port = 8080 }  # комментарий
+        }"""
+        self.assertEqual(parse_config(input_data), {"server": {"port": 8080}})
+
+    def test_deep_nesting(self):
+        """Тест разбора вложенности глубже предела рекурсии Python."""
+        depth = 100000
+        value = resolve_value("[" * depth + "1" + "]" * depth)
+        for _ in range(depth):
+            self.assertEqual(len(value), 1)
+            value = value[0]
+        self.assertEqual(value, 1)
+
+    def test_tokenize(self):
+        """Тест позиций лексем."""
+        tokens = list(tokenize('set x = "a";\n  y = 1'))
+        self.assertEqual([(token.kind, token.line, token.column) for token in tokens], [
+            ("NAME", 1, 1), ("NAME", 1, 5), ("=", 1, 7), ("STRING", 1, 9), (";", 1, 12),
+            ("NAME", 2, 3), ("=", 2, 5), ("NUMBER", 2, 7), ("EOF", 2, 8),
+        ])
+
+    def test_syntax_errors(self):
+        """Тест сообщений о синтаксических ошибках с позицией."""
+        with self.assertRaisesRegex(SyntaxError, "строке 3, столбец 5"):
+            parse_config("struct {\n    a = 1\n    b = 2\n}")
+        with self.assertRaisesRegex(SyntaxError, "незакрытая строка"):
+            parse_config('name = "value')
+        with self.assertRaises(ValueError):
+            resolve_value("[1, 2")
+
+    def test_constants(self):
+        """Тест вычисления констант `?(имя)`, в том числе объявленных позже и вложенных."""
+        input_data = """
+        set port = ?(default_port);
+        set default_port = 8080;
+        set server = {host = "localhost", port = ?(port)};
+        struct {
+            primary = ?(server),
+            ports = [?(port), 9090],
+        }
+        """
+        server = {"host": "localhost", "port": 8080}
+        expected_result = {
+            "primary": server,
+            "ports": [8080, 9090],
+            "port": 8080,
+            "default_port": 8080,
+            "server": server,
+        }
+        self.assertEqual(parse_config(input_data), expected_result)
+
+    def test_constant_errors(self):
+        """Тест ошибок вычисления констант."""
+        with self.assertRaisesRegex(SyntaxError, "константа 'missing' не объявлена"):
+            parse_config("struct { value = ?(missing) }")
+        with self.assertRaisesRegex(SyntaxError, "a -> b -> a"):
+            parse_config("set a = [?(b)];\nset b = {x = ?(a)};")
+
+    def test_constant_redeclaration(self):
+        """Тест повторного объявления константы: оба режима отвергают его одинаково."""
+        input_data = "set a = 1;\nx = ?(a);\nset a = 2;"
+        message = "строке 3, столбец 5: константа 'a' уже объявлена"
+        with self.assertRaisesRegex(SyntaxError, message):
+            parse_config(input_data)
+        with self.assertRaisesRegex(SyntaxError, message):
+            convert_stream(io.StringIO(input_data), io.StringIO())
+
+    def test_constant_chain(self):
+        """Тест длинной цепочки констант глубже предела рекурсии Python."""
+        count = 20000
+        input_data = "".join(f"set c{i} = ?(c{i + 1});\n" for i in range(count))
+        input_data += f"set c{count} = 42;\nresult = ?(c0)"
+        self.assertEqual(parse_config(input_data)["result"], 42)
+
     def test_generate_toml(self):
         """Тест генерации TOML."""
         input_data = {
@@ -97,5 +188,100 @@ email = true
 sms = false"""
         self.assertEqual(generate_toml(input_data).strip(), expected_toml.strip())
 
+    def test_write_toml(self):
+        """Тест записи TOML в файловый объект: экранирование строк, вложенные массивы и таблицы."""
+        input_data = {
+            "path": 'C:\\data "main"\n',
+            "matrix": [[1, 2], [], [{"name": "x", "flags": {}}]],
+            "server": {"host name": "localhost", "limits": {"max": 10}},
+        }
+        expected_toml = (
+            'path = "C:\\\\data \\"main\\"\\n"\n'
+            'matrix = [[1, 2], [], [{ name = "x", flags = {} }]]\n'
+            '\n'
+            '[server]\n'
+            '"host name" = "localhost"\n'
+            '\n'
+            '[server.limits]\n'
+            'max = 10\n'
+        )
+        output = io.StringIO()
+        write_toml(input_data, output)
+        self.assertEqual(output.getvalue(), expected_toml)
+
+    def test_tokenize_chunks(self):
+        """Тест лексем на границах частей текста."""
+        text = 'set name = "My App";  # комментарий\nstruct { port = 8080, hosts = ["a", "b"] }'
+        for size in (1, 2, 5, 16):
+            chunks = (text[i:i + size] for i in range(0, len(text), size))
+            self.assertEqual(list(tokenize_chunks(chunks)), list(tokenize(text)))
+
+    def test_convert_stream(self):
+        """Тест потокового преобразования по одному объявлению."""
+        input_data = """
+        set app_name = "MyApp";
+        struct {
+            server = {host = ?(app_name), port = 8080},
+        }
+        struct { client = {name = ?(app_name)} }
+        """
+        output = io.StringIO()
+        convert_stream(io.StringIO(input_data), output, chunk_size=7)
+        expected_toml = (
+            'app_name = "MyApp"\n'
+            '\n'
+            '[server]\n'
+            'host = "MyApp"\n'
+            'port = 8080\n'
+            '\n'
+            '[client]\n'
+            'name = "MyApp"\n'
+        )
+        self.assertEqual(output.getvalue(), expected_toml)
+
+    def test_convert_stream_errors(self):
+        """Тест ограничений потокового режима."""
+        with self.assertRaisesRegex(SyntaxError, "константа 'port' не объявлена"):
+            convert_stream(io.StringIO("x = ?(port)\nset port = 1;"), io.StringIO())
+        with self.assertRaisesRegex(ValueError, "после таблицы"):
+            convert_stream(io.StringIO("struct { server = {port = 1} }\nname = \"x\""), io.StringIO())
+        with self.assertRaisesRegex(ValueError, "уже записан"):
+            convert_stream(io.StringIO("struct { a = 1 }\nstruct { a = 2 }"), io.StringIO())
+
+    def test_cache(self):
+        """Тест кэша готовых TOML: ключ по содержимому и вытеснение давно использованных записей."""
+        with tempfile.TemporaryDirectory() as directory:
+            cache_dir = os.path.join(directory, "cache")
+            paths = {}
+            for name in ("a", "b", "c"):
+                paths[name] = os.path.join(directory, f"{name}.txt")
+                with open(paths[name], "w") as file:
+                    file.write(f'{name} = "{name * 100}"\n')
+            output_path = os.path.join(directory, "out.toml")
+
+            keys = {name: cache_key(path) for name, path in paths.items()}
+            self.assertNotEqual(keys["a"], cache_key(paths["a"], stream=True))
+            self.assertFalse(cache_lookup(cache_dir, keys["a"], output_path))
+
+            for index, name in enumerate(("a", "b")):
+                convert_file(paths[name], output_path)
+                cache_store(cache_dir, keys[name], output_path, max_size=1 << 20)
+                os.utime(os.path.join(cache_dir, f"{keys[name]}.toml"), (index, index))
+
+            os.remove(output_path)
+            self.assertTrue(cache_lookup(cache_dir, keys["a"], output_path))  # «a» становится самой свежей
+            with open(output_path) as file:
+                self.assertEqual(file.read(), f'a = "{"a" * 100}"\n')
+
+            # Места хватает на две записи: вытесняется «b», к которой дольше всего не обращались
+            convert_file(paths["c"], output_path)
+            cache_store(cache_dir, keys["c"], output_path, max_size=2 * os.path.getsize(output_path))
+            self.assertTrue(cache_lookup(cache_dir, keys["a"], output_path))
+            self.assertTrue(cache_lookup(cache_dir, keys["c"], output_path))
+            self.assertFalse(cache_lookup(cache_dir, keys["b"], output_path))
+
+            os.makedirs(os.path.join(cache_dir, f"{keys['b']}.toml"))  # Испорченная запись считается промахом
+            self.assertFalse(cache_lookup(cache_dir, keys["b"], output_path))
+
 if __name__ == '__main__':
     unittest.main()